@@ -0,0 +1,51 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+def load_results(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path) as f:
+        return {result["name"]: result for result in json.load(f)["results"]}
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]],
+    candidate: Dict[str, Dict[str, Any]],
+    metric: str = "p50",
+    threshold: float = 0.10,
+) -> Tuple[List[Tuple[str, float, float, float]], List[str]]:
+    """
+    Returns (rows, regressions): one (name, baseline, candidate, relative change) row per
+    benchmark present in both runs, and the names that got slower by more than `threshold`.
+    """
+    rows = []
+    regressions = []
+    for name in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[name][metric], candidate[name][metric]
+        change = (after - before) / before if before else 0.0
+        rows.append((name, before, after, change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files and flag regressions.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p50", help="Timing statistic to compare (default: p50)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    rows, regressions = compare(load_results(args.baseline), load_results(args.candidate), args.metric, args.threshold)
+    for name, before, after, change in rows:
+        marker = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<32} {before * 1000:9.3f} ms -> {after * 1000:9.3f} ms  {change:+7.1%}{marker}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
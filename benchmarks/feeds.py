@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import os
+import random
+from typing import Dict, Optional, Sequence
+
+import httpx
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+FEED_SIZES = (10, 100, 500, 2000)
+
+_WORDS = (
+    "quantum neural graph learning transformer bound lattice sparse operator gauge entropy "
+    "manifold stochastic convex spectral kernel boson attention diffusion curvature flow "
+    "inference protocol tensor random matrix symmetry estimator combinatorial polytope"
+).split()
+_CATEGORIES = ("cs.AI", "cs.LG", "cs.CL", "math.CO", "math.PR", "physics.hep-ph", "hep-th", "quant-ph")
+
+
+def fixture_path(size: int) -> str:
+    return os.path.join(FIXTURES_DIR, f"feed_{size}.xml")
+
+
+def synthetic_feed(size: int, seed: int = 0) -> bytes:
+    """
+    A deterministic Atom feed shaped like arXiv's: the same elements, attributes and
+    typical title/summary/author lengths, so parse costs are representative.
+    """
+    rng = random.Random(seed * 100003 + size)
+    entries = []
+    for index in range(size):
+        arxiv_id = f"2401.{index:05d}v{rng.randint(1, 3)}"
+        title = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 14))).capitalize()
+        summary = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(120, 220)))
+        authors = "".join(
+            f"<author><name>Author {rng.randint(1, 50000)} Surname{rng.randint(1, 999)}</name></author>"
+            for _ in range(rng.randint(1, 8))
+        )
+        categories = "".join(
+            f'<category term="{term}" scheme="http://arxiv.org/schemas/atom"/>'
+            for term in rng.sample(_CATEGORIES, rng.randint(1, 3))
+        )
+        day = 1 + index % 28
+        entries.append(
+            f"""  <entry>
+    <id>http://arxiv.org/abs/{arxiv_id}</id>
+    <updated>2024-01-{day:02d}T12:00:00Z</updated>
+    <published>2024-01-{day:02d}T10:00:00Z</published>
+    <title>{title}</title>
+    <summary>  {summary}
+</summary>
+    {authors}
+    <arxiv:comment xmlns:arxiv="http://arxiv.org/schemas/atom">{rng.randint(5, 40)} pages</arxiv:comment>
+    <link href="http://arxiv.org/abs/{arxiv_id}" rel="alternate" type="text/html"/>
+    <link title="pdf" href="http://arxiv.org/pdf/{arxiv_id}" rel="related" type="application/pdf"/>
+    <arxiv:primary_category xmlns:arxiv="http://arxiv.org/schemas/atom" term="cs.AI" scheme="http://arxiv.org/schemas/atom"/>
+    {categories}
+  </entry>
+"""
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+        '  <title type="html">ArXiv Query: benchmark</title>\n'
+        f'  <opensearch:totalResults xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">{size}</opensearch:totalResults>\n'
+        + "".join(entries)
+        + "</feed>\n"
+    ).encode("utf-8")
+
+
+def load_feed(size: int) -> bytes:
+    """
+    The recorded fixture for `size` if one exists, otherwise the synthetic feed.
+    """
+    path = fixture_path(size)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return synthetic_feed(size)
+
+
+def load_feeds(sizes: Sequence[int] = FEED_SIZES) -> Dict[int, bytes]:
+    return {size: load_feed(size) for size in sizes}
+
+
+async def record(sizes: Sequence[int], search_query: str) -> None:
+    """
+    Downloads real arXiv responses into the fixtures directory, pausing between
+    requests as arXiv's API guidelines ask.
+    """
+    from src.services.arxiv_service import ARXIV_API_URL
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        for position, size in enumerate(sizes):
+            if position:
+                await asyncio.sleep(3)
+            response = await client.get(ARXIV_API_URL, params={
+                "search_query": search_query,
+                "start": 0,
+                "max_results": size,
+                "sortBy": "submittedDate",
+                "sortOrder": "descending",
+            })
+            response.raise_for_status()
+            with open(fixture_path(size), "wb") as f:
+                f.write(response.content)
+            print(f"Recorded {len(response.content)} bytes to {fixture_path(size)}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Record real arXiv feeds as benchmark fixtures.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in FEED_SIZES), help="Comma-separated entry counts")
+    parser.add_argument("--query", default="cat:cs.AI OR cat:math.CO OR cat:physics.hep-ph", help="arXiv search_query to record")
+    args = parser.parse_args(argv)
+    asyncio.run(record([int(size) for size in args.sizes.split(",")], args.query))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import httpx
+import respx
+
+from benchmarks.feeds import FEED_SIZES, load_feeds, synthetic_feed
+from src.models.paper import Paper
+from src.services import arxiv_service
+from src.services.atom_parser import parse_feed
+from src.services.scheduler import UpstreamScheduler
+from src.services.serialization import paper_to_dict
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """
+    Summary statistics of timing samples, in seconds.
+    """
+    ordered = sorted(samples)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        "samples": len(ordered),
+        "min": ordered[0],
+        "mean": statistics.fmean(ordered),
+        "p50": percentile(0.50),
+        "p90": percentile(0.90),
+        "p99": percentile(0.99),
+        "max": ordered[-1],
+    }
+
+
+def time_sync(fn: Callable[[], Any], repeat: int) -> List[float]:
+    fn() # Warm-up: imports, caches, JIT-free but allocator warm
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def time_async(fn: Callable[[], Awaitable[Any]], repeat: int) -> List[float]:
+    await fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def repeats_for(size: int, budget: int) -> int:
+    """
+    Fewer repetitions for larger feeds so each benchmark takes similar time.
+    """
+    return max(3, budget // max(1, size))
+
+
+def bench_parse(feeds: Dict[int, bytes], budget: int) -> List[Dict[str, Any]]:
+    results = []
+    for size, data in feeds.items():
+        stats = summarize(time_sync(lambda: parse_feed(data), repeats_for(size, budget)))
+        results.append({
+            "name": f"parse_feed/{size}",
+            "entries": size,
+            "bytes": len(data),
+            "entries_per_second": size / stats["p50"],
+            "megabytes_per_second": len(data) / stats["p50"] / 1e6,
+            **stats,
+        })
+    return results
+
+
+def bench_fetch(feeds: Dict[int, bytes], budget: int) -> List[Dict[str, Any]]:
+    """
+    fetch_papers end to end against a stubbed arXiv: request, streamed parse and result list.
+    Fan-out is disabled because the recorded fixtures cannot be served page by page.
+    """
+    results = []
+    fanout_page_size, scheduler = arxiv_service.FANOUT_PAGE_SIZE, arxiv_service.get_scheduler()
+    arxiv_service.FANOUT_PAGE_SIZE = 0
+    arxiv_service.set_scheduler(UpstreamScheduler(rate=0))
+    for size, data in feeds.items():
+        async def run() -> List[float]:
+            with respx.mock(assert_all_called=False) as router:
+                router.get(arxiv_service.ARXIV_API_URL).mock(return_value=httpx.Response(200, content=data))
+                async with httpx.AsyncClient() as client:
+                    async def fetch() -> None:
+                        papers = await arxiv_service.fetch_papers("cat:cs.AI", max_results=size, client=client, write_through=False)
+                        assert len(papers) == size, "stubbed fetch returned the wrong number of papers"
+                    return await time_async(fetch, repeats_for(size, budget))
+
+        stats = summarize(asyncio.run(run()))
+        results.append({"name": f"fetch_papers/{size}", "entries": size, "entries_per_second": size / stats["p50"], **stats})
+    arxiv_service.FANOUT_PAGE_SIZE = fanout_page_size
+    arxiv_service.set_scheduler(scheduler)
+    return results
+
+
+def bench_models(feeds: Dict[int, bytes], budget: int) -> List[Dict[str, Any]]:
+    """
+    Cost of building Papers from already-parsed fields: validated construction versus
+    the trusted path the parser and store use.
+    """
+    results = []
+    for size, data in feeds.items():
+        rows = [paper_to_dict(paper) for paper in parse_feed(data)]
+
+        def validated() -> None:
+            for row in rows:
+                Paper(**row)
+
+        def trusted() -> None:
+            for row in rows:
+                Paper.from_trusted(
+                    arxiv_id=row["arxiv_id"],
+                    title=row["title"],
+                    summary=row["summary"],
+                    author_names=[author["name"] for author in row["authors"]],
+                    published_date=row["published_date"],
+                    updated_date=row["updated_date"],
+                    pdf_url=row["pdf_url"],
+                    categories=row["categories"],
+                )
+
+        for label, fn in (("validated", validated), ("trusted", trusted)):
+            stats = summarize(time_sync(fn, repeats_for(size, budget)))
+            results.append({
+                "name": f"paper_build/{label}/{size}",
+                "entries": size,
+                "microseconds_per_paper": stats["p50"] / size * 1e6,
+                **stats,
+            })
+    return results
+
+
+async def _load_endpoint(
+    client: httpx.AsyncClient,
+    path_for: Callable[[int], str],
+    requests: int,
+    concurrency: int,
+    before_each: Optional[Callable[[], None]] = None,
+) -> List[float]:
+    latencies: List[float] = []
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for index in counter:
+            if before_each is not None:
+                before_each()
+            started = time.perf_counter()
+            response = await client.get(path_for(index))
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def bench_endpoints(requests: int, concurrency: int, page_size: int = 25) -> List[Dict[str, Any]]:
+    """
+    Latency percentiles and memory peak of /papers/latest and /papers/search under concurrent
+    load, through the ASGI app with arXiv stubbed. "cold" clears the response cache before every
+    request so each one reaches the stub and parser; "warm" is served from the cache.
+    """
+    from main import app
+
+    body = synthetic_feed(page_size)
+    endpoints = {
+        "latest": lambda index: f"/papers/latest?start={index * page_size}&max_results={page_size}",
+        "search": lambda index: f"/papers/search?keyword=quantum&start={index * page_size}&max_results={page_size}",
+    }
+    modes = {
+        "cold": (lambda path_for: path_for, arxiv_service.clear_cache),
+        "warm": (lambda path_for: (lambda index: path_for(0)), None),
+    }
+
+    async def run() -> List[Dict[str, Any]]:
+        results = []
+        original_scheduler = arxiv_service.get_scheduler()
+        arxiv_service.set_scheduler(UpstreamScheduler(rate=0, max_concurrency=concurrency))
+        try:
+            with respx.mock(assert_all_called=False) as router:
+                router.get(arxiv_service.ARXIV_API_URL).mock(return_value=httpx.Response(200, content=body))
+                router.route(host="bench").pass_through()
+                transport = httpx.ASGITransport(app=app)
+                # The lifespan installs the shared upstream client, as in production
+                async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    for endpoint, path_for in endpoints.items():
+                        for mode, (paths, before_each) in modes.items():
+                            arxiv_service.clear_cache()
+                            await _load_endpoint(client, paths(path_for), concurrency, concurrency, before_each) # Warm-up
+                            started = time.perf_counter()
+                            latencies = await _load_endpoint(client, paths(path_for), requests, concurrency, before_each)
+                            elapsed = time.perf_counter() - started
+
+                            gc.collect()
+                            tracemalloc.start()
+                            await _load_endpoint(client, paths(path_for), requests, concurrency, before_each)
+                            _, peak = tracemalloc.get_traced_memory()
+                            tracemalloc.stop()
+
+                            results.append({
+                                "name": f"endpoint/{endpoint}/{mode}",
+                                "concurrency": concurrency,
+                                "requests_per_second": requests / elapsed,
+                                "memory_peak_bytes": peak,
+                                **summarize(latencies),
+                            })
+        finally:
+            arxiv_service.set_scheduler(original_scheduler)
+            arxiv_service.clear_cache()
+        return results
+
+    return asyncio.run(run())
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes: Sequence[int], budget: int, requests: int, concurrency: int, only: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    suites = {
+        "parse": lambda feeds: bench_parse(feeds, budget),
+        "fetch": lambda feeds: bench_fetch(feeds, budget),
+        "models": lambda feeds: bench_models(feeds, budget),
+        "endpoints": lambda feeds: bench_endpoints(requests, concurrency),
+    }
+    feeds = load_feeds(sizes)
+    results = []
+    for name, suite in suites.items():
+        if only and name not in only:
+            continue
+        results.extend(suite(feeds))
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "sizes": list(sizes),
+            "concurrency": concurrency,
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite and write the results as JSON.")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in FEED_SIZES), help="Comma-separated feed sizes")
+    parser.add_argument("--only", help="Comma-separated subset of: parse, fetch, models, endpoints")
+    parser.add_argument("--budget", type=int, default=20000, help="Entries parsed per benchmark; sets repetitions")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per endpoint load test")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients in endpoint load tests")
+    parser.add_argument("--quick", action="store_true", help="Small sizes and few repetitions, for smoke runs")
+    parser.add_argument("--log-level", default="WARNING", help="Logging level while benchmarking")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(args.log_level)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    budget, requests = args.budget, args.requests
+    if args.quick:
+        sizes, budget, requests = [size for size in sizes if size <= 100] or sizes[:1], 300, 40
+
+    report = run_suite(sizes, budget, requests, args.concurrency, args.only.split(",") if args.only else None)
+
+    output = args.output or os.path.join(RESULTS_DIR, report["meta"]["timestamp"].replace(":", "") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    for result in report["results"]:
+        print(f"{result['name']:<32} p50 {result['p50'] * 1000:9.3f} ms   p99 {result['p99'] * 1000:9.3f} ms")
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,96 +1,249 @@
-function displayPapers(papers, containerId) {
-    const container = document.getElementById(containerId);
-    container.innerHTML = ''; // Clear existing content
-
-    if (!papers || papers.length === 0) {
-        container.innerHTML = `
-            <div class="text-center py-8 text-gray-500">
-                <svg class="mx-auto h-12 w-12 text-gray-400" fill="none" viewBox="0 0 24 24" stroke="currentColor">
-                    <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M9 12h6m-6 4h6m2 5H7a2 2 0 01-2-2V5a2 2 0 012-2h5.586a1 1 0 01.707.293l5.414 5.414a1 1 0 01.293.707V19a2 2 0 01-2 2z" />
-                </svg>
-                <p class="mt-2">No papers found.</p>
-            </div>
-        `;
-        return;
-    }
+// Lists are fetched as compact cards, a page at a time, and appended as the user scrolls.
+// The next page is requested as soon as one is shown, so scrolling rarely waits on the network
+const PAGE_SIZE = 25;
+// How close to the end of a list the next page is appended
+const LOAD_AHEAD_MARGIN = '1200px';
+// Cards further than this from the viewport are emptied to a placeholder of the same height,
+// so a long browsing session keeps only the cards near the screen in the DOM
+const RENDER_MARGIN = '3000px';
 
-    papers.forEach(paper => {
-        const paperDiv = document.createElement('div');
-        paperDiv.className = 'bg-gray-50 rounded-lg p-6 border border-gray-200 hover:shadow-md transition-shadow';
-
-        const title = document.createElement('h4');
-        title.className = 'text-lg font-semibold text-gray-900 mb-3 leading-tight';
-        title.textContent = paper.title;
-
-        const authors = document.createElement('p');
-        authors.className = 'text-sm text-gray-600 mb-3';
-        authors.innerHTML = `<span class="font-medium">Authors:</span> ${paper.authors.map(author => author.name).join(', ')}`;
-
-        const summary = document.createElement('p');
-        summary.className = 'text-gray-700 text-sm leading-relaxed mb-4';
-        summary.textContent = paper.summary;
-
-        paperDiv.appendChild(title);
-        paperDiv.appendChild(authors);
-        paperDiv.appendChild(summary);
-
-        if (paper.pdf_url) {
-            const linkContainer = document.createElement('div');
-            linkContainer.className = 'flex items-center justify-between';
-
-            const link = document.createElement('a');
-            link.href = paper.pdf_url;
-            link.className = 'inline-flex items-center px-4 py-2 bg-arxiv-blue text-white text-sm font-medium rounded-md hover:bg-blue-700 transition-colors';
-            link.innerHTML = `
-                <svg class="w-4 h-4 mr-2" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                    <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M12 10v6m0 0l-3-3m3 3l3-3m2 8H7a2 2 0 01-2-2V5a2 2 0 012-2h5.586a1 1 0 01.707.293l5.414 5.414a1 1 0 01.293.707V19a2 2 0 01-2 2z"></path>
-                </svg>
-                Read Paper
-            `;
-            link.target = '_blank';
-
-            linkContainer.appendChild(link);
-            paperDiv.appendChild(linkContainer);
-        } else {
-            const noLinkMsg = document.createElement('p');
-            noLinkMsg.className = 'text-gray-500 text-sm italic';
-            noLinkMsg.textContent = 'PDF not available';
-            paperDiv.appendChild(noLinkMsg);
+const cardPapers = new WeakMap(); // Card element -> the paper (card or full record) it shows
+const lists = {}; // Container id -> state of the list shown in it
+
+const cardObserver = new IntersectionObserver(entries => {
+    entries.forEach(entry => {
+        const card = entry.target;
+        if (entry.isIntersecting) {
+            if (card.dataset.collapsed) {
+                delete card.dataset.collapsed;
+                card.style.height = '';
+                fillCard(card);
+            }
+        } else if (!card.dataset.collapsed && card.offsetHeight > 0) { // Not in a hidden tab
+            card.style.height = `${card.offsetHeight}px`;
+            card.dataset.collapsed = 'true';
+            card.replaceChildren();
         }
+    });
+}, { rootMargin: RENDER_MARGIN });
 
-        container.appendChild(paperDiv);
+const sentinelObserver = new IntersectionObserver(entries => {
+    entries.forEach(entry => {
+        if (entry.isIntersecting) {
+            const list = lists[entry.target.dataset.list];
+            if (list && list.sentinel === entry.target) loadNextPage(list);
+        }
     });
+}, { rootMargin: LOAD_AHEAD_MARGIN });
+
+function messageHtml(text, tone) {
+    const icon = tone === 'error'
+        ? 'M12 8v4m0 4h.01M21 12a9 9 0 11-18 0 9 9 0 0118 0z'
+        : 'M9 12h6m-6 4h6m2 5H7a2 2 0 01-2-2V5a2 2 0 012-2h5.586a1 1 0 01.707.293l5.414 5.414a1 1 0 01.293.707V19a2 2 0 01-2 2z';
+    const color = tone === 'error' ? 'red' : 'gray';
+    return `
+        <div class="text-center py-8 text-${color}-500">
+            <svg class="mx-auto h-12 w-12 text-${color}-400" fill="none" viewBox="0 0 24 24" stroke="currentColor">
+                <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="${icon}" />
+            </svg>
+            <p class="mt-2">${text}</p>
+        </div>
+    `;
 }
 
-async function fetchLatestPapers() {
-    const containerId = 'latest-papers-list';
+function loadingHtml(text) {
+    return `
+        <div class="flex items-center justify-center py-8">
+            <div class="animate-spin rounded-full h-8 w-8 border-b-2 border-arxiv-blue"></div>
+            <span class="ml-3 text-gray-600">${text}</span>
+        </div>
+    `;
+}
+
+function isTruncated(paper) {
+    return paper.author_count !== undefined && (paper.author_count > paper.authors.length || paper.summary.endsWith('…'));
+}
+
+function fillCard(card) {
+    const paper = cardPapers.get(card);
+
+    const title = document.createElement('h4');
+    title.className = 'text-lg font-semibold text-gray-900 mb-3 leading-tight';
+    title.textContent = paper.title;
+
+    const authors = document.createElement('p');
+    authors.className = 'text-sm text-gray-600 mb-3';
+    const label = document.createElement('span');
+    label.className = 'font-medium';
+    label.textContent = 'Authors: ';
+    const others = (paper.author_count ?? paper.authors.length) - paper.authors.length;
+    authors.append(label, paper.authors.map(author => author.name).join(', ') + (others > 0 ? ` and ${others} more` : ''));
+
+    const summary = document.createElement('p');
+    summary.className = 'text-gray-700 text-sm leading-relaxed mb-4';
+    summary.textContent = paper.summary;
+
+    card.replaceChildren(title, authors, summary);
+
+    const actions = document.createElement('div');
+    actions.className = 'flex items-center gap-4';
+    if (paper.pdf_url) {
+        const link = document.createElement('a');
+        link.href = paper.pdf_url;
+        link.className = 'inline-flex items-center px-4 py-2 bg-arxiv-blue text-white text-sm font-medium rounded-md hover:bg-blue-700 transition-colors';
+        link.innerHTML = `
+            <svg class="w-4 h-4 mr-2" fill="none" stroke="currentColor" viewBox="0 0 24 24">
+                <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M12 10v6m0 0l-3-3m3 3l3-3m2 8H7a2 2 0 01-2-2V5a2 2 0 012-2h5.586a1 1 0 01.707.293l5.414 5.414a1 1 0 01.293.707V19a2 2 0 01-2 2z"></path>
+            </svg>
+            Read Paper
+        `;
+        link.target = '_blank';
+        actions.appendChild(link);
+    } else {
+        const noLinkMsg = document.createElement('p');
+        noLinkMsg.className = 'text-gray-500 text-sm italic';
+        noLinkMsg.textContent = 'PDF not available';
+        actions.appendChild(noLinkMsg);
+    }
+    if (isTruncated(paper)) {
+        const expand = document.createElement('button');
+        expand.className = 'text-sm font-medium text-arxiv-blue hover:underline';
+        expand.textContent = 'Show full abstract';
+        expand.addEventListener('click', () => expandCard(card, expand));
+        actions.appendChild(expand);
+    }
+    card.appendChild(actions);
+}
+
+function createCard(paper) {
+    const card = document.createElement('div');
+    card.className = 'bg-gray-50 rounded-lg p-6 border border-gray-200 hover:shadow-md transition-shadow';
+    cardPapers.set(card, paper);
+    fillCard(card);
+    return card;
+}
+
+async function expandCard(card, button) {
+    // Cards carry a shortened record; the full one is only fetched when it is asked for
+    const paper = cardPapers.get(card);
+    button.disabled = true;
+    button.textContent = 'Loading...';
     try {
-        const response = await fetch('/papers/latest');
+        const response = await fetch(`/papers/by-ids?ids=${encodeURIComponent(paper.arxiv_id)}`);
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        const papers = await response.json();
-        displayPapers(papers, containerId);
+        const lookup = await response.json();
+        if (lookup.papers.length === 0) {
+            throw new Error(`${paper.arxiv_id} is not available`);
+        }
+        cardPapers.set(card, lookup.papers[0]);
+        if (!card.dataset.collapsed) fillCard(card);
     } catch (error) {
-        console.error('Error fetching latest papers:', error);
-        const container = document.getElementById(containerId);
-        container.innerHTML = `
-            <div class="text-center py-8 text-red-500">
-                <svg class="mx-auto h-12 w-12 text-red-400" fill="none" viewBox="0 0 24 24" stroke="currentColor">
-                    <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M12 8v4m0 4h.01M21 12a9 9 0 11-18 0 9 9 0 0118 0z" />
-                </svg>
-                <p class="mt-2">Error loading papers. Please try again later.</p>
-            </div>
-        `;
+        console.error('Error loading the full paper:', error);
+        button.disabled = false;
+        button.textContent = 'Show full abstract (retry)';
     }
 }
 
-async function searchPapers() {
-    console.log('searchPapers function called'); // Debug log
+async function fetchPage(url) {
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return { papers: await response.json(), cursor: response.headers.get('X-Next-Cursor') };
+}
+
+function prefetch(url) {
+    // Settles either way, so a failed prefetch surfaces when the page is actually needed
+    return fetchPage(url).then(page => ({ page }), error => ({ error }));
+}
+
+function startList(containerId, url, loadingText) {
+    const container = document.getElementById(containerId);
+    const previous = lists[containerId];
+    if (previous && previous.sentinel) sentinelObserver.unobserve(previous.sentinel);
+    container.querySelectorAll(':scope > div').forEach(card => cardObserver.unobserve(card));
+    container.innerHTML = loadingHtml(loadingText);
+
+    const list = { container, url, next: prefetch(url), shown: 0, loading: false, sentinel: null };
+    lists[containerId] = list;
+    return loadNextPage(list);
+}
+
+async function loadNextPage(list) {
+    if (list.loading || !list.next) return;
+    list.loading = true;
+    const { page, error } = await list.next;
+    list.loading = false;
+    if (lists[list.container.id] !== list) return; // Replaced by a newer search meanwhile
 
+    if (error) {
+        console.error('Error fetching papers:', error);
+        list.next = null;
+        if (list.shown === 0) {
+            list.container.innerHTML = messageHtml('Error loading papers. Please try again later.', 'error');
+            return;
+        }
+        const retry = document.createElement('button');
+        retry.className = 'text-arxiv-blue hover:underline';
+        retry.textContent = 'Could not load more papers. Retry';
+        retry.addEventListener('click', () => {
+            list.sentinel.textContent = 'Loading more papers...';
+            list.next = prefetch(list.nextUrl);
+            loadNextPage(list);
+        });
+        list.sentinel.replaceChildren(retry);
+        return;
+    }
+    if (list.shown === 0) {
+        list.container.replaceChildren();
+        if (page.papers.length === 0) {
+            list.next = null;
+            list.container.innerHTML = messageHtml('No papers found.');
+            return;
+        }
+    }
+
+    // One insertion per page; cards already shown are left untouched
+    const cards = page.papers.map(createCard);
+    const fragment = document.createDocumentFragment();
+    fragment.append(...cards);
+    if (list.sentinel) list.sentinel.before(fragment); else list.container.appendChild(fragment);
+    list.shown += cards.length;
+    cards.forEach(card => cardObserver.observe(card));
+
+    if (page.cursor && page.papers.length > 0) {
+        list.nextUrl = `${list.url}&cursor=${encodeURIComponent(page.cursor)}`;
+        list.next = prefetch(list.nextUrl);
+        if (!list.sentinel) {
+            list.sentinel = document.createElement('p');
+            list.sentinel.dataset.list = list.container.id;
+            list.sentinel.className = 'text-center py-4 text-sm text-gray-500';
+            list.sentinel.textContent = 'Loading more papers...';
+            list.container.appendChild(list.sentinel);
+            sentinelObserver.observe(list.sentinel);
+        } else {
+            // Still in view after a short page: the observer will not fire again on its own
+            sentinelObserver.unobserve(list.sentinel);
+            sentinelObserver.observe(list.sentinel);
+        }
+    } else {
+        list.next = null;
+        if (list.sentinel) {
+            sentinelObserver.unobserve(list.sentinel);
+            list.sentinel.textContent = `${list.shown} paper${list.shown === 1 ? '' : 's'}`;
+        }
+    }
+}
+
+function fetchLatestPapers() {
+    return startList('latest-papers-list', `/papers/latest?view=card&max_results=${PAGE_SIZE}`, 'Loading latest papers...');
+}
+
+async function searchPapers() {
     const keywordInput = document.getElementById('search-keyword');
     const searchButton = document.getElementById('search-button');
-    const container = document.getElementById('search-results-list');
 
     if (!keywordInput) {
         console.error('Search keyword input not found!');
@@ -98,51 +251,24 @@ async function searchPapers() {
     }
 
     const keyword = keywordInput.value.trim();
-
-    console.log('Search keyword:', keyword); // Debug log
-
     if (!keyword) {
         alert('Please enter a search keyword.');
         return;
     }
 
-    // Show loading state
+    // Show loading state until the first page is in
     if (searchButton) searchButton.disabled = true;
     if (searchButton) searchButton.textContent = 'Searching...';
-    if (container) container.innerHTML = `
-        <div class="flex items-center justify-center py-8">
-            <div class="animate-spin rounded-full h-8 w-8 border-b-2 border-arxiv-blue"></div>
-            <span class="ml-3 text-gray-600">Searching for papers...</span>
-        </div>
-    `;
+    if (typeof switchTab === 'function') {
+        switchTab('search');
+    }
 
     try {
-        console.log('Making fetch request to:', `/papers/search?keyword=${encodeURIComponent(keyword)}`); // Debug log
-        const response = await fetch(`/papers/search?keyword=${encodeURIComponent(keyword)}`);
-        console.log('Response status:', response.status); // Debug log
-
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        const papers = await response.json();
-        console.log('Received papers:', papers.length); // Debug log
-        displayPapers(papers, 'search-results-list');
-        // Switch to search results tab
-        if (typeof switchTab === 'function') {
-            switchTab('search');
-        }
-    } catch (error) {
-        console.error('Error searching papers:', error);
-        if (container) {
-            container.innerHTML = `
-                <div class="text-center py-8 text-red-500">
-                    <svg class="mx-auto h-12 w-12 text-red-400" fill="none" viewBox="0 0 24 24" stroke="currentColor">
-                        <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M12 8v4m0 4h.01M21 12a9 9 0 11-18 0 9 9 0 0118 0z" />
-                    </svg>
-                    <p class="mt-2">Error searching papers. Please try again later.</p>
-                </div>
-            `;
-        }
+        await startList(
+            'search-results-list',
+            `/papers/search?keyword=${encodeURIComponent(keyword)}&view=card&max_results=${PAGE_SIZE}`,
+            'Searching for papers...',
+        );
     } finally {
         // Reset button state
         if (searchButton) {
@@ -152,6 +278,39 @@ async function searchPapers() {
     }
 }
 
+let suggestController = null;
+
+async function suggestSearches(event) {
+    const query = event.target.value.trim();
+    const datalist = document.getElementById('search-suggestions');
+    if (!datalist) return;
+
+    // Only the latest keystroke's suggestions matter; cancel the request still in flight
+    if (suggestController) suggestController.abort();
+    if (!query) {
+        datalist.innerHTML = '';
+        return;
+    }
+    suggestController = new AbortController();
+
+    try {
+        const response = await fetch(`/papers/suggest?q=${encodeURIComponent(query)}&limit=8`, { signal: suggestController.signal });
+        if (!response.ok) return;
+        const suggestions = await response.json();
+        datalist.innerHTML = '';
+        suggestions.forEach(suggestion => {
+            const option = document.createElement('option');
+            option.value = suggestion.text;
+            option.label = `${suggestion.kind} · ${suggestion.papers} paper${suggestion.papers === 1 ? '' : 's'}`;
+            datalist.appendChild(option);
+        });
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error('Error fetching suggestions:', error);
+        }
+    }
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     console.log('DOM content loaded'); // Debug log
     fetchLatestPapers();
@@ -174,6 +333,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 searchPapers();
             }
         });
+        searchInput.addEventListener('input', suggestSearches);
     } else {
         console.error('Search input not found!');
     }
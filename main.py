@@ -1,49 +1,500 @@
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException
+import os
+import threading
+from contextlib import asynccontextmanager
+from datetime import date
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from typing import List
-from src.models.paper import Paper # Ensure this path is correct based on your structure
-from src.services import arxiv_service # Ensure this path is correct
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from typing import Dict, List, Optional, Union
+from src.config import env_bool, env_float
+from src.models.paper import FacetedPapers, Paper, PaperBatch, PaperCard, RelatedPaper, Suggestion # Ensure this path is correct based on your structure
+from src.services import arxiv_service, facets, planner, related, shared_cache, suggest, thumbnails, warm_start # Ensure this path is correct
+from src.services.http_cache import MIN_COMPRESS_BYTES, cache_control, etag_matches, negotiate_encoding, variant_etag
+from src.services.http_client import create_http_client
+from src.services.metrics import REGISTRY, STAGE_SECONDS, RequestMetricsMiddleware
+from src.services.pagination import Cursor, InvalidCursor
+from src.services.scheduler import QueueDeadlineExceeded
+from src.services.facets import FacetCounts, FacetFilter
+from src.services.serialization import FULL, Projection, compress, dumps, encode_papers, make_etag, paper_to_dict, papers_etag
+from src.services.thumbnails import PdfNotFound, ThumbnailUnavailable
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for the whole process, so upstream connections are reused across requests
+    http_client = create_http_client()
+    arxiv_service.set_http_client(http_client)
+    shared = None
+    if shared_cache.SHARED_CACHE_PATH:
+        shared = shared_cache.SharedCache(shared_cache.SHARED_CACHE_PATH)
+        arxiv_service.set_shared_cache(shared)
+        logger.info(f"Shared result cache opened at {shared_cache.SHARED_CACHE_PATH}")
+    paper_store = None
+    store_path = os.getenv("ARXIV_STORE_PATH")
+    if store_path:
+        from src.services.paper_store import PaperStore
+        paper_store = PaperStore(store_path)
+        arxiv_service.set_paper_store(paper_store)
+        logger.info(f"Local paper store opened at {store_path} (search backend: {arxiv_service.SEARCH_BACKEND})")
+    harvest_task = None
+    harvest_interval = float(os.getenv("ARXIV_HARVEST_INTERVAL", "0") or 0)
+    if paper_store is not None and harvest_interval > 0:
+        from src.services.harvester import Harvester
+        harvest_task = asyncio.create_task(Harvester(paper_store).run_forever(harvest_interval))
+        logger.info(f"Background harvester scheduled every {harvest_interval:.0f}s.")
+    thumbnail_service = None
+    prewarm_task = None
+    if env_bool("ARXIV_THUMBNAILS_ENABLED", True):
+        thumbnail_service = thumbnails.ThumbnailService(
+            thumbnails.ThumbnailCache(thumbnails.THUMBNAIL_DIR), thumbnails.HttpPdfFetcher()
+        )
+        thumbnails.set_thumbnail_service(thumbnail_service)
+        prewarm_interval = env_float("ARXIV_THUMBNAIL_PREWARM_INTERVAL", 0.0)
+        if prewarm_interval > 0:
+            prewarm_task = asyncio.create_task(thumbnail_service.run_prewarm_forever(prewarm_interval))
+            logger.info(f"Thumbnail prewarm scheduled every {prewarm_interval:.0f}s.")
+    # Hot result pages from the previous run, so the first requests are served warm
+    warm_task = None
+    if warm_start.WARM_SNAPSHOT:
+        response_cache = arxiv_service.get_response_cache()
+        try:
+            restored = await asyncio.to_thread(warm_start.load, response_cache, warm_start.WARM_SNAPSHOT)
+            logger.info(f"Restored {restored} cached result pages from {warm_start.WARM_SNAPSHOT}")
+        except Exception as e:
+            logger.warning(f"Failed to restore the warm-start snapshot: {e}")
+        if warm_start.WARM_SNAPSHOT_INTERVAL > 0:
+            warm_task = asyncio.create_task(
+                warm_start.save_forever(response_cache, warm_start.WARM_SNAPSHOT, warm_start.WARM_SNAPSHOT_INTERVAL)
+            )
+    # Paper indexes load in the background, so a large snapshot does not hold up startup, then
+    # catch up on papers stored since the last run, e.g. by a separate harvester process
+    sync_tasks = []
+    stop_sync = threading.Event()
+
+    async def load_index(name, load, install, sync):
+        try:
+            index = await asyncio.to_thread(load)
+            install(index)
+            if paper_store is not None and not stop_sync.is_set():
+                await asyncio.to_thread(sync, index, paper_store, stop=stop_sync)
+        except Exception as e:
+            logger.warning(f"Failed to load the {name} index: {e}")
+
+    if env_bool("ARXIV_RELATED_ENABLED", True) and related.available():
+        sync_tasks.append(asyncio.create_task(load_index(
+            "related-paper", lambda: related.RelatedIndex(related.claim_directory(related.RELATED_DIR)), related.set_related_index, related.sync_from_store
+        )))
+    facet_index = None
+    if paper_store is not None and env_bool("ARXIV_FACETS_ENABLED", True):
+        facet_index = facets.FacetIndex()
+        facets.set_facet_index(facet_index)
+        sync_tasks.append(asyncio.create_task(asyncio.to_thread(facet_index.refresh, paper_store)))
+    if env_bool("ARXIV_SUGGEST_ENABLED", True):
+        sync_tasks.append(asyncio.create_task(load_index(
+            "suggestion", lambda: suggest.SuggestIndex(suggest.SUGGEST_SNAPSHOT), suggest.set_suggest_index, suggest.sync_from_store
+        )))
+    logger.info("Application startup complete.")
+    try:
+        yield
+    finally:
+        stop_sync.set() # A worker thread cannot be cancelled; syncs stop after the current batch
+        for task in sync_tasks:
+            await task
+        for task in (harvest_task, prewarm_task, warm_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if thumbnail_service is not None:
+            thumbnails.set_thumbnail_service(None)
+            thumbnail_service.close()
+        related_index = related.get_related_index()
+        if related_index is not None:
+            related.set_related_index(None)
+            await asyncio.to_thread(related_index.flush)
+        if facet_index is not None:
+            facets.set_facet_index(None)
+        suggest_index = suggest.get_suggest_index()
+        if suggest_index is not None:
+            suggest.set_suggest_index(None)
+            await asyncio.to_thread(suggest_index.flush)
+        if warm_start.WARM_SNAPSHOT:
+            try:
+                saved = await asyncio.to_thread(warm_start.save, arxiv_service.get_response_cache(), warm_start.WARM_SNAPSHOT)
+                logger.info(f"Saved {saved} cached result pages to {warm_start.WARM_SNAPSHOT}")
+            except Exception as e:
+                logger.warning(f"Failed to write the warm-start snapshot: {e}")
+        arxiv_service.set_http_client(None)
+        await http_client.aclose()
+        if shared is not None:
+            arxiv_service.set_shared_cache(None)
+            shared.close()
+        if paper_store is not None:
+            arxiv_service.set_paper_store(None)
+            paper_store.close()
+        logger.info("Application shutdown complete.")
+
 app = FastAPI(
     title="ArXiv Paper Viewer API",
     description="API for browsing and searching arXiv papers.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
+app.add_middleware(RequestMetricsMiddleware)
+
 app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
 
-logger.info("Application startup complete.")
+def parse_list(values: Optional[List[str]]) -> List[str]:
+    # Accepts both repeated (?categories=a&categories=b) and comma-separated (?categories=a,b) forms
+    return [item.strip() for value in values or [] for item in value.split(",") if item.strip()]
+
+def upstream_busy(e: QueueDeadlineExceeded) -> HTTPException:
+    return HTTPException(status_code=503, detail="arXiv request queue is full; please retry shortly.", headers={"Retry-After": "5"})
+
+def parse_cursor(token: Optional[str], scope: str) -> Optional[Cursor]:
+    if not token:
+        return None
+    try:
+        return Cursor.decode(token, scope)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def search_scope(keyword: str) -> str:
+    return "search:" + " ".join(keyword.split())
+
+def next_page_headers(request: Request, scope: str, papers: List[Paper], max_results: int, cursor: Optional[Cursor], start: int) -> Dict[str, str]:
+    # Only a full page can have a successor. The cursor names the page's last paper and its upstream offset
+    if not papers or len(papers) < max_results:
+        return {}
+    offset = (cursor.offset if cursor is not None else start - 1) + len(papers)
+    token = Cursor.after(scope, papers[-1], offset).encode()
+    url = request.url.remove_query_params("start").include_query_params(cursor=token)
+    return {"X-Next-Cursor": token, "Link": f'<{url}>; rel="next"'}
+
+def papers_response(
+    request: Request,
+    papers: List[Paper],
+    ttl: float,
+    extra_headers: Optional[Dict[str, str]] = None,
+    facet_counts: Optional[FacetCounts] = None,
+    projection: Projection = FULL,
+) -> Response:
+    # Papers are pre-encoded (and memoized on cached pages), skipping response_model re-validation.
+    # response_model stays declared on the routes so the OpenAPI schema is unchanged.
+    # With facet counts the body becomes {"papers": [...], "facets": {...}}, the papers still pre-encoded
+    with STAGE_SECONDS.time(stage="encode"):
+        body = None
+        if facet_counts is not None:
+            body = b'{"papers":' + encode_papers(papers, projection=projection) + b',"facets":' + dumps(facet_counts.to_dict()) + b"}"
+        elif not projection.is_full:
+            body = encode_papers(papers, projection=projection)
+        etag = papers_etag(papers) if body is None else make_etag(body)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": cache_control(arxiv_service.freshness_lifetime(papers, ttl), arxiv_service.stale_lifetime()),
+            "Vary": "Accept-Encoding",
+            **(extra_headers or {}),
+        }
+        if getattr(papers, "partial", False):
+            # Some upstream pages failed: tell the client, and keep the incomplete page out of caches
+            headers["X-Partial-Results"] = "true"
+            headers["Cache-Control"] = "no-store"
+        content = encode_papers(papers) if body is None else body
+        coding = negotiate_encoding(request.headers.get("accept-encoding")) if len(content) >= MIN_COMPRESS_BYTES else "identity"
+        # A 304 carries the validator of the variant the request would have been sent
+        headers["ETag"] = variant_etag(etag, coding)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if coding != "identity":
+            content = encode_papers(papers, coding) if body is None else compress(body, coding)
+            headers["Content-Encoding"] = coding
+    return Response(content=content, media_type="application/json", headers=headers)
+
+def plan_headers() -> Dict[str, str]:
+    # How the planner routed the request's query, to see how much traffic the local store answers
+    plan = planner.current_plan()
+    return {"X-Query-Plan": plan.header()} if plan is not None else {}
+
+def parse_filters(categories: Optional[List[str]], date_from: Optional[date], date_to: Optional[date]) -> FacetFilter:
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to.")
+    return FacetFilter.of(parse_list(categories), date_from, date_to)
+
+def filtered_scope(scope: str, filters: FacetFilter) -> str:
+    # Cursors of a filtered listing are not valid for the unfiltered one, and vice versa
+    return f"{scope}|{filters.scope()}" if filters else scope
+
+def parse_projection(view: str, fields: Optional[List[str]]) -> Projection:
+    try:
+        return Projection.of(view, parse_list(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def require_facets(include_facets: bool) -> None:
+    if include_facets and not arxiv_service.facets_available():
+        raise HTTPException(status_code=503, detail="Facets require the local paper store (ARXIV_STORE_PATH).")
 
 @app.get("/", response_class=FileResponse)
 async def root():
     return "frontend/static/index.html"
 
-@app.get("/papers/latest", response_model=List[Paper], summary="Get Latest Papers", description="Fetches the most recently submitted papers from arXiv, with pagination.")
-async def api_get_latest_papers(start: int = 0, max_results: int = 25):
+@app.get(
+    "/papers/latest",
+    response_model=Union[List[Paper], List[PaperCard], FacetedPapers],
+    summary="Get Latest Papers",
+    description="Fetches the most recently submitted papers from arXiv, with pagination. Full pages carry the next "
+                "page's `cursor` in the X-Next-Cursor and Link headers; a cursor takes precedence over `start`. "
+                "`categories` and `date_from`/`date_to` filter the feed, from the local paper store when there is one. "
+                "With `facets=true` the response is `{papers, facets}`, adding per-category, month and day counts "
+                "of the locally stored papers. `view=card` returns compact cards (truncated summary, first authors, "
+                "author count) and `fields` keeps only the listed fields of each paper.",
+)
+async def api_get_latest_papers(
+    request: Request,
+    start: int = 0,
+    max_results: int = 25,
+    cursor: Optional[str] = None,
+    categories: Optional[List[str]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    include_facets: bool = Query(False, alias="facets"),
+    view: str = "full",
+    fields: Optional[List[str]] = Query(None),
+):
+    filters = parse_filters(categories, date_from, date_to)
+    projection = parse_projection(view, fields)
+    scope = filtered_scope("latest", filters)
+    page_cursor = parse_cursor(cursor, scope)
+    filter_args = {"filters": filters} if filters else {}
+    require_facets(include_facets)
     try:
-        papers = await arxiv_service.get_latest_papers(start=start, max_results=max_results)
-        return papers
+        facet_counts = await arxiv_service.get_facets(filters) if include_facets else None
+        if page_cursor is None:
+            papers = await arxiv_service.get_latest_papers(start=start, max_results=max_results, **filter_args)
+        else:
+            papers = await arxiv_service.get_latest_papers(max_results=max_results, cursor=page_cursor, **filter_args)
+        headers = {**next_page_headers(request, scope, papers, max_results, page_cursor, start), **plan_headers()}
+        return papers_response(request, papers, arxiv_service.LATEST_CACHE_TTL, headers, facet_counts, projection)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueDeadlineExceeded as e:
+        raise upstream_busy(e)
     except Exception as e:
         logger.error(f"Error in /papers/latest endpoint: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="An unexpected error occurred while fetching latest papers.")
 
-@app.get("/papers/search", response_model=List[Paper], summary="Search Papers", description="Searches papers on arXiv by keyword, with pagination.")
-async def api_search_papers(keyword: str, start: int = 0, max_results: int = 25):
+@app.get(
+    "/papers/search",
+    response_model=Union[List[Paper], List[PaperCard], FacetedPapers],
+    summary="Search Papers",
+    description="Searches papers on arXiv by keyword, with pagination. Full pages carry the next page's `cursor` "
+                "in the X-Next-Cursor and Link headers; a cursor takes precedence over `start`. "
+                "`categories` and `date_from`/`date_to` filter the matches. With `facets=true` the response is "
+                "`{papers, facets}`, adding per-category, month and day counts of the locally stored matches. "
+                "`view=card` returns compact cards (truncated summary, first authors, author count) and `fields` "
+                "keeps only the listed fields of each paper.",
+)
+async def api_search_papers(
+    request: Request,
+    keyword: str,
+    start: int = 0,
+    max_results: int = 25,
+    cursor: Optional[str] = None,
+    categories: Optional[List[str]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    include_facets: bool = Query(False, alias="facets"),
+    view: str = "full",
+    fields: Optional[List[str]] = Query(None),
+):
     if not keyword or not keyword.strip(): # Added check for empty or whitespace-only keyword
         logger.warning(f"Search attempt with empty keyword: '{keyword}'")
         raise HTTPException(status_code=400, detail="Keyword cannot be empty or just whitespace.")
+    filters = parse_filters(categories, date_from, date_to)
+    projection = parse_projection(view, fields)
+    scope = filtered_scope(search_scope(keyword), filters)
+    page_cursor = parse_cursor(cursor, scope)
+    filter_args = {"filters": filters} if filters else {}
+    require_facets(include_facets)
     try:
-        papers = await arxiv_service.search_papers_by_keyword(keyword=keyword, start=start, max_results=max_results)
-        return papers
+        facet_counts = await arxiv_service.get_facets(filters, keyword) if include_facets else None
+        if page_cursor is None:
+            papers = await arxiv_service.search_papers_by_keyword(keyword=keyword, start=start, max_results=max_results, **filter_args)
+        else:
+            papers = await arxiv_service.search_papers_by_keyword(keyword=keyword, max_results=max_results, cursor=page_cursor, **filter_args)
+        headers = {**next_page_headers(request, scope, papers, max_results, page_cursor, start), **plan_headers()}
+        return papers_response(request, papers, arxiv_service.SEARCH_CACHE_TTL, headers, facet_counts, projection)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueDeadlineExceeded as e:
+        raise upstream_busy(e)
     except Exception as e:
         logger.error(f"Error in /papers/search endpoint (keyword: {keyword}): {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="An unexpected error occurred while searching papers.")
 
+@app.get(
+    "/papers/export",
+    summary="Export Papers",
+    description="Streams every paper matching a keyword and/or categories, optionally within a submission date range, "
+                "as newline-delimited JSON (one Paper per line).",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def api_export_papers(
+    keyword: Optional[str] = None,
+    categories: Optional[List[str]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = 1000
+):
+    if limit < 1 or limit > arxiv_service.EXPORT_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {arxiv_service.EXPORT_MAX_RESULTS}.")
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to.")
+    search_query = arxiv_service.build_search_query(keyword, parse_list(categories), date_from, date_to)
+
+    async def ndjson_lines():
+        try:
+            async for paper in arxiv_service.export_papers(search_query, limit=limit):
+                yield dumps(paper_to_dict(paper)) + b"\n"
+        except Exception as e:
+            # Headers are already sent, so the failure is reported in-band as a final line
+            logger.error(f"Error in /papers/export (query: {search_query}): {str(e)}", exc_info=True)
+            yield dumps({"error": "Export interrupted by an upstream error."}) + b"\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.get(
+    "/papers/by-ids",
+    response_model=PaperBatch,
+    summary="Get Papers by ID",
+    description="Looks up papers by arXiv id (repeated or comma-separated `ids`, versioned or not), in request order. "
+                "Ids arXiv does not know are listed under `missing`, ids whose upstream lookup failed under `unavailable`.",
+)
+async def api_get_papers_by_ids(ids: List[str] = Query(...)):
+    arxiv_ids = parse_list(ids)
+    if not arxiv_ids:
+        raise HTTPException(status_code=400, detail="At least one id is required.")
+    if len(arxiv_ids) > arxiv_service.BY_IDS_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {arxiv_service.BY_IDS_MAX} ids can be looked up at once.")
+    invalid = [arxiv_id for arxiv_id in arxiv_ids if not arxiv_service.ARXIV_ID_RE.match(arxiv_id)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid arXiv ids: {', '.join(invalid[:10])}")
+    try:
+        lookup = await arxiv_service.fetch_papers_by_ids(arxiv_ids)
+    except QueueDeadlineExceeded as e:
+        raise upstream_busy(e)
+    except Exception as e:
+        logger.error(f"Error in /papers/by-ids endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An unexpected error occurred while looking up papers.")
+    with STAGE_SECONDS.time(stage="encode"):
+        content = dumps({
+            "papers": [paper_to_dict(paper) for paper in lookup.papers],
+            "missing": lookup.missing,
+            "unavailable": lookup.unavailable,
+        })
+    return Response(content=content, media_type="application/json")
+
+@app.get(
+    "/papers/suggest",
+    response_model=List[Suggestion],
+    summary="Search Suggestions",
+    description="Completions of a search-box prefix: titles, author names and category codes of papers the service "
+                "has already seen, most common first. Answered from memory, without querying arXiv.",
+)
+async def api_suggest(q: str = "", limit: int = 8):
+    if limit < 1 or limit > suggest.MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {suggest.MAX_LIMIT}.")
+    index = suggest.get_suggest_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Search suggestions are not enabled, or still loading.")
+    with STAGE_SECONDS.time(stage="suggest"):
+        completions = index.suggest(q[:200], limit)
+    content = dumps([{"text": text, "kind": kind, "papers": papers} for text, kind, papers in completions])
+    return Response(content=content, media_type="application/json", headers={"Cache-Control": "public, max-age=60"})
+
+@app.get(
+    "/papers/{arxiv_id:path}/thumbnail",
+    summary="Paper Thumbnail",
+    description="Image of the first page of a paper's PDF (WebP, or PNG without Pillow), rendered on first request and cached.",
+    response_class=Response,
+    responses={200: {"content": {"image/webp": {}, "image/png": {}}}},
+)
+async def api_paper_thumbnail(request: Request, arxiv_id: str):
+    if not arxiv_service.ARXIV_ID_RE.match(arxiv_id):
+        raise HTTPException(status_code=400, detail="Invalid arXiv id.")
+    service = thumbnails.get_thumbnail_service()
+    if service is None:
+        raise HTTPException(status_code=503, detail="Thumbnails are not enabled.")
+    try:
+        thumbnail = await service.get(arxiv_id)
+    except PdfNotFound:
+        raise HTTPException(status_code=404, detail=f"No PDF found for {arxiv_id}.")
+    except ThumbnailUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except QueueDeadlineExceeded as e:
+        raise upstream_busy(e)
+    except Exception as e:
+        logger.error(f"Error rendering thumbnail for {arxiv_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=502, detail="Could not render a thumbnail for this paper.")
+    headers = {"ETag": thumbnail.etag, "Cache-Control": "public, max-age=86400"}
+    if etag_matches(request.headers.get("if-none-match"), thumbnail.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=thumbnail.content, media_type=thumbnail.media_type, headers=headers)
+
+@app.get(
+    "/papers/{arxiv_id:path}/related",
+    response_model=List[RelatedPaper],
+    summary="Related Papers",
+    description="Papers most similar to the given one by TF-IDF cosine similarity of titles and abstracts, "
+                "among all papers the service has seen. Requires NumPy.",
+)
+async def api_related_papers(arxiv_id: str, limit: int = 10):
+    if not arxiv_service.ARXIV_ID_RE.match(arxiv_id):
+        raise HTTPException(status_code=400, detail="Invalid arXiv id.")
+    if limit < 1 or limit > 50:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 50.")
+    if related.get_related_index() is None:
+        if not related.available():
+            raise HTTPException(status_code=501, detail="Related papers require NumPy (pip install numpy).")
+        raise HTTPException(status_code=503, detail="Related papers are not enabled, or still loading.")
+    try:
+        matches = await arxiv_service.get_related_papers(arxiv_id, limit)
+    except LookupError:
+        raise HTTPException(status_code=404, detail=f"Paper {arxiv_id} not found.")
+    except QueueDeadlineExceeded as e:
+        raise upstream_busy(e)
+    except Exception as e:
+        logger.error(f"Error in /papers/{arxiv_id}/related endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An unexpected error occurred while finding related papers.")
+    with STAGE_SECONDS.time(stage="encode"):
+        content = dumps([{"paper": paper_to_dict(paper), "score": score} for paper, score in matches])
+    return Response(content=content, media_type="application/json")
+
+@app.get("/cache/stats", summary="Response Cache Statistics", description="Hit, miss and eviction counters for the upstream response cache, plus request-coalescing counters and, when configured, this worker's shared cache counters.")
+async def api_cache_stats():
+    stats = {**arxiv_service.get_cache_stats(), "coalescing": arxiv_service.get_coalescing_stats()}
+    shared_stats = arxiv_service.get_shared_cache_stats()
+    if shared_stats is not None:
+        stats["shared"] = shared_stats
+    return stats
+
+@app.get("/upstream/stats", summary="Upstream Scheduler Statistics", description="Running requests, queue depth and wait times per priority lane of the arXiv request scheduler.")
+async def api_upstream_stats():
+    return arxiv_service.get_scheduler().snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse, summary="Prometheus Metrics", description="Request and per-stage latency histograms, upstream and cache counters, in Prometheus text format.")
+async def api_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # To run the app (for development):
 # uvicorn main:app --reload
\ No newline at end of file
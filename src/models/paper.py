@@ -1,5 +1,35 @@
-from pydantic import BaseModel, HttpUrl
-from typing import List, Optional
+from pydantic import AfterValidator, BaseModel, HttpUrl, TypeAdapter, WithJsonSchema
+from typing import Annotated, Any, Dict, List, Optional, Set, Type, TypeVar
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_set_attribute = object.__setattr__
+# The instance state model_construct sets; with any other layout, _construct falls back to it
+_FAST_CONSTRUCT = tuple(BaseModel.__slots__) == ("__dict__", "__pydantic_fields_set__", "__pydantic_extra__", "__pydantic_private__")
+
+def _check_http_url(value: str) -> str:
+    HttpUrl(value)
+    return value
+
+# An http(s) URL, kept as the string given: trusted Papers skip parsing it, and still compare
+# equal to validated ones and serialize the same. Its schema is HttpUrl's
+PdfUrl = Annotated[str, AfterValidator(_check_http_url), WithJsonSchema(TypeAdapter(HttpUrl).json_schema())]
+
+def _construct(cls: Type[ModelT], values: Dict[str, Any], fields_set: Set[str]) -> ModelT:
+    """
+    Sets a model instance's state directly. This is what BaseModel.model_construct does once it
+    has resolved defaults, without its per-field Python loop, which makes model_construct
+    slower than validating in pydantic 2. `values` must contain every field; `fields_set` is
+    copied for the instance.
+    """
+    if not _FAST_CONSTRUCT:
+        return cls.model_construct(set(fields_set), **values)
+    instance = cls.__new__(cls)
+    _set_attribute(instance, "__dict__", values)
+    _set_attribute(instance, "__pydantic_fields_set__", set(fields_set))
+    _set_attribute(instance, "__pydantic_extra__", None)
+    _set_attribute(instance, "__pydantic_private__", None)
+    return instance
 
 class PaperAuthor(BaseModel):
     name: str
@@ -11,5 +41,70 @@ class Paper(BaseModel):
     authors: List[PaperAuthor]
     published_date: str 
     updated_date: Optional[str] = None
-    pdf_url: Optional[HttpUrl] = None
+    pdf_url: Optional[PdfUrl] = None
     categories: Optional[List[str]] = None
+
+    @classmethod
+    def from_trusted(
+        cls,
+        arxiv_id: str,
+        title: str,
+        summary: str,
+        author_names: List[str],
+        published_date: str,
+        updated_date: Optional[str] = None,
+        pdf_url: Optional[str] = None,
+        categories: Optional[List[str]] = None,
+    ) -> "Paper":
+        """
+        Builds a Paper from values we parsed or stored ourselves, skipping validation.
+        """
+        return _construct(cls, {
+            "arxiv_id": arxiv_id,
+            "title": title,
+            "summary": summary,
+            "authors": [_construct(PaperAuthor, {"name": name}, _AUTHOR_FIELDS) for name in author_names],
+            "published_date": published_date,
+            "updated_date": updated_date,
+            "pdf_url": pdf_url,
+            "categories": categories,
+        }, _PAPER_FIELDS)
+
+_AUTHOR_FIELDS = set(PaperAuthor.model_fields)
+_PAPER_FIELDS = set(Paper.model_fields)
+
+class PaperCard(BaseModel):
+    # Compact list-page form of a Paper (view=card); `fields` may leave out any of these
+    arxiv_id: Optional[str] = None
+    title: Optional[str] = None
+    summary: Optional[str] = None # Cut to the first few hundred characters
+    authors: Optional[List[PaperAuthor]] = None # The first few
+    published_date: Optional[str] = None
+    updated_date: Optional[str] = None
+    pdf_url: Optional[PdfUrl] = None
+    categories: Optional[List[str]] = None
+    author_count: Optional[int] = None
+
+class PaperBatch(BaseModel):
+    papers: List[Paper]
+    missing: List[str] # Ids arXiv does not know
+    unavailable: List[str] # Ids whose lookup failed upstream; worth retrying
+
+class RelatedPaper(BaseModel):
+    paper: Paper
+    score: float # Cosine similarity of the TF-IDF vectors, 0 to 1
+
+class Suggestion(BaseModel):
+    text: str # Title, author name or category code as it appears on papers
+    kind: str # 'title', 'author' or 'category'
+    papers: int # How many known papers it occurs in
+
+class Facets(BaseModel):
+    total: int # Locally stored papers matching all filters
+    categories: Dict[str, int] # Per category, with the date filters applied
+    months: Dict[str, int] # Per 'YYYY-MM', with the category filters applied
+    days: Dict[str, int] # Per 'YYYY-MM-DD', for the newest days in the date range
+
+class FacetedPapers(BaseModel):
+    papers: List[Paper]
+    facets: Facets
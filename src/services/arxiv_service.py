@@ -1,9 +1,31 @@
+import asyncio
 import httpx
-import feedparser
+import json
 import logging
-from typing import List, Optional
+import re
+import sys
+import time
+import urllib.parse
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import date
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
 
-from src.models.paper import Paper, PaperAuthor
+from src.config import env_bool, env_float, env_int, env_str
+from src.models.paper import Paper
+from src.services import facets, planner, related, serialization, shared_cache, suggest
+from src.services.atom_parser import iter_papers, parse_stream
+from src.services.cache import CacheLookup, ResponseCache
+from src.services.coalesce import SingleFlight
+from src.services.facets import FacetCounts, FacetFilter
+from src.services.http_client import HttpClientSettings
+from src.services.metrics import REGISTRY, STAGE_SECONDS, UPSTREAM_REQUESTS, UPSTREAM_RESPONSE_BYTES, Samples
+from src.services.pagination import Cursor, FeedSnapshot, InvalidCursor
+from src.services.scheduler import Priority, QueueDeadlineExceeded, UpstreamScheduler
+from src.services.serialization import PaperList, decode_papers
+
+if TYPE_CHECKING:
+    from src.services.paper_store import PaperStore
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -11,102 +33,1146 @@ logger = logging.getLogger(__name__)
 
 ARXIV_API_URL = "http://export.arxiv.org/api/query?"
 
-async def fetch_papers(
-    search_query: str,
-    start: int = 0,
-    max_results: int = 10,
-    sortBy: str = "submittedDate",
-    sortOrder: str = "descending"
-) -> List[Paper]:
+# New-style (2301.00001v2) and old-style (hep-th/9901001v1, math.CO/0101001) arXiv ids
+ARXIV_ID_RE = re.compile(r"^(?:\d{4}\.\d{4,5}|[a-z-]+(?:\.[A-Z]{2})?/\d{7})(?:v\d+)?$")
+_VERSION_SUFFIX_RE = re.compile(r"v\d+$")
+
+# Per-request logging of upstream URLs and parameters is only emitted at INFO when enabled;
+# otherwise it goes to DEBUG, and the URL is not even formatted unless DEBUG is on
+LOG_UPSTREAM_REQUESTS = env_bool("ARXIV_LOG_UPSTREAM_REQUESTS", False)
+_REQUEST_LOG_LEVEL = logging.INFO if LOG_UPSTREAM_REQUESTS else logging.DEBUG
+
+# Categories of the latest feed: AI, Math (Combinatorics), and Physics (High Energy Physics)
+LATEST_CATEGORIES = ["cs.AI", "math.CO", "physics.hep-ph"]
+LATEST_SEARCH_QUERY = " OR ".join(f"cat:{category}" for category in LATEST_CATEGORIES)
+
+# Per-endpoint cache TTLs: the latest feed only changes a few times a day, searches churn faster
+LATEST_CACHE_TTL = env_float("ARXIV_CACHE_LATEST_TTL", 1800.0)
+SEARCH_CACHE_TTL = env_float("ARXIV_CACHE_SEARCH_TTL", 600.0)
+
+_response_cache = ResponseCache(
+    max_entries=env_int("ARXIV_CACHE_MAX_ENTRIES", 512),
+    max_bytes=env_int("ARXIV_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+    stale_ttl=env_float("ARXIV_CACHE_STALE_TTL", 3600.0),
+    sizeof=lambda papers: _estimate_papers_size(papers),
+)
+# Single papers by id (as requested, versioned or not), filled by id lookups
+_paper_cache = ResponseCache(
+    max_entries=env_int("ARXIV_CACHE_MAX_PAPERS", 10000),
+    max_bytes=env_int("ARXIV_CACHE_MAX_PAPER_BYTES", 16 * 1024 * 1024),
+    sizeof=lambda paper: _estimate_papers_size([paper]),
+)
+# Ordered snapshots that cursors are resolved against, one per (query, sort); they expire with the query's TTL
+_snapshots = ResponseCache(max_entries=env_int("ARXIV_SNAPSHOT_MAX_ENTRIES", 64))
+# Every upstream request waits here for a rate token and a concurrency slot, in priority order
+_scheduler = UpstreamScheduler.from_env()
+
+# Identical concurrent upstream queries share one request, with or without caching
+_coalescer = SingleFlight()
+_refreshing_keys: Set[Tuple] = set()
+_background_tasks: Set[asyncio.Task] = set()
+
+# Queries asking for more than FANOUT_PAGE_SIZE results are split into pages fetched concurrently
+# (0 disables). Off by default: under arXiv's pacing one large request beats several paced pages
+FANOUT_PAGE_SIZE = env_int("ARXIV_FANOUT_PAGE_SIZE", 0)
+
+# Bulk export pages through arXiv in chunks of EXPORT_PAGE_SIZE, up to EXPORT_MAX_RESULTS per request
+EXPORT_PAGE_SIZE = env_int("ARXIV_EXPORT_PAGE_SIZE", 500)
+EXPORT_MAX_RESULTS = env_int("ARXIV_EXPORT_MAX_RESULTS", 10000)
+
+# Cursor pagination extends per-query snapshots in upstream pages of SNAPSHOT_PAGE_SIZE, up to SNAPSHOT_MAX_PAPERS each
+SNAPSHOT_PAGE_SIZE = env_int("ARXIV_SNAPSHOT_PAGE_SIZE", 100)
+SNAPSHOT_MAX_PAPERS = env_int("ARXIV_SNAPSHOT_MAX_PAPERS", 5000)
+
+# Id lookups are sent upstream as id_list requests of at most BY_IDS_BATCH_SIZE ids; BY_IDS_MAX caps one lookup
+BY_IDS_BATCH_SIZE = env_int("ARXIV_BY_IDS_BATCH_SIZE", 100)
+BY_IDS_MAX = env_int("ARXIV_BY_IDS_MAX", 500)
+# A given version's metadata never changes; versionless ids may gain a newer version meanwhile
+PAPER_CACHE_TTL = env_float("ARXIV_CACHE_PAPER_TTL", 21600.0)
+
+# "arxiv" proxies keyword searches upstream; "local" answers them from the paper store's FTS index
+SEARCH_BACKEND = env_str("ARXIV_SEARCH_BACKEND", "arxiv")
+
+# Optional persistent store, installed by main.py when ARXIV_STORE_PATH is set
+_paper_store: Optional["PaperStore"] = None
+
+# Application-scoped client installed by the FastAPI lifespan hook in main.py
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Cache tier shared by the worker processes of a host, installed by main.py when ARXIV_SHARED_CACHE_PATH is set
+_shared_cache: Optional[shared_cache.SharedCache] = None
+
+class PartialFetchError(Exception):
     """
-    Fetches papers from the arXiv API based on a search query and other parameters.
+    Raised when some pages of a fanned-out query failed. Carries the papers of the pages that
+    succeeded, in order, and the first page error as its cause.
+    """
+
+    def __init__(self, papers: List[Paper], errors: List[BaseException]):
+        super().__init__(f"{len(errors)} page(s) failed; returning {len(papers)} papers from the rest")
+        self.papers = papers
+        self.errors = errors
+
+@dataclass
+class PaperLookup:
+    """
+    Result of an id lookup, in request order. `missing` ids are unknown to arXiv; `unavailable`
+    ids could not be looked up because their upstream request failed.
+    """
+    papers: List[Paper] = field(default_factory=PaperList)
+    missing: List[str] = field(default_factory=list)
+    unavailable: List[str] = field(default_factory=list)
+
+def set_http_client(client: Optional[httpx.AsyncClient]) -> None:
+    """
+    Installs (or clears, with None) the shared pooled client used for upstream requests.
+    """
+    global _http_client
+    _http_client = client
+
+def get_http_client() -> Optional[httpx.AsyncClient]:
+    return _http_client
+
+def set_scheduler(scheduler: UpstreamScheduler) -> None:
+    global _scheduler
+    _scheduler = scheduler
+
+def get_scheduler() -> UpstreamScheduler:
+    return _scheduler
+
+def set_shared_cache(cache: Optional[shared_cache.SharedCache]) -> None:
+    global _shared_cache
+    _shared_cache = cache
+
+def get_shared_cache() -> Optional[shared_cache.SharedCache]:
+    return _shared_cache
+
+def set_paper_store(store: Optional["PaperStore"]) -> None:
+    """
+    Installs (or clears, with None) the local paper store. Fetched papers are written through to it.
+    """
+    global _paper_store
+    _paper_store = store
+
+def get_paper_store() -> Optional["PaperStore"]:
+    return _paper_store
+
+def _spawn_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def _store_papers(papers: List[Paper]) -> None:
+    store = _paper_store
+    if store is not None and papers:
+        try:
+            await asyncio.to_thread(store.upsert_papers, papers)
+        except Exception as e:
+            logger.warning(f"Failed to write {len(papers)} papers to the local store: {e}")
+    await index_papers(papers)
+
+async def index_papers(papers: List[Paper]) -> None:
+    """
+    Adds papers to the related-paper and suggestion indexes, where installed, and brings the
+    facet index up to date with the store they were written to.
+    """
+    if not papers:
+        return
+    await refresh_facets(force=True)
+    for name, index in (("related", related.get_related_index()), ("suggestion", suggest.get_suggest_index())):
+        if index is None:
+            continue
+        try:
+            await asyncio.to_thread(index.add, papers)
+        except Exception as e:
+            logger.warning(f"Failed to add {len(papers)} papers to the {name} index: {e}")
+
+async def refresh_facets(force: bool = False) -> None:
+    """
+    Indexes papers stored since the facet index was last refreshed. Unless forced, only once
+    the index is older than facets.REFRESH_INTERVAL: other processes may write to the store.
+    """
+    index = facets.get_facet_index()
+    store = _paper_store
+    if index is None or store is None or not (force or index.stale()):
+        return
+    try:
+        await asyncio.to_thread(index.refresh, store)
+    except Exception as e:
+        logger.warning(f"Failed to refresh the facet index: {e}")
+
+def _write_through(papers: List[Paper]) -> None:
+    """
+    Keeps fetched papers in the per-id cache, so that looking up a paper just listed (e.g. to
+    expand its card) needs no upstream request, and persists them in the background: to the
+    local store and the paper indexes.
+    """
+    for paper in papers:
+        _paper_cache.set(paper.arxiv_id, paper, PAPER_CACHE_TTL)
+    if papers and (
+        _paper_store is not None or related.get_related_index() is not None or suggest.get_suggest_index() is not None
+    ):
+        _spawn_background(_store_papers(papers))
+
+@asynccontextmanager
+async def _client_scope(client: Optional[httpx.AsyncClient] = None) -> AsyncIterator[httpx.AsyncClient]:
     """
-    query_params = {
+    Yields the explicitly injected client, else the shared one. Only when neither exists
+    (e.g. scripts or tests running without the app lifespan) is a throwaway client created.
+    """
+    if client is None:
+        client = _http_client
+    if client is not None:
+        yield client
+        return
+    settings = HttpClientSettings.from_env()
+    async with httpx.AsyncClient(timeout=settings.timeout) as temporary_client:
+        yield temporary_client
+
+def _build_query_params(search_query: str, start: int, max_results: int, sortBy: str, sortOrder: str) -> Dict[str, Any]:
+    return {
         "search_query": search_query,
         "start": start,
         "max_results": max_results,
         "sortBy": sortBy,
         "sortOrder": sortOrder,
     }
-    
+
+def _cache_key(query_params: Dict[str, Any]) -> Tuple:
+    """
+    Normalized (search_query, start, max_results, sortBy, sortOrder) tuple identifying an upstream query.
+    """
+    return (
+        " ".join(str(query_params["search_query"]).split()),
+        int(query_params["start"]),
+        int(query_params["max_results"]),
+        query_params["sortBy"],
+        query_params["sortOrder"],
+    )
+
+def _shared_key(key: Tuple) -> str:
+    return json.dumps(key)
+
+def _from_shared(key: Tuple, fresh_only: bool = False) -> Optional[CacheLookup]:
+    """
+    Looks a result page up in the cross-worker cache. A hit is copied into the in-process
+    cache, which then serves the key until it expires.
+    """
+    cache = _shared_cache
+    if cache is None:
+        return None
     try:
-        async with httpx.AsyncClient() as client:
-            # Construct the full URL for logging
-            import urllib.parse
-            full_url = f"{ARXIV_API_URL}{urllib.parse.urlencode(query_params)}"
-            logger.info(f"Fetching papers from arXiv. URL: {full_url}")
-            # The previous log for params is still useful for a structured view
-            logger.info(f"Query parameters: {query_params}")
-            response = await client.get(ARXIV_API_URL, params=query_params)
-            response.raise_for_status()  # Raise an exception for bad status codes
-
-        feed = feedparser.parse(response.text)
-        
-        papers = []
-        for entry in feed.entries:
-            # Extract arXiv ID
-            arxiv_id_raw = entry.get("id", "")
-            arxiv_id = arxiv_id_raw.split('/abs/')[-1] if '/abs/' in arxiv_id_raw else arxiv_id_raw
-
-            # Find PDF link
-            pdf_url = None
-            for link in entry.get("links", []):
-                if link.get("type") == "application/pdf":
-                    pdf_url = link.get("href")
-                    break
-            if not pdf_url and entry.get("link"):  # Fallback if PDF link type is not explicit
-                if "/abs/" in entry.link:
-                    pdf_url = entry.link.replace('/abs/', '/pdf/')
-
-            paper_authors = [PaperAuthor(name=author.get("name", "N/A")) for author in entry.get("authors", [])]
-            
-            paper_data = Paper(
-                arxiv_id=arxiv_id,
-                title=entry.get("title", "N/A"),
-                summary=entry.get("summary", "N/A").strip(),
-                authors=paper_authors,
-                published_date=entry.get("published", "N/A"),
-                updated_date=entry.get("updated", entry.get("published", "N/A")), # Fallback to published_date if updated is missing
-                pdf_url=pdf_url,
-                categories=[tag.get('term', 'N/A') for tag in entry.get('tags', [])]
-            )
-            papers.append(paper_data)
-        
-        logger.info(f"Successfully fetched {len(papers)} papers.")
+        entry = cache.get(_shared_key(key))
+    except Exception as e:
+        logger.warning(f"Shared cache lookup failed for {key}: {e}")
+        return None
+    now = time.time()
+    if entry is None or (fresh_only and now >= entry.fresh_until):
+        return None
+    papers = decode_papers(entry.body, entry.fetched_at)
+    papers.validators = entry.validators
+    _response_cache.set(key, papers, max(0.0, entry.fresh_until - now), entry.stale_until - max(now, entry.fresh_until))
+    return CacheLookup(papers, is_stale=now >= entry.fresh_until)
+
+async def _to_shared(key: Tuple, papers: List[Paper], ttl: float) -> None:
+    cache = _shared_cache
+    if cache is None or not isinstance(papers, PaperList):
+        return
+    try:
+        await asyncio.to_thread(
+            cache.set, _shared_key(key), papers.json_bytes(), ttl, _response_cache.stale_ttl, papers.fetched_at, papers.validators
+        )
+    except Exception as e:
+        logger.warning(f"Failed to write {key} to the shared cache: {e}")
+
+async def _with_shared_lease(key: Tuple, fetch: Callable[[], Awaitable[List[Paper]]]) -> List[Paper]:
+    """
+    Runs `fetch` holding the key's cross-worker lease, so that one worker per host fetches a
+    missing or expired page. While another worker holds the lease, waits for its result to
+    appear in the shared cache instead; a lease whose holder died expires on its own.
+    """
+    cache = _shared_cache
+    shared_key = _shared_key(key)
+    while True:
+        lookup = _from_shared(key, fresh_only=True)
+        if lookup is not None:
+            return lookup.value
+        try:
+            if await asyncio.to_thread(cache.acquire_lease, shared_key):
+                break
+        except Exception as e:
+            logger.warning(f"Shared cache lease failed for {key}; fetching without it: {e}")
+            return await fetch()
+        await asyncio.sleep(shared_cache.LEASE_POLL_INTERVAL)
+    try:
+        return await fetch()
+    finally:
+        try:
+            await asyncio.to_thread(cache.release_lease, shared_key)
+        except Exception as e:
+            logger.warning(f"Failed to release the shared cache lease for {key}: {e}")
+
+def _estimate_papers_size(papers: List[Paper]) -> int:
+    """
+    Rough byte size of a result page, used to bound the response cache. A PaperList also counts
+    the bodies it memoizes as it is served, none larger than its JSON: the JSON itself, up to
+    PROJECTION_MEMO_MAX projections and its compressed forms.
+    """
+    size = 64
+    text = 0
+    for paper in papers:
+        size += 256
+        text += len(paper.arxiv_id) + len(paper.title) + len(paper.summary)
+        text += sum(len(author.name) + 16 for author in paper.authors)
+        text += sum(len(category) + 8 for category in paper.categories or [])
+    if isinstance(papers, PaperList):
+        text *= 3 + serialization.PROJECTION_MEMO_MAX
+    return size + text
+
+@asynccontextmanager
+async def _open_upstream(http: httpx.AsyncClient, query_params: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> AsyncIterator[httpx.Response]:
+    """
+    Opens a streamed upstream request, recording its outcome and time to response headers.
+    Error statuses are raised after the body has been read for the error log; a 304 answer
+    to a conditional request is passed through.
+    """
+    if logger.isEnabledFor(_REQUEST_LOG_LEVEL):
+        logger.log(_REQUEST_LOG_LEVEL, f"Fetching papers from arXiv. URL: {ARXIV_API_URL}{urllib.parse.urlencode(query_params)}")
+        logger.log(_REQUEST_LOG_LEVEL, f"Query parameters: {query_params}")
+    started = time.perf_counter()
+    responded = False
+    try:
+        async with http.stream("GET", ARXIV_API_URL, params=query_params, headers=headers) as response:
+            responded = True
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="upstream_headers")
+            UPSTREAM_REQUESTS.inc(status=str(response.status_code))
+            if response.is_error:
+                await response.aread() # Make the body available to the error log
+            if response.status_code != 304:
+                response.raise_for_status()  # Raise an exception for bad status codes
+            yield response
+    except httpx.RequestError:
+        if not responded:
+            UPSTREAM_REQUESTS.inc(status="error")
+        raise
+
+class _MeteredBody:
+    """
+    Wraps a response byte stream, counting bytes and the time spent waiting for them, so the
+    download can be told apart from the parsing done between chunks.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks
+        self.bytes = 0
+        self.wait_seconds = 0.0
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        iterator = self._chunks.__aiter__()
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                self.wait_seconds += time.perf_counter() - started
+            self.bytes += len(chunk)
+            yield chunk
+
+def _conditional_headers(previous: Optional[List[Paper]]) -> Optional[Dict[str, str]]:
+    if not isinstance(previous, PaperList) or not previous.validators:
+        return None
+    headers = {}
+    if "etag" in previous.validators:
+        headers["If-None-Match"] = previous.validators["etag"]
+    if "last-modified" in previous.validators:
+        headers["If-Modified-Since"] = previous.validators["last-modified"]
+    return headers
+
+async def _fetch_from_arxiv(query_params: Dict[str, Any], client: Optional[httpx.AsyncClient] = None, priority: Priority = Priority.INTERACTIVE, previous: Optional[List[Paper]] = None) -> List[Paper]:
+    """
+    Performs one upstream request and parses the feed. Errors are raised, not swallowed.
+    When `previous` (an earlier result for the same query) carries upstream validators, the
+    request is conditional and a 304 answer returns `previous` itself, marked as fresh again.
+    """
+    queued_at = time.perf_counter()
+    async with _scheduler.slot(priority), _client_scope(client) as http:
+        STAGE_SECONDS.observe(time.perf_counter() - queued_at, stage="queue")
+        async with _open_upstream(http, query_params, _conditional_headers(previous)) as response:
+            if response.status_code == 304 and previous is not None:
+                previous.fetched_at = time.time()
+                logger.log(_REQUEST_LOG_LEVEL, f"arXiv reports {len(previous)} papers unchanged.")
+                return previous
+            # Entries are parsed while the body downloads instead of after buffering it as text
+            body = _MeteredBody(response.aiter_bytes())
+            body_started = time.perf_counter()
+            papers = PaperList(await parse_stream(body), fetched_at=time.time())
+            STAGE_SECONDS.observe(body.wait_seconds, stage="download")
+            STAGE_SECONDS.observe(time.perf_counter() - body_started - body.wait_seconds, stage="parse")
+            UPSTREAM_RESPONSE_BYTES.observe(body.bytes)
+            papers.validators = {
+                name: response.headers[name] for name in ("etag", "last-modified") if name in response.headers
+            }
+
+    logger.log(_REQUEST_LOG_LEVEL, f"Successfully fetched {len(papers)} papers.")
+    return papers
+
+def _page_params(query_params: Dict[str, Any], page_size: int) -> List[Dict[str, Any]]:
+    start, total = int(query_params["start"]), int(query_params["max_results"])
+    return [
+        dict(query_params, start=start + offset, max_results=min(page_size, total - offset))
+        for offset in range(0, total, page_size)
+    ]
+
+async def _fetch_pages(query_params: Dict[str, Any], client: Optional[httpx.AsyncClient] = None, priority: Priority = Priority.INTERACTIVE, page_size: Optional[int] = None) -> List[Paper]:
+    """
+    Splits one large query into fixed-size pages that are requested concurrently (the scheduler
+    still paces them) and merges them back in order, dropping papers repeated across page
+    boundaries. A short page marks the end of the results, so later pages still queued are
+    cancelled. If some pages fail, PartialFetchError carries what the others returned; a page
+    rejected by the scheduler's queue deadline fails the whole query with QueueDeadlineExceeded.
+    """
+    pages = _page_params(query_params, page_size or FANOUT_PAGE_SIZE)
+    tasks = [asyncio.create_task(_fetch_from_arxiv(params, client, priority)) for params in pages]
+    index_of = {task: index for index, task in enumerate(tasks)}
+    results: List[Optional[List[Paper]]] = [None] * len(tasks)
+    errors: Dict[int, BaseException] = {}
+    end = len(tasks) # Pages from here on lie past the last result
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = index_of[task]
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    errors[index] = task.exception()
+                    continue
+                results[index] = task.result()
+                if len(results[index]) < pages[index]["max_results"] and index + 1 < end:
+                    end = index + 1
+                    for later in tasks[end:]:
+                        later.cancel()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    merged = PaperList()
+    seen: Set[str] = set()
+    for papers in results[:end]:
+        for paper in papers or []:
+            if paper.arxiv_id not in seen:
+                seen.add(paper.arxiv_id)
+                merged.append(paper)
+
+    page_errors = [errors[index] for index in sorted(errors) if index < end]
+    for error in page_errors:
+        if isinstance(error, QueueDeadlineExceeded):
+            raise error
+    if page_errors:
+        if len(page_errors) == end:
+            raise page_errors[0] # Nothing succeeded; behave like a single failed request
+        merged.partial = True
+        raise PartialFetchError(merged, page_errors) from page_errors[0]
+    merged.fetched_at = time.time()
+    return merged
+
+async def _load(key: Tuple, query_params: Dict[str, Any], client: Optional[httpx.AsyncClient], cache_ttl: Optional[float], write_through: bool = True, priority: Priority = Priority.INTERACTIVE, previous: Optional[List[Paper]] = None) -> List[Paper]:
+    """
+    Fetches through the single-flight layer, storing the result when caching is requested.
+    `previous` is the stale result being refreshed, used to make the upstream request conditional.
+    Cached queries also go through the shared cache's lease, and their results into it.
+    """
+    async def flight() -> List[Paper]:
+        # Pages only run concurrently, and so only pay off, when the scheduler admits several at once
+        if FANOUT_PAGE_SIZE > 0 and int(query_params["max_results"]) > FANOUT_PAGE_SIZE and _scheduler.max_concurrency > 1:
+            try:
+                papers = await _fetch_pages(query_params, client, priority)
+            except PartialFetchError as e:
+                # Partial pages are never cached, but what arrived is still worth keeping
+                if write_through:
+                    _write_through(e.papers)
+                raise
+        else:
+            papers = await _fetch_from_arxiv(query_params, client, priority, previous)
+        if cache_ttl is not None:
+            _response_cache.set(key, papers, cache_ttl)
+            await _to_shared(key, papers, cache_ttl)
+        if papers is previous:
+            return papers # Unchanged upstream; already stored
+        if write_through:
+            _write_through(papers)
         return papers
 
+    if cache_ttl is not None and _shared_cache is not None:
+        return await _coalescer.do(key, lambda: _with_shared_lease(key, flight))
+    return await _coalescer.do(key, flight)
+
+def get_response_cache() -> ResponseCache:
+    return _response_cache
+
+def get_cache_stats() -> Dict[str, int]:
+    stats = _response_cache.stats.as_dict()
+    stats["entries"] = len(_response_cache)
+    stats["bytes"] = _response_cache.total_bytes
+    return stats
+
+def get_shared_cache_stats() -> Optional[Dict[str, int]]:
+    return _shared_cache.stats.as_dict() if _shared_cache is not None else None
+
+def get_coalescing_stats() -> Dict[str, int]:
+    stats = _coalescer.stats.as_dict()
+    stats["inflight"] = len(_coalescer)
+    return stats
+
+def _collect_scheduler_requests() -> Samples:
+    samples = []
+    for priority, lane in _scheduler.stats.lanes.items():
+        samples.append(({"priority": priority.name.lower(), "outcome": "granted"}, lane.granted))
+        samples.append(({"priority": priority.name.lower(), "outcome": "rejected"}, lane.rejected))
+    return samples
+
+# Counters kept by the cache, coalescer and scheduler, exposed on /metrics as they are read
+REGISTRY.collected(
+    "arxiv_cache_events_total", "Response cache lookups and removals by event.", "counter",
+    lambda: [({"event": event}, value) for event, value in _response_cache.stats.as_dict().items()],
+)
+REGISTRY.collected("arxiv_cache_entries", "Result pages held in the response cache.", "gauge", lambda: [({}, len(_response_cache))])
+REGISTRY.collected("arxiv_cache_bytes", "Estimated size of the response cache.", "gauge", lambda: [({}, _response_cache.total_bytes)])
+REGISTRY.collected(
+    "arxiv_coalescing_events_total", "Upstream flights started, and callers that joined one already in flight.", "counter",
+    lambda: [({"event": event}, value) for event, value in _coalescer.stats.as_dict().items()],
+)
+REGISTRY.collected(
+    "arxiv_shared_cache_events_total", "This worker's shared cache lookups, writes, evictions and lease waits by event.", "counter",
+    lambda: [({"event": event}, value) for event, value in (get_shared_cache_stats() or {}).items()],
+)
+REGISTRY.collected("arxiv_paper_cache_entries", "Papers held in the per-id cache.", "gauge", lambda: [({}, len(_paper_cache))])
+REGISTRY.collected("arxiv_scheduler_running", "Upstream requests holding a scheduler slot.", "gauge", lambda: [({}, _scheduler.running)])
+REGISTRY.collected(
+    "arxiv_scheduler_queue_depth", "Upstream requests waiting for a scheduler slot.", "gauge",
+    lambda: [({"priority": priority.name.lower()}, _scheduler.queue_depth(priority)) for priority in Priority],
+)
+REGISTRY.collected("arxiv_scheduler_requests_total", "Scheduler admissions by priority and outcome.", "counter", _collect_scheduler_requests)
+REGISTRY.collected(
+    "arxiv_scheduler_wait_seconds_total", "Total time granted requests spent queued, by priority.", "counter",
+    lambda: [({"priority": priority.name.lower()}, lane.wait_seconds_total) for priority, lane in _scheduler.stats.lanes.items()],
+)
+
+def freshness_lifetime(papers: List[Paper], ttl: float) -> Optional[int]:
+    """
+    Seconds `papers` stay fresh under `ttl`, counted from when they were fetched upstream.
+    None when their age is unknown: local search results, partial and failed fetches.
+    """
+    fetched_at = getattr(papers, "fetched_at", None)
+    if fetched_at is None:
+        return None
+    return max(0, int(ttl - (time.time() - fetched_at)))
+
+def stale_lifetime() -> int:
+    """
+    Seconds past expiry during which a cached page is still served while it is refreshed.
+    """
+    return int(_response_cache.stale_ttl)
+
+def clear_cache() -> None:
+    _response_cache.clear()
+    _paper_cache.clear()
+    _snapshots.clear()
+    _coalescer.clear()
+
+def _schedule_refresh(key: Tuple, query_params: Dict[str, Any], ttl: float, client: Optional[httpx.AsyncClient], stale: Optional[List[Paper]] = None) -> None:
+    """
+    Starts at most one background refresh per stale key; the stale value keeps being served meanwhile.
+    """
+    if key in _refreshing_keys:
+        return
+    _refreshing_keys.add(key)
+
+    async def refresh() -> None:
+        try:
+            await _load(key, query_params, client, ttl, priority=Priority.BACKGROUND, previous=stale)
+        except Exception as e:
+            logger.warning(f"Background refresh failed for {key}; keeping stale entry: {e}")
+        finally:
+            _refreshing_keys.discard(key)
+
+    _spawn_background(refresh())
+
+async def fetch_papers(
+    search_query: str,
+    start: int = 0,
+    max_results: int = 10,
+    sortBy: str = "submittedDate",
+    sortOrder: str = "descending",
+    client: Optional[httpx.AsyncClient] = None,
+    cache_ttl: Optional[float] = None,
+    write_through: bool = True,
+    raise_on_error: bool = False,
+    priority: Priority = Priority.INTERACTIVE
+) -> List[Paper]:
+    """
+    Fetches papers from the arXiv API based on a search query and other parameters.
+    Uses `client` if given, otherwise the shared application client.
+    When `cache_ttl` is set, results are served from and stored in the response cache, and in
+    the cache shared with other worker processes when one is installed.
+    Large queries are fetched as concurrent pages of FANOUT_PAGE_SIZE when enabled; if only
+    some pages fail, the papers of the others are returned marked `partial` (PartialFetchError
+    with `raise_on_error`).
+    Errors are logged and yield an empty list unless `raise_on_error` is set; the request
+    waits in the upstream scheduler's `priority` lane, and QueueDeadlineExceeded is always raised.
+    """
+    query_params = _build_query_params(search_query, start, max_results, sortBy, sortOrder)
+
+    key = _cache_key(query_params)
+    try:
+        if cache_ttl is not None:
+            cached = _response_cache.get(key) or _from_shared(key)
+            if cached is not None:
+                if cached.is_stale:
+                    _schedule_refresh(key, query_params, cache_ttl, client, cached.value)
+                return cached.value
+
+        return await _load(key, query_params, client, cache_ttl, write_through, priority)
+
+    except QueueDeadlineExceeded as e:
+        logger.warning(f"Upstream request rejected by scheduler: {e}")
+        raise
+    except PartialFetchError as e:
+        logger.warning(f"Partial results for {key}: {e}", exc_info=e.__cause__)
+        if raise_on_error:
+            raise
+        return e.papers
     except httpx.HTTPStatusError as e:
         logger.error(f"HTTP error occurred: {e.response.status_code} - {e.response.text}", exc_info=True)
+        if raise_on_error:
+            raise
         return []
     except httpx.RequestError as e:
         logger.error(f"Request error occurred: {e}", exc_info=True)
+        if raise_on_error:
+            raise
         return []
     except Exception as e:
         logger.error(f"An unexpected error occurred in fetch_papers: {e}", exc_info=True)
+        if raise_on_error:
+            raise
         return []
 
-async def get_latest_papers(start: int = 0, max_results: int = 25) -> List[Paper]:
+async def _extend_snapshot(snapshot: FeedSnapshot, search_query: str, page_size: int, sortBy: str, sortOrder: str, client: Optional[httpx.AsyncClient], cache_ttl: float) -> None:
+    papers = await fetch_papers(
+        search_query, snapshot.next_offset, page_size, sortBy, sortOrder,
+        client=client, cache_ttl=cache_ttl, raise_on_error=True,
+    )
+    snapshot.extend(papers, page_size)
+
+async def _open_snapshot(cursor: Cursor, search_query: str, page_size: int, sortBy: str, sortOrder: str, client: Optional[httpx.AsyncClient], cache_ttl: float) -> Tuple[FeedSnapshot, int]:
+    """
+    Starts a snapshot at the cursor's offset hint and extends it until the cursor paper is
+    found. Papers published since push it further down, which extending absorbs; papers
+    withdrawn upstream pull it up, past the snapshot's start, so that is retried a page earlier.
+    """
+    start = cursor.offset
+    for _ in range(3):
+        snapshot = FeedSnapshot(start)
+        while len(snapshot) < SNAPSHOT_MAX_PAPERS:
+            await _extend_snapshot(snapshot, search_query, page_size, sortBy, sortOrder, client, cache_ttl)
+            position = snapshot.position_after(cursor)
+            if position is not None:
+                return snapshot, position
+            if snapshot.starts_after(cursor):
+                break
+        if start == 0:
+            break
+        start = max(0, start - page_size)
+    raise InvalidCursor("Cursor has expired; start again from the first page.")
+
+async def fetch_papers_after(
+    search_query: str,
+    cursor: Cursor,
+    max_results: int = 10,
+    sortBy: str = "submittedDate",
+    sortOrder: str = "descending",
+    client: Optional[httpx.AsyncClient] = None,
+    cache_ttl: float = LATEST_CACHE_TTL
+) -> List[Paper]:
+    """
+    The `max_results` papers following `cursor` in a query's ordering. Cursors are resolved by
+    paper id against an ordered snapshot of the query kept for `cache_ttl`, so a next page is a
+    slice of memory, with no duplicates or gaps when papers are published in between. The
+    snapshot is extended SNAPSHOT_PAGE_SIZE papers at a time as clients page past its end.
+    Errors are raised; InvalidCursor when the cursor's paper can no longer be located.
+    """
+    key = ("snapshot", " ".join(search_query.split()), sortBy, sortOrder)
+    page_size = max(max_results, SNAPSHOT_PAGE_SIZE)
+    cached = _snapshots.get(key)
+    snapshot = cached.value if cached is not None else None
+    position = snapshot.position_after(cursor) if snapshot is not None else None
+    if position is not None and len(snapshot) - position < max_results and not snapshot.exhausted and len(snapshot) >= SNAPSHOT_MAX_PAPERS:
+        position = None # Full; continue in a new snapshot from the cursor
+    if position is None:
+        snapshot, position = await _open_snapshot(cursor, search_query, page_size, sortBy, sortOrder, client, cache_ttl)
+        _snapshots.set(key, snapshot, cache_ttl)
+
+    async with snapshot.lock:
+        while len(snapshot) - position < max_results and not snapshot.exhausted and len(snapshot) < SNAPSHOT_MAX_PAPERS:
+            await _extend_snapshot(snapshot, search_query, page_size, sortBy, sortOrder, client, cache_ttl)
+    return PaperList(snapshot.papers[position:position + max_results], fetched_at=snapshot.fetched_at)
+
+def _base_id(arxiv_id: str) -> str:
+    return _VERSION_SUFFIX_RE.sub("", arxiv_id)
+
+def _id_batches(arxiv_ids: List[str], batch_size: int) -> List[List[str]]:
+    """
+    Splits ids into the fewest batches of at most `batch_size`, evenly sized so that the
+    concurrent requests take about as long as each other (120 ids: 60 + 60, not 100 + 20).
+    """
+    count = -(-len(arxiv_ids) // batch_size)
+    size = -(-len(arxiv_ids) // count) if count else 0
+    return [arxiv_ids[offset:offset + size] for offset in range(0, len(arxiv_ids), size or 1)]
+
+async def _fetch_id_batch(arxiv_ids: List[str], client: Optional[httpx.AsyncClient], priority: Priority) -> Dict[str, Paper]:
+    """
+    One id_list request, coalesced with identical ones in flight. Returns the papers found, keyed
+    by the requested id: versioned ids match exactly, versionless ones whatever version arXiv sent.
+    """
+    query_params = {"id_list": ",".join(arxiv_ids), "start": 0, "max_results": len(arxiv_ids)}
+    papers = await _coalescer.do(("id_list", tuple(arxiv_ids)), lambda: _fetch_from_arxiv(query_params, client, priority))
+    by_id = {paper.arxiv_id: paper for paper in papers}
+    by_base = {_base_id(paper.arxiv_id): paper for paper in papers}
+    found = {}
+    for arxiv_id in arxiv_ids:
+        paper = by_id.get(arxiv_id) or (by_base.get(arxiv_id) if arxiv_id == _base_id(arxiv_id) else None)
+        if paper is not None:
+            found[arxiv_id] = paper
+    return found
+
+async def fetch_papers_by_ids(
+    arxiv_ids: List[str],
+    client: Optional[httpx.AsyncClient] = None,
+    priority: Priority = Priority.INTERACTIVE,
+    batch_size: Optional[int] = None
+) -> PaperLookup:
+    """
+    Looks up papers by arXiv id (versioned or not), keeping the request order and dropping
+    repeated ids. Ids are served from the per-id cache, then the local store, and only the
+    remaining ones are requested upstream, as concurrent id_list batches of at most
+    BY_IDS_BATCH_SIZE. Fetched papers are cached and written through to the store.
+    A failed batch marks its ids unavailable; QueueDeadlineExceeded is always raised.
+    """
+    requested = list(dict.fromkeys(arxiv_ids))
+    found: Dict[str, Paper] = {}
+    for arxiv_id in requested:
+        cached = _paper_cache.get(arxiv_id)
+        if cached is not None:
+            found[arxiv_id] = cached.value
+
+    remaining = [arxiv_id for arxiv_id in requested if arxiv_id not in found]
+    if remaining and _paper_store is not None:
+        try:
+            stored = await asyncio.to_thread(_paper_store.get_papers, remaining)
+        except Exception as e:
+            logger.warning(f"Local store lookup of {len(remaining)} ids failed: {e}")
+            stored = {}
+        for arxiv_id, paper in stored.items():
+            _paper_cache.set(arxiv_id, paper, PAPER_CACHE_TTL)
+        found.update(stored)
+        remaining = [arxiv_id for arxiv_id in remaining if arxiv_id not in found]
+
+    unavailable: Set[str] = set()
+    if remaining:
+        batches = _id_batches(remaining, batch_size or BY_IDS_BATCH_SIZE)
+        results = await asyncio.gather(
+            *(_fetch_id_batch(batch, client, priority) for batch in batches), return_exceptions=True
+        )
+        fetched: List[Paper] = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, QueueDeadlineExceeded):
+                logger.warning(f"Upstream request rejected by scheduler: {result}")
+                raise result
+            if isinstance(result, BaseException):
+                logger.error(f"Id lookup of {len(batch)} papers failed: {result}", exc_info=result)
+                unavailable.update(batch)
+                continue
+            for arxiv_id, paper in result.items():
+                _paper_cache.set(arxiv_id, paper, PAPER_CACHE_TTL) # As requested, maybe versionless
+                fetched.append(paper)
+            found.update(result)
+        _write_through(list({paper.arxiv_id: paper for paper in fetched}.values()))
+
+    lookup = PaperLookup()
+    for arxiv_id in requested:
+        if arxiv_id in found:
+            lookup.papers.append(found[arxiv_id])
+        elif arxiv_id in unavailable:
+            lookup.unavailable.append(arxiv_id)
+        else:
+            lookup.missing.append(arxiv_id)
+    return lookup
+
+async def get_related_papers(arxiv_id: str, limit: int = 10, client: Optional[httpx.AsyncClient] = None) -> List[Tuple[Paper, float]]:
+    """
+    The papers most similar to `arxiv_id` according to the related index, best first, with
+    their cosine similarity. A paper that is not indexed yet is looked up like any other id
+    and indexed first. Raises LookupError for papers arXiv does not know.
+    """
+    index = related.get_related_index()
+    if index is None:
+        raise RuntimeError("No related-paper index is installed")
+    if arxiv_id not in index:
+        lookup = await fetch_papers_by_ids([arxiv_id], client)
+        if lookup.unavailable:
+            raise RuntimeError(f"Could not look up {arxiv_id} upstream")
+        if not lookup.papers:
+            raise LookupError(f"Unknown paper {arxiv_id}")
+        await asyncio.to_thread(index.add, lookup.papers)
+    with STAGE_SECONDS.time(stage="related"):
+        matches = await asyncio.to_thread(index.related, arxiv_id, limit)
+
+    # Matched papers are looked up by versionless id, so whatever version is stored will do
+    lookup = await fetch_papers_by_ids([_base_id(match_id) for match_id, _ in matches], client)
+    by_base = {_base_id(paper.arxiv_id): paper for paper in lookup.papers}
+    return [(by_base[_base_id(match_id)], score) for match_id, score in matches if _base_id(match_id) in by_base]
+
+def build_search_query(
+    keyword: Optional[str] = None,
+    categories: Optional[List[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> str:
+    """
+    Builds an arXiv search_query from a keyword, a set of categories (OR-ed) and an optional
+    submission date range. Without keyword or categories, the latest-feed categories are used.
+    """
+    clauses = []
+    if keyword and keyword.strip():
+        clauses.append(f"all:{keyword.strip()}")
+    if categories:
+        clauses.append("(" + " OR ".join(f"cat:{category}" for category in categories) + ")")
+    elif not clauses:
+        clauses.append("(" + " OR ".join(f"cat:{category}" for category in LATEST_CATEGORIES) + ")")
+    if date_from or date_to:
+        lower = date_from.strftime("%Y%m%d0000") if date_from else "000101010000"
+        upper = date_to.strftime("%Y%m%d2359") if date_to else "999912312359"
+        clauses.append(f"submittedDate:[{lower} TO {upper}]")
+    return " AND ".join(clauses)
+
+async def stream_papers(
+    search_query: str,
+    start: int = 0,
+    max_results: int = 100,
+    sortBy: str = "submittedDate",
+    sortOrder: str = "descending",
+    client: Optional[httpx.AsyncClient] = None,
+    priority: Priority = Priority.BULK
+) -> AsyncIterator[Paper]:
+    """
+    Uncached counterpart of fetch_papers for bulk pulls: the response is parsed entry by entry
+    as it arrives, without buffering the raw feed. Bypasses caching and coalescing; errors are
+    raised. The page's papers are only yielded once the scheduler slot has been released, so
+    a slow consumer cannot hold the upstream slot and starve interactive requests.
+    """
+    query_params = _build_query_params(search_query, start, max_results, sortBy, sortOrder)
+    queued_at = time.perf_counter()
+    async with _scheduler.slot(priority), _client_scope(client) as http:
+        STAGE_SECONDS.observe(time.perf_counter() - queued_at, stage="queue")
+        async with _open_upstream(http, query_params) as response:
+            body = _MeteredBody(response.aiter_bytes())
+            papers = [paper async for paper in iter_papers(body)]
+            UPSTREAM_RESPONSE_BYTES.observe(body.bytes)
+    for paper in papers:
+        yield paper
+
+async def export_papers(
+    search_query: str,
+    limit: int = EXPORT_MAX_RESULTS,
+    page_size: int = EXPORT_PAGE_SIZE,
+    sortBy: str = "submittedDate",
+    sortOrder: str = "descending",
+    client: Optional[httpx.AsyncClient] = None
+) -> AsyncIterator[Paper]:
+    """
+    Pages through every result of `search_query` (up to `limit`), yielding papers one at a
+    time so memory is bounded by one page regardless of the total size. Pages go through the
+    bulk scheduler lane, which also paces them to arXiv's request rate.
+    """
+    start = 0
+    while start < limit:
+        requested = min(page_size, limit - start)
+        received = 0
+        async for paper in stream_papers(search_query, start, requested, sortBy, sortOrder, client):
+            received += 1
+            yield paper
+        start += received
+        if received < requested:
+            break
+
+def facets_available() -> bool:
+    return facets.get_facet_index() is not None and _paper_store is not None
+
+async def _filtered_local_papers(
+    filters: FacetFilter,
+    start: int,
+    max_results: int,
+    default_categories: Sequence[str] = (),
+    keyword: Optional[str] = None,
+    cursor: Optional[Cursor] = None,
+) -> List[Paper]:
+    """
+    A page of locally stored papers passing `filters`: newest first, or for a `keyword`, its
+    full-text matches in relevance order. With a `cursor`, the page after its paper: by
+    (published, row id) newest first, by row id among matches.
+    """
+    index = facets.get_facet_index()
+    store = _paper_store
+    await refresh_facets()
+
+    def select() -> List[Paper]:
+        if keyword is None:
+            bitmap = index.select(filters, default_categories)
+            skip = start
+            if cursor is not None:
+                # A paper not stored here is ranked after any stored at the same second
+                rowid = store.rowid_of(cursor.arxiv_id)
+                skip = index.rank(bitmap, facets.published_key(cursor.published_date), sys.maxsize if rowid is None else rowid)
+            rowids = index.page(bitmap, skip, max_results)
+        else:
+            ranked = store.search_rowids(keyword, facets.SEARCH_MAX_MATCHES)
+            accepted = [rowid for rowid in ranked if index.accepts(rowid, filters, default_categories)]
+            skip = start if cursor is None else _match_after(store, accepted, cursor)
+            rowids = accepted[skip:skip + max_results]
+        return store.load_papers(rowids)
+
+    with STAGE_SECONDS.time(stage="local_search"):
+        return await asyncio.to_thread(select)
+
+def _match_after(store: "PaperStore", ranked: List[int], cursor: Cursor) -> int:
+    """
+    Position after the cursor's paper among ranked full-text matches, found by row id so papers
+    stored since do not shift the page; its offset hint if it no longer matches.
+    """
+    rowid = store.rowid_of(cursor.arxiv_id)
+    try:
+        return ranked.index(rowid) + 1
+    except ValueError:
+        return cursor.offset + 1
+
+def _local_search_after(keyword: str, cursor: Cursor, max_results: int) -> List[Paper]:
+    store = _paper_store
+    ranked = store.search_rowids(keyword, facets.SEARCH_MAX_MATCHES)
+    skip = _match_after(store, ranked, cursor)
+    return store.load_papers(ranked[skip:skip + max_results])
+
+async def get_facets(filters: FacetFilter, keyword: Optional[str] = None) -> Optional[FacetCounts]:
+    """
+    Category, month and day counts of the locally stored papers matching `filters` (and
+    `keyword`, searched in the full-text index), or None without a facet index. Without a
+    keyword, the counts are of the latest feed, whose categories apply unless others are given.
+    """
+    if not facets_available():
+        return None
+    index = facets.get_facet_index()
+    store = _paper_store
+    await refresh_facets()
+
+    def count() -> FacetCounts:
+        if keyword is None:
+            return index.counts(filters, LATEST_CATEGORIES)
+        return index.counts(filters, within=facets.bitmap_of(store.search_rowids(keyword, facets.SEARCH_MAX_MATCHES)))
+
+    with STAGE_SECONDS.time(stage="facets"):
+        return await asyncio.to_thread(count)
+
+class _PlanAbandoned(Exception):
+    """
+    A planned query cannot be answered as planned; it goes to arXiv whole instead.
+    """
+
+async def _planned_papers(
+    categories: Sequence[str],
+    filters: Optional[FacetFilter],
+    keyword: Optional[str],
+    start: int,
+    max_results: int,
+    client: Optional[httpx.AsyncClient],
+    cache_ttl: float,
+    cursor: Optional[Cursor] = None,
+) -> Optional[List[Paper]]:
+    """
+    Answers a query over `categories` (and `keyword`) from the local store as far as the
+    harvester has covered it, and from arXiv for the rest. Segments are newest first, so a
+    page is a slice of their concatenation: uncovered new papers are fetched as far as the
+    page needs them, which gives their count unless the page ends among them, the local
+    segment's count comes from the facet index, and the older remainder is fetched from the
+    resulting offset. With a `cursor`, the query ends at its paper's day and the first segment
+    is entered after its paper: by id among fresh papers, by (published, row id) locally.
+    Returns None if the query should go to arXiv whole; either way the plan is recorded.
+    """
+    await refresh_facets()
+    index = facets.get_facet_index()
+    store = _paper_store
+    date_from, date_to = (filters.date_from, filters.date_to) if filters else (None, None)
+    if cursor is not None:
+        try:
+            cursor_day = date.fromisoformat(cursor.published_date[:10])
+        except ValueError:
+            return None
+        if date_to is None or cursor_day < date_to:
+            date_to = cursor_day # Nothing after the cursor is newer than its paper
+    plan = planner.plan_query(categories, date_from, date_to, index.coverage)
+    if plan.route == planner.UPSTREAM:
+        planner.record_plan(plan)
+        return None
+
+    def local_page(segment: planner.Segment, skip: int, count: int, after: Optional[Cursor]) -> Tuple[List[Paper], int, int]:
+        bitmap = index.select(FacetFilter.of(categories, segment.date_from, segment.date_to))
+        if keyword is not None:
+            matches = store.search_rowids(keyword, facets.SEARCH_MAX_MATCHES)
+            if len(matches) >= facets.SEARCH_MAX_MATCHES:
+                raise _PlanAbandoned("too-many-matches") # Newest-first order needs every match
+            bitmap &= facets.bitmap_of(matches)
+        if after is not None:
+            # A paper not stored here is ranked after any stored at the same second
+            rowid = store.rowid_of(after.arxiv_id)
+            skip = index.rank(bitmap, facets.published_key(after.published_date), sys.maxsize if rowid is None else rowid)
+        return store.load_papers(index.page(bitmap, skip, count)), bitmap.bit_count(), skip
+
+    papers: List[Paper] = []
+    skip = 0 if cursor is not None else start
+    try:
+        for position, segment in enumerate(plan.segments):
+            count = max_results - len(papers)
+            if count <= 0:
+                break
+            after = cursor if position == 0 else None
+            if segment.source == planner.LOCAL:
+                with STAGE_SECONDS.time(stage="local_search"):
+                    page, total, skip = await asyncio.to_thread(local_page, segment, skip, count, after)
+            else:
+                search_query = build_search_query(keyword, list(categories), segment.date_from, segment.date_to)
+                if position == len(plan.segments) - 1:
+                    page = await fetch_papers(search_query, skip, count, client=client, cache_ttl=cache_ttl)
+                    total = skip + len(page)
+                else:
+                    # Only as many fresh papers as the page needs: the cursor's offset bounds its position
+                    needed = (after.offset + 1 if after is not None else skip) + count
+                    limit = min(needed, planner.FRESH_MAX)
+                    try:
+                        fresh = await fetch_papers(search_query, 0, limit, client=client, cache_ttl=cache_ttl, raise_on_error=True)
+                    except QueueDeadlineExceeded:
+                        raise
+                    except Exception:
+                        raise _PlanAbandoned("upstream-error")
+                    complete = len(fresh) < limit
+                    if after is not None:
+                        skip = _position_after(fresh, after, complete)
+                        if skip is None:
+                            raise _PlanAbandoned("cursor-not-found")
+                    page, total = fresh[skip:skip + count], len(fresh)
+                    if not complete and len(page) < count:
+                        raise _PlanAbandoned("too-many-fresh") # The fresh papers' count is still unknown
+            if page:
+                plan.served.add(segment.source)
+            papers.extend(page)
+            skip = max(0, skip - total)
+    except _PlanAbandoned as e:
+        planner.record_plan(planner.QueryPlan.upstream(date_from, date_to, str(e)))
+        return None
+    planner.record_plan(plan)
+    return papers
+
+def _position_after(papers: List[Paper], cursor: Cursor, complete: bool) -> Optional[int]:
+    """
+    Index of the first of `papers` (newest first) after the cursor's paper, or None if they may
+    not reach it. A paper that has since disappeared resolves to the first older one.
+    """
+    for index, paper in enumerate(papers):
+        if paper.arxiv_id == cursor.arxiv_id:
+            return index + 1
+        if paper.published_date < cursor.published_date:
+            return index
+    return len(papers) if complete else None
+
+async def get_latest_papers(
+    start: int = 0,
+    max_results: int = 25,
+    client: Optional[httpx.AsyncClient] = None,
+    cursor: Optional[Cursor] = None,
+    filters: Optional[FacetFilter] = None,
+) -> List[Paper]:
     """
     Fetches the latest papers from arXiv from pre-defined categories.
+    With a `cursor`, returns the page after it instead of the one at `start`.
+    `filters` (other categories, a submission date range) narrow the feed. With a facet index,
+    the query planner answers what the harvester has covered from the local store, and the
+    rest from arXiv; with the planner off, filtered feeds come from the local store alone.
     """
-    # General query for recent papers in AI, Math (Combinatorics), and Physics (High Energy Physics)
-    search_query = "cat:cs.AI OR cat:math.CO OR cat:physics.hep-ph"
-    logger.info(f"Fetching latest papers with query: '{search_query}', start: {start}, max_results: {max_results}")
+    search_query = LATEST_SEARCH_QUERY
+    if planner.PLANNER_ENABLED and facets_available():
+        categories = sorted(filters.categories) if filters and filters.categories else LATEST_CATEGORIES
+        papers = await _planned_papers(categories, filters, None, start, max_results, client, LATEST_CACHE_TTL, cursor)
+        if papers is not None:
+            return papers
+    elif filters and facets_available():
+        logger.log(_REQUEST_LOG_LEVEL, f"Listing local papers with filters {filters.scope()}, start: {start}, max_results: {max_results}")
+        return await _filtered_local_papers(filters, start, max_results, LATEST_CATEGORIES, cursor=cursor)
+    if filters:
+        search_query = build_search_query(None, sorted(filters.categories), filters.date_from, filters.date_to)
+    if cursor is not None:
+        return await fetch_papers_after(search_query, cursor, max_results, client=client, cache_ttl=LATEST_CACHE_TTL)
+    logger.log(_REQUEST_LOG_LEVEL, f"Fetching latest papers with query: '{search_query}', start: {start}, max_results: {max_results}")
     return await fetch_papers(
         search_query=search_query,
         start=start,
         max_results=max_results,
         sortBy="submittedDate",
-        sortOrder="descending"
+        sortOrder="descending",
+        client=client,
+        cache_ttl=LATEST_CACHE_TTL
     )
 
-async def search_papers_by_keyword(keyword: str, start: int = 0, max_results: int = 25) -> List[Paper]:
+async def search_papers_by_keyword(
+    keyword: str,
+    start: int = 0,
+    max_results: int = 25,
+    client: Optional[httpx.AsyncClient] = None,
+    cursor: Optional[Cursor] = None,
+    filters: Optional[FacetFilter] = None,
+) -> List[Paper]:
     """
     Searches papers on arXiv by a specific keyword.
     The search query targets all fields for the given keyword.
+    With ARXIV_SEARCH_BACKEND=local and a paper store installed, the local FTS index
+    answers instead, ranked by BM25 relevance.
+    With a `cursor`, returns the page after it instead of the one at `start`.
+    `filters` narrow the matches: through the facet index for local searches, else upstream.
+    Otherwise, searches restricted to categories the harvester has covered are planned like
+    the latest feed, newest first.
     """
+    if SEARCH_BACKEND == "local" and _paper_store is not None and (not filters or facets_available()):
+        if filters:
+            logger.log(_REQUEST_LOG_LEVEL, f"Searching local index by keyword: '{keyword}' with filters {filters.scope()}, start: {start}, max_results: {max_results}")
+            return await _filtered_local_papers(filters, start, max_results, keyword=keyword, cursor=cursor)
+        logger.log(_REQUEST_LOG_LEVEL, f"Searching local index by keyword: '{keyword}', start: {start}, max_results: {max_results}")
+        with STAGE_SECONDS.time(stage="local_search"):
+            if cursor is not None:
+                return await asyncio.to_thread(_local_search_after, keyword, cursor, max_results)
+            return await asyncio.to_thread(_paper_store.search, keyword, start, max_results)
+    if planner.PLANNER_ENABLED and facets_available():
+        categories = sorted(filters.categories) if filters else []
+        papers = await _planned_papers(categories, filters, keyword, start, max_results, client, SEARCH_CACHE_TTL, cursor)
+        if papers is not None:
+            return papers
+
     search_query = f"all:{keyword}"
-    logger.info(f"Searching papers by keyword: '{keyword}', start: {start}, max_results: {max_results}")
+    if filters:
+        search_query = build_search_query(keyword, sorted(filters.categories), filters.date_from, filters.date_to)
+    if cursor is not None:
+        return await fetch_papers_after(search_query, cursor, max_results, client=client, cache_ttl=SEARCH_CACHE_TTL)
+    logger.log(_REQUEST_LOG_LEVEL, f"Searching papers by keyword: '{keyword}', start: {start}, max_results: {max_results}")
     return await fetch_papers(
         search_query=search_query,
         start=start,
@@ -114,7 +1180,9 @@ async def search_papers_by_keyword(keyword: str, start: int = 0, max_results: in
         # Using relevance for keyword search might be better, but sticking to submittedDate for now
         # sortBy="relevance", 
         sortBy="submittedDate",
-        sortOrder="descending"
+        sortOrder="descending",
+        client=client,
+        cache_ttl=SEARCH_CACHE_TTL
     )
 
 if __name__ == '__main__':
@@ -0,0 +1,251 @@
+import logging
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator, Dict, List, Optional
+
+from src.config import env_int
+from src.models.paper import Paper
+
+logger = logging.getLogger(__name__)
+
+# Feeds up to this size are kept while they stream in, for the feedparser fallback; a larger
+# feed that turns out malformed raises MalformedFeedError instead of being buffered whole
+FALLBACK_MAX_BYTES = env_int("ARXIV_FEED_FALLBACK_MAX_BYTES", 4 * 1024 * 1024)
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+_ENTRY = f"{ATOM_NS}entry"
+_ID = f"{ATOM_NS}id"
+_TITLE = f"{ATOM_NS}title"
+_SUMMARY = f"{ATOM_NS}summary"
+_PUBLISHED = f"{ATOM_NS}published"
+_UPDATED = f"{ATOM_NS}updated"
+_AUTHOR = f"{ATOM_NS}author"
+_NAME = f"{ATOM_NS}name"
+_LINK = f"{ATOM_NS}link"
+_CATEGORY = f"{ATOM_NS}category"
+
+# Link types feedparser treats as HTML when choosing an entry's main `link`
+_HTML_TYPES = {"text/html", "application/xhtml+xml"}
+
+
+class MalformedFeedError(ValueError):
+    """
+    Raised when a response is neither well-formed Atom nor recoverable by feedparser.
+    """
+
+
+def build_paper(
+    arxiv_id_raw: str,
+    title: str,
+    summary: str,
+    author_names: List[str],
+    published: str,
+    updated: str,
+    links: List[Dict[str, Optional[str]]],
+    link: Optional[str],
+    categories: List[str],
+) -> Paper:
+    """
+    Maps the fields of one Atom entry to a Paper: strips the /abs/ prefix from the id and
+    falls back from an explicit PDF link to the /abs/ link rewritten to /pdf/.
+    """
+    arxiv_id = arxiv_id_raw.split('/abs/')[-1] if '/abs/' in arxiv_id_raw else arxiv_id_raw
+
+    pdf_url = None
+    for candidate in links:
+        if candidate.get("type") == "application/pdf":
+            pdf_url = candidate.get("href")
+            break
+    if not pdf_url and link:  # Fallback if PDF link type is not explicit
+        if "/abs/" in link:
+            pdf_url = link.replace('/abs/', '/pdf/')
+
+    return Paper.from_trusted(
+        arxiv_id=arxiv_id,
+        title=title,
+        summary=summary.strip(),
+        author_names=author_names,
+        published_date=published,
+        updated_date=updated,
+        pdf_url=pdf_url,
+        categories=categories,
+    )
+
+
+def _text(element: ET.Element) -> str:
+    return "".join(element.itertext()).strip()
+
+
+def _map_content_type(content_type: str) -> str:
+    content_type = content_type.lower()
+    if content_type in ("text", "plain"):
+        return "text/plain"
+    if content_type == "html":
+        return "text/html"
+    if content_type == "xhtml":
+        return "application/xhtml+xml"
+    return content_type
+
+
+def _entry_to_paper(entry: ET.Element) -> Paper:
+    """
+    Builds a Paper from an <entry> element, following feedparser's defaults so that both
+    parse paths produce identical output.
+    """
+    fields: Dict[str, str] = {}
+    author_names: List[str] = []
+    links: List[Dict[str, Optional[str]]] = []
+    alternate_link: Optional[str] = None
+    categories: List[str] = []
+
+    for child in entry:
+        tag = child.tag
+        if tag in (_ID, _TITLE, _SUMMARY, _PUBLISHED, _UPDATED):
+            fields[tag] = _text(child)
+        elif tag == _AUTHOR:
+            name = child.find(_NAME)
+            author_names.append(_text(name) if name is not None else "N/A")
+        elif tag == _LINK:
+            rel = child.get("rel", "alternate")
+            link_type = child.get("type", "application/atom+xml" if rel == "self" else "text/html")
+            href = child.get("href")
+            links.append({"href": href, "rel": rel, "type": link_type})
+            if href and rel == "alternate" and _map_content_type(link_type) in _HTML_TYPES:
+                alternate_link = href
+        elif tag == _CATEGORY:
+            categories.append(child.get("term", "N/A"))
+
+    entry_id = fields.get(_ID)
+    published = fields.get(_PUBLISHED, "N/A")
+    return build_paper(
+        arxiv_id_raw=entry_id or "",
+        title=fields.get(_TITLE, "N/A"),
+        summary=fields.get(_SUMMARY, "N/A"),
+        author_names=author_names,
+        published=published,
+        updated=fields.get(_UPDATED, published), # Fallback to published_date if updated is missing
+        links=links,
+        link=alternate_link if alternate_link is not None else entry_id, # The entry id doubles as its link
+        categories=categories,
+    )
+
+
+class AtomStreamParser:
+    """
+    Incremental Atom parser: feed it bytes as they arrive and it returns the Papers whose
+    <entry> elements have been completed. Each entry is discarded once converted, so memory
+    stays proportional to one entry rather than the whole feed.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root: Optional[ET.Element] = None
+        self._depth = 0
+
+    def feed(self, data: bytes) -> List[Paper]:
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[Paper]:
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> List[Paper]:
+        papers = []
+        for event, element in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = element
+                self._depth += 1
+                continue
+            self._depth -= 1
+            if self._depth == 1 and element.tag == _ENTRY:
+                papers.append(_entry_to_paper(element))
+                self._root.remove(element)
+        return papers
+
+
+def parse_feed_with_feedparser(data: bytes) -> List[Paper]:
+    """
+    Lenient fallback for feeds the XML parser rejects.
+    """
+    import feedparser # Only needed for malformed feeds, so kept off the import path
+
+    feed = feedparser.parse(data)
+    if feed.bozo and not feed.entries:
+        raise MalformedFeedError(f"Unparseable arXiv response: {feed.get('bozo_exception')}")
+
+    papers = []
+    for entry in feed.entries:
+        papers.append(build_paper(
+            arxiv_id_raw=entry.get("id", ""),
+            title=entry.get("title", "N/A"),
+            summary=entry.get("summary", "N/A"),
+            author_names=[author.get("name", "N/A") for author in entry.get("authors", [])],
+            published=entry.get("published", "N/A"),
+            updated=entry.get("updated", entry.get("published", "N/A")), # Fallback to published_date if updated is missing
+            links=entry.get("links", []),
+            link=entry.get("link"),
+            categories=[tag.get('term', 'N/A') for tag in entry.get('tags', [])],
+        ))
+    return papers
+
+
+def parse_feed(data: bytes) -> List[Paper]:
+    """
+    Parses a complete feed, falling back to feedparser if it is not well-formed XML.
+    """
+    parser = AtomStreamParser()
+    try:
+        return parser.feed(data) + parser.close()
+    except ET.ParseError as e:
+        logger.warning(f"Atom feed is not well-formed ({e}); falling back to feedparser.")
+        return parse_feed_with_feedparser(data)
+
+
+async def parse_stream(chunks: AsyncIterator[bytes], fallback_max_bytes: int = FALLBACK_MAX_BYTES) -> List[Paper]:
+    """
+    Parses a feed while it downloads. Raw bytes are retained, up to `fallback_max_bytes`, only
+    so that a malformed feed can be handed to the feedparser fallback.
+    """
+    parser = AtomStreamParser()
+    papers: List[Paper] = []
+    received: Optional[List[bytes]] = []
+    size = 0
+    error: Optional[ET.ParseError] = None
+    async for chunk in chunks:
+        size += len(chunk)
+        if received is not None:
+            received.append(chunk)
+            if size > fallback_max_bytes:
+                received = None # Too large to fall back; parse on without it
+        if error is None:
+            try:
+                papers.extend(parser.feed(chunk))
+            except ET.ParseError as e:
+                error = e
+        if error is not None and received is None:
+            raise MalformedFeedError(f"arXiv response of over {fallback_max_bytes} bytes is not well-formed: {error}")
+    if error is None:
+        try:
+            papers.extend(parser.close())
+        except ET.ParseError as e:
+            error = e
+    if error is not None:
+        if received is None:
+            raise MalformedFeedError(f"arXiv response of over {fallback_max_bytes} bytes is not well-formed: {error}")
+        logger.warning(f"Atom feed is not well-formed ({error}); falling back to feedparser.")
+        return parse_feed_with_feedparser(b"".join(received))
+    return papers
+
+
+async def iter_papers(chunks: AsyncIterator[bytes]) -> AsyncIterator[Paper]:
+    """
+    Yields Papers entry by entry without retaining the feed. There is no fallback here:
+    a malformed feed raises ET.ParseError once the bad bytes arrive.
+    """
+    parser = AtomStreamParser()
+    async for chunk in chunks:
+        for paper in parser.feed(chunk):
+            yield paper
+    for paper in parser.close():
+        yield paper
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+@dataclass
+class CacheLookup:
+    """
+    Result of a cache lookup. `is_stale` means the entry is past its TTL but still inside
+    the stale-while-revalidate window, so it may be served while a refresh runs.
+    """
+    value: Any
+    is_stale: bool
+
+
+class _Entry:
+    __slots__ = ("value", "size", "fresh_until", "stale_until")
+
+    def __init__(self, value: Any, size: int, fresh_until: float, stale_until: float):
+        self.value = value
+        self.size = size
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class ResponseCache:
+    """
+    In-process LRU cache bounded by both entry count and (estimated) total bytes,
+    with per-entry TTLs and an optional stale-while-revalidate window.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        max_bytes: int = 32 * 1024 * 1024,
+        stale_ttl: float = 0.0,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self._sizeof = sizeof or (lambda value: 1)
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, key: Hashable) -> Optional[CacheLookup]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            now = self._clock()
+            if now >= entry.stale_until:
+                self._remove(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if now >= entry.fresh_until:
+                self.stats.stale_hits += 1
+                return CacheLookup(entry.value, is_stale=True)
+            self.stats.hits += 1
+            return CacheLookup(entry.value, is_stale=False)
+
+    def set(self, key: Hashable, value: Any, ttl: float, stale_ttl: Optional[float] = None) -> None:
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return # Never let a single oversized value flush the whole cache
+        now = self._clock()
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, now + ttl, now + ttl + stale_ttl)
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.stats.evictions += 1
+
+    def entries(self, limit: int) -> List[Tuple[Hashable, Any, float, float]]:
+        """
+        Up to `limit` live entries as (key, value, seconds fresh, seconds stale after that),
+        most recently used first.
+        """
+        now = self._clock()
+        with self._lock:
+            return [
+                (key, entry.value, max(0.0, entry.fresh_until - now), entry.stale_until - max(now, entry.fresh_until))
+                for key, entry in reversed(self._entries.items())
+                if entry.stale_until > now
+            ][:limit]
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self.stats = CacheStats()
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size
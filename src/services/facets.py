@@ -0,0 +1,429 @@
+import bisect
+import calendar
+import logging
+import re
+import threading
+import time
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from datetime import date
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from src.config import env_float, env_int
+
+if TYPE_CHECKING:
+    from src.services.paper_store import HarvestState, PaperStore
+
+logger = logging.getLogger(__name__)
+
+# Day facets cover at most this many days, newest first
+FACET_MAX_DAYS = env_int("ARXIV_FACET_MAX_DAYS", 31)
+# Papers written to the store by other processes (e.g. a separate harvester) are picked up this often
+REFRESH_INTERVAL = env_float("ARXIV_FACET_REFRESH_INTERVAL", 30.0)
+# Filtered local searches and their facets consider this many best full-text matches
+SEARCH_MAX_MATCHES = env_int("ARXIV_FACET_SEARCH_MAX_MATCHES", 10000)
+# Refreshes re-read papers stored this many seconds before the newest one indexed: a write
+# can commit after a newer one was stamped, e.g. from another process
+WATERMARK_MARGIN = env_int("ARXIV_FACET_WATERMARK_MARGIN", 60)
+
+_NON_DIGIT_RE = re.compile(r"\D")
+_NONZERO_BYTE_RE = re.compile(rb"[^\x00]")
+# Positions of the set bits of every byte value
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def published_key(published_date: str) -> int:
+    """
+    A published date ('2023-01-01T10:00:00Z') as a sortable integer, 20230101100000; 0 if unparseable.
+    Its day is key // 10**6 and its month key // 10**8.
+    """
+    digits = _NON_DIGIT_RE.sub("", published_date[:19])
+    return int(digits.ljust(14, "0")) if len(digits) >= 8 else 0
+
+
+def day_key(day: date) -> int:
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def _day_label(day: int) -> str:
+    return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+
+
+def _month_end(month: int) -> int:
+    return month * 100 + calendar.monthrange(month // 100, month % 100)[1]
+
+
+def _month_label(month: int) -> str:
+    return f"{month // 100:04d}-{month % 100:02d}"
+
+
+def bitmap_of(positions: Iterable[int], base: int = 0) -> int:
+    """
+    Bitmap (a Python int) with the bits at `positions` - `base` set. Built in a bytearray, since
+    setting bits on an int one at a time copies the whole int each time.
+    """
+    positions = list(positions)
+    if not positions:
+        return 0
+    buffer = bytearray((max(positions) - base) // 8 + 1)
+    for position in positions:
+        buffer[(position - base) >> 3] |= 1 << ((position - base) & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def positions_of(bitmap: int, base: int = 0) -> Iterator[int]:
+    """
+    Positions of the set bits of a bitmap, ascending. Only non-zero bytes are visited.
+    """
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for match in _NONZERO_BYTE_RE.finditer(data):
+        offset = base + match.start() * 8
+        for bit in _BYTE_BITS[data[match.start()]]:
+            yield offset + bit
+
+
+@dataclass(frozen=True)
+class FacetFilter:
+    """
+    Category and submission-date filters; papers match any of the categories. Dates are inclusive.
+    """
+    categories: FrozenSet[str] = frozenset()
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+    @classmethod
+    def of(cls, categories: Optional[Sequence[str]] = None, date_from: Optional[date] = None, date_to: Optional[date] = None) -> "FacetFilter":
+        return cls(frozenset(categories or ()), date_from, date_to)
+
+    def __bool__(self) -> bool:
+        return bool(self.categories or self.date_from or self.date_to)
+
+    @property
+    def dated(self) -> bool:
+        return bool(self.date_from or self.date_to)
+
+    @property
+    def day_range(self) -> Tuple[int, int]:
+        return (
+            day_key(self.date_from) if self.date_from else 0,
+            day_key(self.date_to) if self.date_to else 99999999,
+        )
+
+    def scope(self) -> str:
+        """
+        Canonical text form, distinguishing listings in cursors and cache keys.
+        """
+        return f"cat={','.join(sorted(self.categories))};from={self.date_from or ''};to={self.date_to or ''}"
+
+
+@dataclass
+class FacetCounts:
+    total: int # Papers matching all filters
+    categories: Dict[str, int] = field(default_factory=dict) # Date filters applied, category filters not
+    months: Dict[str, int] = field(default_factory=dict) # Category filters applied, date filters not
+    days: Dict[str, int] = field(default_factory=dict) # As months, for the newest FACET_MAX_DAYS days in range
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"total": self.total, "categories": self.categories, "months": self.months, "days": self.days}
+
+
+@dataclass(frozen=True)
+class _Bitmaps:
+    """
+    One consistent version of the index's bitmaps; updates build a new one.
+    """
+    all: int = 0
+    categories: Dict[str, int] = field(default_factory=dict)
+    months: Dict[int, int] = field(default_factory=dict)
+    days: Dict[int, Tuple[int, int]] = field(default_factory=dict) # Day -> (base row id, bitmap)
+    day_list: List[int] = field(default_factory=list) # Indexed days, ascending
+
+
+class FacetIndex:
+    """
+    Bitmap indexes over the papers in the local store, for filtering and facet counts without
+    asking arXiv. A paper's bit is its store row id. Every category and month has a bitmap
+    spanning all papers; days, being many and each covering few papers, have bitmaps offset
+    to their lowest row id. Bitmaps are Python ints, so intersections and counts (&, bit_count)
+    run in C over machine words.
+
+    Updates copy the bitmap dicts, apply their changes to the copies and swap the new version
+    in whole, so queries read one consistent version without locking.
+    """
+
+    def __init__(self):
+        self.store_watermark = 0 # stored_at up to which the store has been indexed
+        self.refreshed_at = 0.0 # time.monotonic() of the last refresh
+        # Harvest state per category, read before the papers it vouches for were indexed
+        self.coverage: Dict[str, "HarvestState"] = {}
+        self._published = array("q") # Row id -> published_key(), 0 if not indexed
+        self._combo = array("i") # Row id -> index into _combos
+        self._combos: List[FrozenSet[str]] = [frozenset()]
+        self._combo_ids: Dict[FrozenSet[str], int] = {frozenset(): 0}
+        self._bitmaps = _Bitmaps()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._bitmaps.all.bit_count()
+
+    def update(self, rows: Iterable[Tuple[int, str, Sequence[str]]]) -> int:
+        """
+        Indexes (row id, published date, categories) rows, replacing what was indexed for the
+        same row ids before. Returns how many rows were indexed.
+        """
+        with self._lock:
+            removed = defaultdict(list)
+            added = defaultdict(list)
+            # The last row for a row id wins, so a batch can be applied as one net change
+            latest = {}
+            for rowid, published_date, categories in rows:
+                published = published_key(published_date)
+                if published:
+                    latest[rowid] = (published, categories)
+            for rowid, (published, categories) in latest.items():
+                if rowid >= len(self._published):
+                    grow = rowid + 1 - len(self._published)
+                    self._published.extend([0] * grow)
+                    self._combo.extend([0] * grow)
+                old = self._published[rowid]
+                if old:
+                    for key in self._keys(old, self._combos[self._combo[rowid]]):
+                        removed[key].append(rowid)
+                combo = frozenset(categories)
+                if combo not in self._combo_ids:
+                    self._combo_ids[combo] = len(self._combos)
+                    self._combos.append(combo)
+                self._published[rowid] = published
+                self._combo[rowid] = self._combo_ids[combo]
+                for key in self._keys(published, combo):
+                    added[key].append(rowid)
+            current = self._bitmaps
+            bitmaps = _Bitmaps(
+                current.all, dict(current.categories), dict(current.months), dict(current.days), list(current.day_list)
+            )
+            for key in removed.keys() | added.keys():
+                bitmaps = self._apply(bitmaps, key, removed.get(key, ()), added.get(key, ()))
+            self._bitmaps = bitmaps
+        return len(latest)
+
+    @staticmethod
+    def _keys(published: int, combo: FrozenSet[str]) -> Iterator[Tuple[str, Any]]:
+        yield ("all", None)
+        yield ("month", published // 10**8)
+        yield ("day", published // 10**6)
+        for category in combo:
+            yield ("category", category)
+
+    @staticmethod
+    def _apply(bitmaps: _Bitmaps, key: Tuple[str, Any], removed: Sequence[int], added: Sequence[int]) -> _Bitmaps:
+        """
+        Applies a key's changes to `bitmaps`, whose dicts and list are private copies.
+        """
+        kind, value = key
+        if kind == "day":
+            FacetIndex._apply_day(bitmaps, value, removed, added)
+            return bitmaps
+        if kind == "all":
+            return replace(bitmaps, all=(bitmaps.all & ~bitmap_of(removed)) | bitmap_of(added))
+        by_value = bitmaps.months if kind == "month" else bitmaps.categories
+        bitmap = (by_value.get(value, 0) & ~bitmap_of(removed)) | bitmap_of(added)
+        if bitmap:
+            by_value[value] = bitmap
+        else:
+            by_value.pop(value, None)
+        return bitmaps
+
+    @staticmethod
+    def _apply_day(bitmaps: _Bitmaps, day: int, removed: Sequence[int], added: Sequence[int]) -> None:
+        days = bitmaps.days
+        base, bitmap = days.get(day, (None, 0))
+        if added and (base is None or min(added) < base):
+            lowest = min(added)
+            bitmap = bitmap << (base - lowest) if base is not None else 0
+            base = lowest
+        if base is None:
+            return
+        bitmap = (bitmap & ~bitmap_of(removed, base)) | bitmap_of(added, base)
+        if bitmap:
+            if day not in days:
+                bisect.insort(bitmaps.day_list, day)
+            days[day] = (base, bitmap)
+        elif day in days:
+            del days[day]
+            bitmaps.day_list.remove(day)
+
+    def refresh(self, store: "PaperStore") -> int:
+        """
+        Indexes papers stored since the last refresh, and reloads which categories and dates
+        the harvester has fully ingested. Returns how many papers were (re)indexed, or 0 if
+        another refresh is running; whatever that one misses, the next refresh picks up.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            # Coverage first: the papers indexed next include every paper it claims
+            coverage = {state.category: state for state in store.list_harvest_states()}
+            rows = store.facet_rows_stored_since(self.store_watermark)
+            count = self.update((rowid, published_date, categories) for rowid, published_date, categories, _ in rows)
+            if rows:
+                self.store_watermark = max(self.store_watermark, max(row[3] for row in rows) - WATERMARK_MARGIN)
+            self.coverage = coverage
+            self.refreshed_at = time.monotonic()
+            return count
+        finally:
+            self._refresh_lock.release()
+
+    def stale(self) -> bool:
+        return time.monotonic() - self.refreshed_at > REFRESH_INTERVAL
+
+    def category_mask(self, categories: Iterable[str]) -> int:
+        """
+        Papers in any of the categories; all papers if none are given.
+        """
+        return self._category_mask(self._bitmaps, categories)
+
+    @staticmethod
+    def _category_mask(bitmaps: _Bitmaps, categories: Iterable[str]) -> int:
+        mask = 0
+        selected = False
+        for category in categories:
+            selected = True
+            mask |= bitmaps.categories.get(category, 0)
+        return mask if selected else bitmaps.all
+
+    def date_mask(self, filters: FacetFilter) -> int:
+        """
+        Papers published within the filter's date range: whole months of it from month
+        bitmaps, the days at either end from day bitmaps.
+        """
+        return self._date_mask(self._bitmaps, filters)
+
+    @staticmethod
+    def _date_mask(bitmaps: _Bitmaps, filters: FacetFilter) -> int:
+        if not filters.dated:
+            return bitmaps.all
+        first, last = filters.day_range
+        mask = 0
+        for month, bitmap in bitmaps.months.items():
+            if first <= month * 100 + 1 and _month_end(month) <= last:
+                mask |= bitmap
+        day_list = bitmaps.day_list
+        for day in day_list[bisect.bisect_left(day_list, first):bisect.bisect_right(day_list, last)]:
+            if not (first <= day // 100 * 100 + 1 and _month_end(day // 100) <= last):
+                base, bitmap = bitmaps.days[day]
+                mask |= bitmap << base
+        return mask
+
+    def select(self, filters: FacetFilter, default_categories: Sequence[str] = ()) -> int:
+        return self.category_mask(filters.categories or default_categories) & self.date_mask(filters)
+
+    def accepts(self, rowid: int, filters: FacetFilter, default_categories: Sequence[str] = ()) -> bool:
+        """
+        Whether one paper passes the filters; for checking ranked candidates one at a time.
+        """
+        if rowid >= len(self._published) or not self._published[rowid]:
+            return False
+        categories = filters.categories or default_categories
+        if categories and self._combos[self._combo[rowid]].isdisjoint(categories):
+            return False
+        first, last = filters.day_range
+        return first <= self._published[rowid] // 10**6 <= last
+
+    def page(self, bitmap: int, start: int, max_results: int) -> List[int]:
+        """
+        Row ids of the papers in `bitmap`, newest first, from offset `start`. Months and then
+        days are skipped by their counts alone; only the papers of the days that overlap the
+        page are listed and sorted.
+        """
+        bitmaps = self._bitmaps
+        rowids: List[int] = []
+        skip = start
+        for month in sorted(bitmaps.months, reverse=True):
+            in_month = (bitmap & bitmaps.months[month]).bit_count()
+            if in_month <= skip:
+                skip -= in_month
+                continue
+            lo = bisect.bisect_left(bitmaps.day_list, month * 100)
+            hi = bisect.bisect_right(bitmaps.day_list, month * 100 + 99)
+            for day in reversed(bitmaps.day_list[lo:hi]):
+                base, day_bitmap = bitmaps.days[day]
+                matches = (bitmap >> base) & day_bitmap
+                in_day = matches.bit_count()
+                if in_day <= skip:
+                    skip -= in_day
+                    continue
+                papers = sorted(positions_of(matches, base), key=lambda rowid: (self._published[rowid], rowid), reverse=True)
+                rowids.extend(papers[skip:skip + max_results - len(rowids)])
+                skip = 0
+                if len(rowids) >= max_results:
+                    return rowids
+        return rowids
+
+    def rank(self, bitmap: int, published: int, rowid: int) -> int:
+        """
+        How many papers in `bitmap` come, newest first, up to and including the paper at
+        (`published`, `rowid`): the offset of the page after it. Newer months and days are
+        counted whole; only the papers of its own day are compared.
+        """
+        bitmaps = self._bitmaps
+        day, month = published // 10**6, published // 10**8
+        ranked = sum((bitmap & months).bit_count() for other, months in bitmaps.months.items() if other > month)
+        day_list = bitmaps.day_list
+        for later in day_list[bisect.bisect_right(day_list, day):bisect.bisect_right(day_list, month * 100 + 99)]:
+            base, day_bitmap = bitmaps.days[later]
+            ranked += ((bitmap >> base) & day_bitmap).bit_count()
+        if day in bitmaps.days:
+            base, day_bitmap = bitmaps.days[day]
+            key = (published, rowid)
+            ranked += sum(1 for other in positions_of((bitmap >> base) & day_bitmap, base) if (self._published[other], other) >= key)
+        return ranked
+
+    def counts(self, filters: FacetFilter, default_categories: Sequence[str] = (), within: Optional[int] = None) -> FacetCounts:
+        """
+        Facet counts for the filters. Each facet applies the other facets' filters but not its
+        own, so it shows what choosing a different value would give. `within` restricts every
+        count to a set of papers, e.g. a keyword's full-text matches.
+        """
+        bitmaps = self._bitmaps
+        category_mask = self._category_mask(bitmaps, filters.categories or default_categories)
+        date_mask = self._date_mask(bitmaps, filters)
+        if within is not None:
+            category_mask &= within
+            date_mask &= within
+        categories = {category: (bitmap & date_mask).bit_count() for category, bitmap in bitmaps.categories.items()}
+        months = {month: (bitmap & category_mask).bit_count() for month, bitmap in bitmaps.months.items()}
+        first, last = filters.day_range
+        days = {}
+        day_list = bitmaps.day_list
+        for day in reversed(day_list[bisect.bisect_left(day_list, first):bisect.bisect_right(day_list, last)]):
+            base, bitmap = bitmaps.days[day]
+            count = ((category_mask >> base) & bitmap).bit_count()
+            if count:
+                days[_day_label(day)] = count
+                if len(days) >= FACET_MAX_DAYS:
+                    break
+        return FacetCounts(
+            total=(category_mask & date_mask).bit_count(),
+            categories=dict(sorted(((category, count) for category, count in categories.items() if count), key=lambda item: (-item[1], item[0]))),
+            months={_month_label(month): count for month, count in sorted(months.items(), reverse=True) if count},
+            days=days,
+        )
+
+    def stats(self) -> Dict[str, int]:
+        bitmaps = self._bitmaps
+        return {"papers": bitmaps.all.bit_count(), "categories": len(bitmaps.categories), "months": len(bitmaps.months), "days": len(bitmaps.days)}
+
+
+# Application-scoped index installed by the FastAPI lifespan hook in main.py
+_facet_index: Optional[FacetIndex] = None
+
+
+def set_facet_index(index: Optional[FacetIndex]) -> None:
+    global _facet_index
+    _facet_index = index
+
+
+def get_facet_index() -> Optional[FacetIndex]:
+    return _facet_index
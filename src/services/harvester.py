@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+
+import httpx
+
+from src.config import env_float, env_int, env_str
+from src.models.paper import Paper
+from src.services import arxiv_service
+from src.services.metrics import HARVEST_RETRIES
+from src.services.paper_store import HarvestState, PaperStore
+from src.services.scheduler import Priority
+
+logger = logging.getLogger(__name__)
+
+HARVEST_PAGE_SIZE = env_int("ARXIV_HARVEST_PAGE_SIZE", 200)
+# How far back the very first run of a category reaches before it counts as complete
+HARVEST_BACKFILL_DAYS = env_int("ARXIV_HARVEST_BACKFILL_DAYS", 7)
+# Upper bound on pages per category per run; an interrupted run resumes where it stopped
+HARVEST_MAX_PAGES = env_int("ARXIV_HARVEST_MAX_PAGES", 50)
+# arXiv now and then answers a page in mid-listing empty or short. Such a page only ends the run
+# if it comes back no longer after this many retries, spaced this many seconds apart
+HARVEST_END_RETRIES = env_int("ARXIV_HARVEST_END_RETRIES", 2)
+HARVEST_END_RETRY_DELAY = env_float("ARXIV_HARVEST_END_RETRY_DELAY", 5.0)
+
+
+def harvest_categories() -> List[str]:
+    """
+    Categories of the latest feed plus any extra ones listed in ARXIV_HARVEST_CATEGORIES.
+    """
+    extra = [category.strip() for category in env_str("ARXIV_HARVEST_CATEGORIES", "").split(",") if category.strip()]
+    categories = list(arxiv_service.LATEST_CATEGORIES)
+    categories.extend(category for category in extra if category not in categories)
+    return categories
+
+
+@dataclass
+class HarvestResult:
+    category: str
+    pages: int = 0
+    fetched: int = 0
+    stored: int = 0
+    completed: bool = False
+    watermark: Optional[str] = None
+
+
+class Harvester:
+    """
+    Incrementally ingests categories into a PaperStore.
+
+    Each category is paged through newest-updated first and the walk stops once it reaches the
+    persisted watermark, so a run only transfers what changed since the previous one. Progress
+    (next offset and the run's high-water mark) is checkpointed after every page, so a crashed
+    or budget-limited run resumes where it stopped; the watermark only advances when a run completes.
+    """
+
+    def __init__(
+        self,
+        store: PaperStore,
+        categories: Optional[Sequence[str]] = None,
+        page_size: int = HARVEST_PAGE_SIZE,
+        max_pages: int = HARVEST_MAX_PAGES,
+        backfill_days: int = HARVEST_BACKFILL_DAYS,
+        client: Optional[httpx.AsyncClient] = None,
+        end_retries: int = HARVEST_END_RETRIES,
+        end_retry_delay: float = HARVEST_END_RETRY_DELAY,
+    ):
+        self.store = store
+        self.categories = list(categories) if categories is not None else harvest_categories()
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.backfill_days = backfill_days
+        self.client = client
+        self.end_retries = end_retries
+        self.end_retry_delay = end_retry_delay
+
+    async def run_once(self) -> List[HarvestResult]:
+        results = []
+        for category in self.categories:
+            try:
+                results.append(await self.harvest_category(category))
+            except Exception as e:
+                # Keep the checkpoint; the next run resumes this category from it
+                logger.error(f"Harvest of {category} failed: {e}", exc_info=True)
+                results.append(HarvestResult(category=category))
+        return results
+
+    async def run_forever(self, interval: float) -> None:
+        while True:
+            started = time.monotonic()
+            results = await self.run_once()
+            stored = sum(result.stored for result in results)
+            logger.info(f"Harvest run stored {stored} papers across {len(results)} categories.")
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    async def harvest_category(self, category: str) -> HarvestResult:
+        state = await asyncio.to_thread(self.store.get_harvest_state, category)
+        if state.watermark is None and not state.in_progress:
+            # First run: only backfill a bounded window, which is then considered covered
+            backfill_start = datetime.now(timezone.utc) - timedelta(days=self.backfill_days)
+            state.watermark = backfill_start.strftime("%Y-%m-%dT%H:%M:%SZ")
+            state.covered_since = state.watermark
+        watermark = state.watermark
+        result = HarvestResult(category=category, watermark=watermark)
+        if state.in_progress:
+            logger.info(f"Resuming harvest of {category} at offset {state.resume_start}.")
+
+        while result.pages < self.max_pages:
+            papers = await self._fetch_page(category, state.resume_start)
+            result.pages += 1
+            retries = 0
+            while len(papers) < self.page_size and retries < self.end_retries and not self._reaches(papers, watermark):
+                # Short of the watermark, so this may be the listing's end or a transient short page
+                await asyncio.sleep(self.end_retry_delay)
+                HARVEST_RETRIES.inc(category=category)
+                retried = await self._fetch_page(category, state.resume_start)
+                result.pages += 1
+                retries += 1
+                if len(retried) > len(papers):
+                    papers = retried
+            result.fetched += len(papers)
+            if not papers:
+                result.completed = True
+                break
+
+            if state.run_high_water is None:
+                state.run_high_water = max(paper.updated_date or paper.published_date for paper in papers)
+            # Entries exactly at the watermark are re-written; upserts are idempotent
+            changed = [paper for paper in papers if watermark is None or (paper.updated_date or paper.published_date) >= watermark]
+            if changed:
+                result.stored += await asyncio.to_thread(self.store.upsert_papers, changed)
+                await arxiv_service.index_papers(changed)
+
+            state.resume_start += len(papers)
+            state.last_run_at = int(time.time())
+            await asyncio.to_thread(self.store.save_harvest_state, state)
+
+            if len(changed) < len(papers) or len(papers) < self.page_size:
+                result.completed = True
+                break
+
+        if result.completed:
+            await asyncio.to_thread(self._complete_run, state)
+            result.watermark = state.watermark
+        logger.info(
+            f"Harvested {category}: {result.fetched} fetched, {result.stored} stored in {result.pages} pages "
+            f"({'complete' if result.completed else 'will resume'})."
+        )
+        return result
+
+    async def _fetch_page(self, category: str, start: int) -> List[Paper]:
+        return await arxiv_service.fetch_papers(
+            search_query=f"cat:{category}",
+            start=start,
+            max_results=self.page_size,
+            sortBy="lastUpdatedDate",
+            sortOrder="descending",
+            client=self.client,
+            write_through=False,
+            raise_on_error=True,
+            priority=Priority.BACKGROUND, # Paced by the upstream scheduler, behind interactive requests
+        )
+
+    @staticmethod
+    def _reaches(papers: List[Paper], watermark: Optional[str]) -> bool:
+        return watermark is not None and any((paper.updated_date or paper.published_date) < watermark for paper in papers)
+
+    def _complete_run(self, state: HarvestState) -> None:
+        if state.run_high_water and (state.watermark is None or state.run_high_water > state.watermark):
+            state.watermark = state.run_high_water
+        state.run_high_water = None
+        state.resume_start = 0
+        state.last_run_at = int(time.time())
+        self.store.save_harvest_state(state)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Incrementally harvest arXiv categories into the local paper store.")
+    parser.add_argument("--store", default=env_str("ARXIV_STORE_PATH", "data/papers.db"), help="SQLite store path")
+    parser.add_argument("--categories", help="Comma-separated categories (default: latest-feed categories plus ARXIV_HARVEST_CATEGORIES)")
+    parser.add_argument("--interval", type=float, default=0.0, help="Repeat every N seconds instead of running once")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    categories = [category.strip() for category in args.categories.split(",")] if args.categories else None
+    store = PaperStore(args.store)
+    harvester = Harvester(store, categories=categories)
+    try:
+        if args.interval > 0:
+            asyncio.run(harvester.run_forever(args.interval))
+        else:
+            asyncio.run(harvester.run_once())
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
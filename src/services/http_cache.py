@@ -0,0 +1,80 @@
+from typing import Dict, List, Optional
+
+from src.services import serialization
+
+# Bodies smaller than this are sent uncompressed; the framing overhead outweighs the savings
+MIN_COMPRESS_BYTES = 1024
+
+
+def available_codings() -> List[str]:
+    """
+    Content codings we can produce, in order of preference.
+    """
+    return (["br"] if serialization.brotli is not None else []) + ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """
+    Picks the preferred available content coding the client accepts (q > 0), else 'identity'.
+    """
+    if not accept_encoding:
+        return "identity"
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    best, best_quality = "identity", 0.0
+    for coding in available_codings():
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def variant_etag(etag: str, coding: str) -> str:
+    """
+    Strong ETag of an encoded representation: each content coding gets a distinct validator.
+    """
+    if coding == "identity":
+        return etag
+    return etag[:-1] + "-" + coding + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of If-None-Match against the identity ETag, as RFC 9110 prescribes for
+    If-None-Match; tags of compressed variants of the same content also match.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    variants = {variant_etag(etag, coding) for coding in ["identity", *available_codings()]}
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in variants:
+            return True
+    return False
+
+
+def cache_control(max_age: Optional[int], stale_while_revalidate: int = 0) -> str:
+    """
+    `max_age` None means the content has no known freshness, so clients must revalidate.
+    """
+    if max_age is None:
+        return "no-cache"
+    directives = [f"public, max-age={max_age}"]
+    if stale_while_revalidate > 0:
+        directives.append(f"stale-while-revalidate={stale_while_revalidate}")
+    return ", ".join(directives)
@@ -0,0 +1,80 @@
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+
+from src.config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class HttpClientSettings:
+    """
+    Connection-pool, keep-alive and timeout settings for the shared arXiv client.
+    """
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    write_timeout: float = 10.0
+    pool_timeout: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "HttpClientSettings":
+        """
+        Builds settings from ARXIV_HTTP_* environment variables, falling back to the defaults.
+        """
+        defaults = cls()
+        return cls(
+            max_connections=env_int("ARXIV_HTTP_MAX_CONNECTIONS", defaults.max_connections),
+            max_keepalive_connections=env_int("ARXIV_HTTP_MAX_KEEPALIVE", defaults.max_keepalive_connections),
+            keepalive_expiry=env_float("ARXIV_HTTP_KEEPALIVE_EXPIRY", defaults.keepalive_expiry),
+            http2=env_bool("ARXIV_HTTP_HTTP2", defaults.http2),
+            connect_timeout=env_float("ARXIV_HTTP_CONNECT_TIMEOUT", defaults.connect_timeout),
+            read_timeout=env_float("ARXIV_HTTP_READ_TIMEOUT", defaults.read_timeout),
+            write_timeout=env_float("ARXIV_HTTP_WRITE_TIMEOUT", defaults.write_timeout),
+            pool_timeout=env_float("ARXIV_HTTP_POOL_TIMEOUT", defaults.pool_timeout),
+        )
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+
+def create_http_client(settings: Optional[HttpClientSettings] = None) -> httpx.AsyncClient:
+    """
+    Creates a pooled AsyncClient intended to live for the whole application lifetime.
+    HTTP/2 is only enabled when requested and the optional `h2` package is installed.
+    """
+    settings = settings or HttpClientSettings.from_env()
+    http2 = settings.http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; falling back to HTTP/1.1.")
+            http2 = False
+
+    logger.info(
+        f"Creating shared HTTP client (max_connections={settings.max_connections}, "
+        f"max_keepalive={settings.max_keepalive_connections}, keepalive_expiry={settings.keepalive_expiry}s, "
+        f"http2={http2})"
+    )
+    return httpx.AsyncClient(limits=settings.limits, timeout=settings.timeout, http2=http2)
@@ -0,0 +1,256 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Latency buckets in seconds, from sub-millisecond cache hits up to slow upstream pages
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Size buckets in bytes, 1 KiB to 16 MiB in powers of four
+SIZE_BUCKETS = tuple(1024 * 4 ** exponent for exponent in range(8))
+
+LabelValues = Tuple[str, ...]
+# (labels, value) samples produced by a collector for one metric
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.label_names, key))
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}", *self._render_samples()]
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _render_samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}" for key, value in sorted(self._values.items())]
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value) # Buckets are inclusive upper bounds
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets) + 1)
+            series.counts[index] += 1
+            series.total += value
+            series.count += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series.count if series else 0
+
+    def _render_samples(self) -> List[str]:
+        lines = []
+        for key, series in sorted(self._series.items()):
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), series.counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series.total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series.count}")
+        return lines
+
+
+class _CollectedMetric(_Metric):
+    """
+    A counter or gauge whose samples are read from existing state at scrape time.
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str, collect: Callable[[], Samples]):
+        super().__init__(name, help_text)
+        self.kind = kind
+        self._collect = collect
+
+    def _render_samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in self._collect()]
+
+
+class MetricsRegistry:
+    """
+    A minimal Prometheus-compatible registry: counters and histograms updated in place,
+    plus callback metrics that expose counters already kept elsewhere (cache, scheduler).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def collected(self, name: str, help_text: str, kind: str, collect: Callable[[], Samples]) -> None:
+        self._register(_CollectedMetric(name, help_text, kind, collect))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Time spent in each stage of serving papers: waiting for the scheduler, upstream time to
+# response headers, body download, Atom parsing (including Paper construction), local
+# search and response encoding
+STAGE_SECONDS = REGISTRY.histogram(
+    "arxiv_stage_duration_seconds", "Time spent per request-processing stage.", ["stage"]
+)
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    "arxiv_upstream_requests_total", "Upstream arXiv requests by outcome (HTTP status, or error).", ["status"]
+)
+UPSTREAM_RESPONSE_BYTES = REGISTRY.histogram(
+    "arxiv_upstream_response_bytes", "Size of upstream arXiv response bodies.", buckets=SIZE_BUCKETS
+)
+# How queries were routed, and which sources their pages were actually served from
+QUERY_PLANS = REGISTRY.counter(
+    "arxiv_query_plans_total", "Planned queries by route (local, split, upstream) and sources serving the page.", ["route", "served"]
+)
+# Re-fetches of empty or short harvest pages, which arXiv sometimes serves mid-listing
+HARVEST_RETRIES = REGISTRY.counter(
+    "arxiv_harvest_retries_total", "Harvester retries of empty or short listing pages by category.", ["category"]
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "arxiv_http_request_duration_seconds", "API request latency by route and status.", ["route", "method", "status"]
+)
+HTTP_RESPONSE_BYTES = REGISTRY.histogram(
+    "arxiv_http_response_bytes", "API response body size by route.", ["route"], buckets=SIZE_BUCKETS
+)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    The path template of the route serving `scope` (e.g. '/papers/search'), so that metrics
+    are labelled per route rather than per raw URL.
+    """
+    app: Any = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording latency and response size of every HTTP request. For streamed
+    responses the latency covers the whole stream.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        route = route_template(scope) # Before routing, which rewrites the scope for mounts
+        status = "500"
+        size = 0
+
+        async def send_and_measure(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=scope["method"], status=status)
+            HTTP_RESPONSE_BYTES.observe(size, route=route)
@@ -0,0 +1,113 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from src.models.paper import Paper
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised for a cursor that cannot be decoded, or that belongs to a different listing.
+    """
+
+
+def scope_fingerprint(scope: str) -> str:
+    """
+    Short digest identifying the listing a cursor was issued for (e.g. 'latest', 'search:llm').
+    """
+    return hashlib.blake2b(scope.encode("utf-8"), digest_size=6).hexdigest()
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """
+    Position after the last paper of a page. The paper's id (and published date, should it
+    disappear upstream) identify the position; `offset` is only where that paper was in the
+    upstream ordering when the page was served, a hint for finding it again.
+    """
+    scope: str # scope_fingerprint() of the listing
+    published_date: str
+    arxiv_id: str
+    offset: int
+
+    @classmethod
+    def after(cls, scope: str, paper: Paper, offset: int) -> "Cursor":
+        return cls(scope_fingerprint(scope), paper.published_date, paper.arxiv_id, offset)
+
+    def encode(self) -> str:
+        payload = json.dumps([self.scope, self.published_date, self.arxiv_id, self.offset], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str, scope: str) -> "Cursor":
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            fingerprint, published_date, arxiv_id, offset = payload
+            cursor = cls(str(fingerprint), str(published_date), str(arxiv_id), int(offset))
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+            raise InvalidCursor("Malformed cursor.") from e
+        if cursor.scope != scope_fingerprint(scope) or cursor.offset < 0:
+            raise InvalidCursor("Cursor does not belong to this listing.")
+        return cursor
+
+
+class FeedSnapshot:
+    """
+    Papers of one upstream ordering (newest first), held in the order they were first seen
+    from `start` on. New papers published upstream shift later pages down, so pages fetched
+    afterwards overlap what is already held; repeats are dropped, which keeps the snapshot
+    free of duplicates and gaps however long a client takes between pages.
+    """
+
+    def __init__(self, start: int = 0):
+        self.start = start # Upstream offset of the first paper
+        self.next_offset = start # Upstream offset the next extension is fetched from
+        self.papers: List[Paper] = []
+        self.exhausted = False
+        self.fetched_at = time.time()
+        self.lock = asyncio.Lock() # Serializes extensions by concurrent requests
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.papers)
+
+    def extend(self, papers: List[Paper], requested: int) -> int:
+        """
+        Appends an upstream page fetched from `next_offset`; returns how many papers were new.
+        """
+        added = 0
+        for paper in papers:
+            if paper.arxiv_id not in self._positions:
+                self._positions[paper.arxiv_id] = len(self.papers)
+                self.papers.append(paper)
+                added += 1
+        self.next_offset += len(papers)
+        if len(papers) < requested:
+            self.exhausted = True
+        return added
+
+    def starts_after(self, cursor: Cursor) -> bool:
+        """
+        Whether the snapshot begins past the cursor's paper, so papers between the two may be missing.
+        """
+        return self.start > 0 and (not self.papers or self.papers[0].published_date < cursor.published_date)
+
+    def position_after(self, cursor: Cursor) -> Optional[int]:
+        """
+        Index of the first paper after `cursor`, or None if the snapshot does not reach it.
+        A cursor paper that has since disappeared upstream resolves to the first older paper.
+        """
+        position = self._positions.get(cursor.arxiv_id)
+        if position is not None:
+            return position + 1
+        if self.starts_after(cursor):
+            return None
+        for index, paper in enumerate(self.papers):
+            if paper.published_date < cursor.published_date:
+                return index
+        return len(self.papers) if self.exhausted else None
@@ -0,0 +1,403 @@
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    delete,
+    event,
+    insert,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.pool import StaticPool
+
+from src.models.paper import Paper
+from src.services.serialization import PaperList
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+papers_table = Table(
+    "papers",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True), # Also the FTS rowid
+    Column("paper_id", String, nullable=False, unique=True), # arXiv id without version suffix
+    Column("arxiv_id", String, nullable=False), # Id as returned by arXiv, including version
+    Column("version", Integer, nullable=False, default=1),
+    Column("title", Text, nullable=False),
+    Column("summary", Text, nullable=False),
+    Column("published_date", String, nullable=False, index=True),
+    Column("updated_date", String, index=True),
+    Column("pdf_url", String),
+    Column("stored_at", Integer, nullable=False, index=True),
+)
+
+paper_authors_table = Table(
+    "paper_authors",
+    metadata,
+    Column("paper_rowid", Integer, ForeignKey("papers.id", ondelete="CASCADE"), primary_key=True),
+    Column("position", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+)
+
+paper_categories_table = Table(
+    "paper_categories",
+    metadata,
+    Column("paper_rowid", Integer, ForeignKey("papers.id", ondelete="CASCADE"), primary_key=True),
+    Column("position", Integer, primary_key=True),
+    Column("term", String, nullable=False, index=True),
+)
+
+harvest_state_table = Table(
+    "harvest_state",
+    metadata,
+    Column("category", String, primary_key=True),
+    Column("watermark", String), # Newest updated_date fully ingested by a completed run
+    Column("covered_since", String), # Oldest updated_date the harvested history reaches back to
+    Column("run_high_water", String), # Newest updated_date seen by the run in progress
+    Column("resume_start", Integer, nullable=False, default=0), # Next offset of the run in progress
+    Column("last_run_at", Integer),
+)
+
+_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5("
+    "title, summary, authors, tokenize = 'porter unicode61')"
+)
+
+# bm25() column weights for (title, summary, authors); a title match counts most
+_BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+_VERSION_RE = re.compile(r"^(?P<base>.+?)(?:v(?P<version>\d+))?$")
+
+
+def split_arxiv_id(arxiv_id: str) -> Tuple[str, int]:
+    """
+    Splits an arXiv id such as '2301.00001v2' or 'hep-th/9901001v1' into (base id, version).
+    Ids without a version suffix are treated as version 1.
+    """
+    match = _VERSION_RE.match(arxiv_id.strip())
+    if not match:
+        return arxiv_id, 1
+    return match.group("base"), int(match.group("version") or 1)
+
+
+def build_match_query(keyword: str) -> str:
+    """
+    Turns free text into an FTS5 MATCH expression: every token is quoted, so user input
+    can never be interpreted as FTS5 syntax, and tokens are implicitly AND-ed.
+    """
+    tokens = [token.replace('"', '""') for token in keyword.split()]
+    return " ".join(f'"{token}"' for token in tokens if token)
+
+
+@dataclass
+class HarvestState:
+    category: str
+    watermark: Optional[str] = None
+    covered_since: Optional[str] = None
+    run_high_water: Optional[str] = None
+    resume_start: int = 0
+    last_run_at: Optional[int] = None
+
+    @property
+    def in_progress(self) -> bool:
+        return self.run_high_water is not None
+
+
+class PaperStore:
+    """
+    Persistent SQLite store of Paper records with an FTS5 index over title, summary and author names.
+    Methods are synchronous; async callers should run them in a worker thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.engine = self._create_engine(path)
+        self._write_lock = threading.Lock()
+        self._create_schema()
+
+    @staticmethod
+    def _create_engine(path: str) -> Engine:
+        if path == ":memory:":
+            engine = create_engine(
+                "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+            )
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+        @event.listens_for(engine, "connect")
+        def _configure_connection(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+        return engine
+
+    def _create_schema(self) -> None:
+        metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(text(_FTS_DDL))
+            # create_all only indexes new tables; stores created before stored_at was indexed get it here
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_papers_stored_at ON papers (stored_at)"))
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+    def count(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT count(*) FROM papers")).scalar_one()
+
+    def upsert_papers(self, papers: Iterable[Paper]) -> int:
+        """
+        Inserts or updates papers keyed by their versionless arXiv id. A stored newer version
+        is never overwritten by an older one. Returns the number of rows inserted or updated.
+        """
+        written = 0
+        with self._write_lock, self.engine.begin() as conn:
+            now = int(time.time()) # Stamped once the lock is held, so this process's writes commit in stored_at order
+            for paper in papers:
+                if self._upsert_one(conn, paper, now):
+                    written += 1
+        return written
+
+    def _upsert_one(self, conn: Connection, paper: Paper, now: int) -> bool:
+        paper_id, version = split_arxiv_id(paper.arxiv_id)
+        values = {
+            "paper_id": paper_id,
+            "arxiv_id": paper.arxiv_id,
+            "version": version,
+            "title": paper.title,
+            "summary": paper.summary,
+            "published_date": paper.published_date,
+            "updated_date": paper.updated_date,
+            "pdf_url": str(paper.pdf_url) if paper.pdf_url else None,
+            "stored_at": now,
+        }
+        existing = conn.execute(
+            select(papers_table.c.id, papers_table.c.version).where(papers_table.c.paper_id == paper_id)
+        ).first()
+        if existing is None:
+            rowid = conn.execute(insert(papers_table).values(**values)).inserted_primary_key[0]
+        else:
+            rowid, stored_version = existing
+            if stored_version > version:
+                return False
+            conn.execute(update(papers_table).where(papers_table.c.id == rowid).values(**values))
+            conn.execute(delete(paper_authors_table).where(paper_authors_table.c.paper_rowid == rowid))
+            conn.execute(delete(paper_categories_table).where(paper_categories_table.c.paper_rowid == rowid))
+            conn.execute(text("DELETE FROM papers_fts WHERE rowid = :rowid"), {"rowid": rowid})
+
+        if paper.authors:
+            conn.execute(insert(paper_authors_table), [
+                {"paper_rowid": rowid, "position": position, "name": author.name}
+                for position, author in enumerate(paper.authors)
+            ])
+        if paper.categories:
+            conn.execute(insert(paper_categories_table), [
+                {"paper_rowid": rowid, "position": position, "term": term}
+                for position, term in enumerate(paper.categories)
+            ])
+        conn.execute(
+            text("INSERT INTO papers_fts (rowid, title, summary, authors) VALUES (:rowid, :title, :summary, :authors)"),
+            {
+                "rowid": rowid,
+                "title": paper.title,
+                "summary": paper.summary,
+                "authors": " ".join(author.name for author in paper.authors),
+            },
+        )
+        return True
+
+    def get_harvest_state(self, category: str) -> HarvestState:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(harvest_state_table).where(harvest_state_table.c.category == category)
+            ).mappings().first()
+        return HarvestState(**row) if row else HarvestState(category=category)
+
+    def list_harvest_states(self) -> List[HarvestState]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(harvest_state_table).order_by(harvest_state_table.c.category)).mappings().all()
+        return [HarvestState(**row) for row in rows]
+
+    def save_harvest_state(self, state: HarvestState) -> None:
+        values = {
+            "watermark": state.watermark,
+            "covered_since": state.covered_since,
+            "run_high_water": state.run_high_water,
+            "resume_start": state.resume_start,
+            "last_run_at": state.last_run_at,
+        }
+        with self._write_lock, self.engine.begin() as conn:
+            updated = conn.execute(
+                update(harvest_state_table).where(harvest_state_table.c.category == state.category).values(**values)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(harvest_state_table).values(category=state.category, **values))
+
+    def rowid_of(self, arxiv_id: str) -> Optional[int]:
+        paper_id, _ = split_arxiv_id(arxiv_id)
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(papers_table.c.id).where(papers_table.c.paper_id == paper_id)
+            ).scalar_one_or_none()
+
+    def get_paper(self, arxiv_id: str) -> Optional[Paper]:
+        paper_id, _ = split_arxiv_id(arxiv_id)
+        with self.engine.connect() as conn:
+            rowid = conn.execute(
+                select(papers_table.c.id).where(papers_table.c.paper_id == paper_id)
+            ).scalar_one_or_none()
+            if rowid is None:
+                return None
+            return self._load_papers(conn, [rowid])[0]
+
+    def get_papers(self, arxiv_ids: Sequence[str]) -> Dict[str, Paper]:
+        """
+        Looks up many ids in one query, returning the stored papers keyed by the requested id.
+        A versionless id matches whatever version is stored; a versioned id only that exact version.
+        """
+        bases = {arxiv_id: split_arxiv_id(arxiv_id)[0] for arxiv_id in arxiv_ids}
+        if not bases:
+            return {}
+        with self.engine.connect() as conn:
+            rowids = conn.execute(
+                select(papers_table.c.id).where(papers_table.c.paper_id.in_(set(bases.values())))
+            ).scalars().all()
+            by_base = {split_arxiv_id(paper.arxiv_id)[0]: paper for paper in self._load_papers(conn, rowids)}
+        found = {}
+        for arxiv_id, base in bases.items():
+            paper = by_base.get(base)
+            if paper is not None and (arxiv_id == base or paper.arxiv_id == arxiv_id):
+                found[arxiv_id] = paper
+        return found
+
+    def iter_papers_stored_since(self, stored_at: int, batch_size: int = 1000) -> Iterator[Tuple[PaperList, int]]:
+        """
+        Yields, in batches, the papers inserted or updated at or after `stored_at` (epoch seconds),
+        each batch with the largest stored_at among its papers.
+        """
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(papers_table.c.id, papers_table.c.stored_at).where(papers_table.c.stored_at >= stored_at).order_by(papers_table.c.id)
+            ).all()
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            with self.engine.connect() as conn:
+                yield self._load_papers(conn, [rowid for rowid, _ in batch]), max(stored for _, stored in batch)
+
+    def facet_rows_stored_since(self, stored_at: int) -> List[Tuple[int, str, List[str], int]]:
+        """
+        (row id, published date, categories, stored_at) of the papers inserted or updated at or
+        after `stored_at`, for building the facet index.
+        """
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT papers.id, papers.published_date, group_concat(paper_categories.term, ' '), papers.stored_at "
+                    "FROM papers LEFT JOIN paper_categories ON paper_categories.paper_rowid = papers.id "
+                    "WHERE papers.stored_at >= :stored_at GROUP BY papers.id"
+                ),
+                {"stored_at": stored_at},
+            ).all()
+        return [
+            (rowid, published_date, terms.split(" ") if terms else [], stored) for rowid, published_date, terms, stored in rows
+        ]
+
+    def search_rowids(self, keyword: str, limit: int) -> List[int]:
+        """
+        Row ids of the best `limit` full-text matches, ranked as by search().
+        """
+        match_query = build_match_query(keyword)
+        if not match_query:
+            return []
+        weights = ", ".join(str(weight) for weight in _BM25_WEIGHTS)
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text(
+                    f"SELECT rowid FROM papers_fts WHERE papers_fts MATCH :query "
+                    f"ORDER BY bm25(papers_fts, {weights}), rowid LIMIT :limit"
+                ),
+                {"query": match_query, "limit": limit},
+            ).scalars().all()
+
+    def load_papers(self, rowids: Sequence[int]) -> PaperList:
+        """
+        The papers with the given row ids (as indexed by facets), in that order.
+        """
+        with self.engine.connect() as conn:
+            return self._load_papers(conn, rowids)
+
+    def search(self, keyword: str, start: int = 0, max_results: int = 25) -> List[Paper]:
+        """
+        Full-text search ranked by BM25 (best match first), paginated with start/max_results.
+        """
+        match_query = build_match_query(keyword)
+        if not match_query:
+            return []
+        weights = ", ".join(str(weight) for weight in _BM25_WEIGHTS)
+        with self.engine.connect() as conn:
+            rowids = conn.execute(
+                text(
+                    f"SELECT rowid FROM papers_fts WHERE papers_fts MATCH :query "
+                    f"ORDER BY bm25(papers_fts, {weights}), rowid LIMIT :limit OFFSET :offset"
+                ),
+                {"query": match_query, "limit": max_results, "offset": start},
+            ).scalars().all()
+            return self._load_papers(conn, rowids)
+
+    def _load_papers(self, conn: Connection, rowids: Sequence[int]) -> PaperList:
+        """
+        Rebuilds Paper models for the given row ids, preserving their order.
+        """
+        if not rowids:
+            return PaperList()
+        rows = conn.execute(select(papers_table).where(papers_table.c.id.in_(rowids))).mappings().all()
+        authors: Dict[int, List[str]] = {rowid: [] for rowid in rowids}
+        for rowid, name in conn.execute(
+            select(paper_authors_table.c.paper_rowid, paper_authors_table.c.name)
+            .where(paper_authors_table.c.paper_rowid.in_(rowids))
+            .order_by(paper_authors_table.c.paper_rowid, paper_authors_table.c.position)
+        ):
+            authors[rowid].append(name)
+        categories: Dict[int, List[str]] = {rowid: [] for rowid in rowids}
+        for rowid, term in conn.execute(
+            select(paper_categories_table.c.paper_rowid, paper_categories_table.c.term)
+            .where(paper_categories_table.c.paper_rowid.in_(rowids))
+            .order_by(paper_categories_table.c.paper_rowid, paper_categories_table.c.position)
+        ):
+            categories[rowid].append(term)
+
+        by_rowid = {
+            row["id"]: Paper.from_trusted(
+                arxiv_id=row["arxiv_id"],
+                title=row["title"],
+                summary=row["summary"],
+                author_names=authors[row["id"]],
+                published_date=row["published_date"],
+                updated_date=row["updated_date"],
+                pdf_url=row["pdf_url"],
+                categories=categories[row["id"]],
+            )
+            for row in rows
+        }
+        return PaperList(by_rowid[rowid] for rowid in rowids if rowid in by_rowid)
@@ -0,0 +1,134 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Dict, Optional, Sequence, Set, Tuple
+
+from src.config import env_bool, env_float, env_int
+from src.services.metrics import QUERY_PLANS
+
+if TYPE_CHECKING:
+    from src.services.paper_store import HarvestState
+
+PLANNER_ENABLED = env_bool("ARXIV_PLANNER_ENABLED", True)
+# A category whose last harvest run completed this recently is covered up to now
+MAX_LAG = env_float("ARXIV_PLANNER_MAX_LAG", 3600.0)
+# Papers newer than the covered window are fetched as far as a page needs, in one request of
+# at most this many; a page that reaches past them goes upstream whole, the harvester being too far behind
+FRESH_MAX = env_int("ARXIV_PLANNER_FRESH_MAX", 500)
+
+LOCAL = "local"
+UPSTREAM = "upstream"
+SPLIT = "split"
+
+_ONE_DAY = timedelta(days=1)
+_current_plan: ContextVar[Optional["QueryPlan"]] = ContextVar("query_plan", default=None)
+
+
+@dataclass(frozen=True)
+class Coverage:
+    """
+    Days of submissions held completely in the local store. `last` is None when the store is
+    up to date.
+    """
+    first: date
+    last: Optional[date] = None
+
+
+@dataclass(frozen=True)
+class Segment:
+    source: str # LOCAL or UPSTREAM
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+    def label(self) -> str:
+        return f"{self.source}:{self.date_from or ''}..{self.date_to or ''}"
+
+
+@dataclass
+class QueryPlan:
+    """
+    Where a query is answered: its submission dates split into segments, newest first, each
+    answered by the local store or by arXiv. Pages concatenate the segments' results.
+    """
+    route: str
+    segments: Tuple[Segment, ...]
+    reason: str = ""
+    served: Set[str] = field(default_factory=set) # Sources that contributed to the page
+
+    @classmethod
+    def upstream(cls, date_from: Optional[date], date_to: Optional[date], reason: str) -> "QueryPlan":
+        return cls(UPSTREAM, (Segment(UPSTREAM, date_from, date_to),), reason)
+
+    def header(self) -> str:
+        parts = [f"route={self.route}", f"served={'+'.join(sorted(self.served)) or 'none'}"]
+        parts.append("segments=" + ",".join(segment.label() for segment in self.segments))
+        if self.reason:
+            parts.append(f"reason={self.reason}")
+        return "; ".join(parts)
+
+
+def _day(timestamp: str) -> date:
+    return date.fromisoformat(timestamp[:10])
+
+
+def category_coverage(state: Optional["HarvestState"], now: Optional[float] = None) -> Optional[Coverage]:
+    """
+    Whole days of a category that the harvester has ingested completely, or None. Harvests
+    reach from `covered_since` up to the watermark of the last completed run; days that
+    only partly fall in that span are not covered.
+    """
+    if state is None or not state.covered_since or not state.watermark:
+        return None
+    first = _day(state.covered_since) + _ONE_DAY
+    now = time.time() if now is None else now
+    if not state.in_progress and state.last_run_at is not None and now - state.last_run_at <= MAX_LAG:
+        return Coverage(first)
+    last = _day(state.watermark) - _ONE_DAY
+    return Coverage(first, last) if last >= first else None
+
+
+def plan_query(
+    categories: Sequence[str],
+    date_from: Optional[date],
+    date_to: Optional[date],
+    coverage: Dict[str, "HarvestState"],
+    now: Optional[float] = None,
+) -> QueryPlan:
+    """
+    Plans a query over `categories` (any of them) and a submission date range. The part of
+    the range that every category covers is answered locally; newer and older parts go to
+    arXiv. Queries over all categories, or an uncovered one, go to arXiv whole.
+    """
+    if not categories:
+        return QueryPlan.upstream(date_from, date_to, "all-categories")
+    windows = [category_coverage(coverage.get(category), now) for category in categories]
+    if any(window is None for window in windows):
+        return QueryPlan.upstream(date_from, date_to, "uncovered-category")
+    first = max(window.first for window in windows)
+    lasts = [window.last for window in windows if window.last is not None]
+    last = min(lasts) if lasts else None
+
+    local_from = max(date_from, first) if date_from else first
+    local_to = min(date_to, last) if date_to and last else date_to or last
+    if local_to is not None and local_from > local_to:
+        return QueryPlan.upstream(date_from, date_to, "outside-coverage")
+    segments = []
+    if last is not None and (date_to is None or date_to > last):
+        segments.append(Segment(UPSTREAM, last + _ONE_DAY, date_to))
+    segments.append(Segment(LOCAL, local_from, local_to))
+    if date_from is None or date_from < first:
+        segments.append(Segment(UPSTREAM, date_from, first - _ONE_DAY))
+    return QueryPlan(LOCAL if len(segments) == 1 else SPLIT, tuple(segments))
+
+
+def record_plan(plan: QueryPlan) -> None:
+    """
+    Counts a carried-out plan and keeps it as the current request's, for its X-Query-Plan header.
+    """
+    QUERY_PLANS.inc(route=plan.route, served="+".join(sorted(plan.served)) or "none")
+    _current_plan.set(plan)
+
+
+def current_plan() -> Optional[QueryPlan]:
+    return _current_plan.get()
@@ -0,0 +1,490 @@
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.config import env_int, env_str
+from src.models.paper import Paper
+from src.services import facets
+
+if TYPE_CHECKING:
+    from src.services.paper_store import PaperStore
+
+
+class _LazyNumpy:
+    """
+    Stands in for numpy until it is first used, then replaces itself with the real module:
+    importing numpy takes longer than importing the rest of the application but FastAPI.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        import numpy
+        globals()["np"] = numpy
+        return getattr(numpy, name)
+
+
+# Optional; without it related-paper recommendations are unavailable
+np: Any = _LazyNumpy() if importlib.util.find_spec("numpy") is not None else None
+
+logger = logging.getLogger(__name__)
+
+RELATED_DIR = env_str("ARXIV_RELATED_DIR", "data/related")
+# Width of the hashed feature space; unigrams and bigrams of titles and abstracts are hashed into it
+RELATED_FEATURES = env_int("ARXIV_RELATED_FEATURES", 1 << 18)
+# New papers are buffered in memory and sealed into an on-disk segment once this many have arrived
+SEGMENT_SIZE = env_int("ARXIV_RELATED_SEGMENT_SIZE", 5000)
+# Terms of a query vector that are scored, highest tf-idf first
+QUERY_TERMS = env_int("ARXIV_RELATED_QUERY_TERMS", 48)
+# More sealed segments than this are merged into one, dropping replaced paper versions
+MAX_SEGMENTS = env_int("ARXIV_RELATED_MAX_SEGMENTS", 8)
+
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9]*(?:-[a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a about above after all also an and any are as at be been being both but by can could do does "
+    "each for from had has have here how however if in into is it its may more most much must new no "
+    "not of on one only or other our over paper propose proposed show shows some such than that the their "
+    "them then there these they this those through thus to two under up use used using via was we well "
+    "were what when where whether which while who will with within without would".split()
+)
+_VERSION_SUFFIX_RE = re.compile(r"v\d+$")
+
+_ARRAYS = ("doc_ptr", "doc_terms", "doc_logtf", "term_ptr", "post_docs", "post_weights")
+
+
+def available() -> bool:
+    return np is not None
+
+
+try:
+    import fcntl
+except ImportError: # Not on Windows, where a single worker is assumed
+    fcntl = None
+
+# Directories claimed by this process -> their open, locked .lock files
+_claims: Dict[str, Any] = {}
+
+
+def claim_directory(directory: str) -> str:
+    """
+    A directory under `directory` that only this process writes to: `directory` itself for the
+    first process to ask, `directory/worker-N` for the others. A claim is an exclusive lock on
+    the directory's .lock file, held until the process exits, so worker processes sharing
+    ARXIV_RELATED_DIR never write, merge or delete each other's segments, and a restarted
+    worker reopens a directory left by an earlier one.
+    """
+    if fcntl is None:
+        return directory
+    for number in itertools.count():
+        candidate = directory if number == 0 else os.path.join(directory, f"worker-{number}")
+        if candidate in _claims:
+            return candidate
+        os.makedirs(candidate, exist_ok=True)
+        lock_file = open(os.path.join(candidate, ".lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        _claims[candidate] = lock_file
+        return candidate
+
+
+def _base_id(arxiv_id: str) -> str:
+    return _VERSION_SUFFIX_RE.sub("", arxiv_id)
+
+
+def _version(arxiv_id: str) -> int:
+    match = _VERSION_SUFFIX_RE.search(arxiv_id)
+    return int(match.group()[1:]) if match else 0
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in _TOKEN_RE.findall(text.lower()) if len(word) > 1 and word not in _STOPWORDS]
+
+
+def paper_terms(paper: Paper, features: int = RELATED_FEATURES) -> Dict[int, int]:
+    """
+    Hashed term counts of a paper: unigrams and bigrams of the title (counted twice) and abstract.
+    """
+    counts: Dict[int, int] = {}
+    for words, weight in ((_words(paper.title), 2), (_words(paper.summary), 1)):
+        for term in [*words, *(f"{first} {second}" for first, second in zip(words, words[1:]))]:
+            feature = zlib.crc32(term.encode("utf-8")) % features
+            counts[feature] = counts.get(feature, 0) + weight
+    return counts
+
+
+class Segment:
+    """
+    An immutable block of indexed papers, stored twice: forward rows (each paper's terms and
+    log term frequencies, to build query vectors from) and postings (each term's papers and
+    their cosine-normalized log-tf weights, to score with). Sealed segments are memory-mapped;
+    only the `deleted` flags of papers superseded by a newer version change afterwards.
+    """
+
+    def __init__(self, ids: List[str], arrays: Dict[str, "np.ndarray"], deleted: Optional["np.ndarray"] = None):
+        self.ids = ids
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self.deleted = deleted if deleted is not None else np.zeros(len(ids), dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, ids: List[str], rows: Sequence[Dict[int, int]], features: int) -> "Segment":
+        lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+        doc_ptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=doc_ptr[1:])
+        total = int(doc_ptr[-1])
+        doc_terms = np.fromiter((term for row in rows for term in row), dtype=np.int32, count=total)
+        counts = np.fromiter((count for row in rows for count in row.values()), dtype=np.float32, count=total)
+        return cls.from_forward(ids, doc_ptr, doc_terms, 1 + np.log(counts), features)
+
+    @classmethod
+    def from_forward(cls, ids: List[str], doc_ptr: "np.ndarray", doc_terms: "np.ndarray", doc_logtf: "np.ndarray", features: int) -> "Segment":
+        """
+        Builds the postings from forward rows: documents are weighted lnc (log tf, no idf,
+        cosine-normalized), so their weights never change as document frequencies do.
+        """
+        doc_of_entry = np.repeat(np.arange(len(ids), dtype=np.int32), np.diff(doc_ptr))
+        norms = np.sqrt(np.bincount(doc_of_entry, weights=doc_logtf.astype(np.float64) ** 2, minlength=len(ids)))
+        weights = (doc_logtf / np.maximum(norms, 1e-12)[doc_of_entry]).astype(np.float32)
+        order = np.argsort(doc_terms, kind="stable")
+        term_ptr = np.zeros(features + 1, dtype=np.int64)
+        np.cumsum(np.bincount(doc_terms, minlength=features), out=term_ptr[1:])
+        return cls(ids, {
+            "doc_ptr": doc_ptr,
+            "doc_terms": doc_terms,
+            "doc_logtf": doc_logtf.astype(np.float32),
+            "term_ptr": term_ptr,
+            "post_docs": doc_of_entry[order],
+            "post_weights": weights[order],
+        })
+
+    def row(self, index: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        start, end = self.doc_ptr[index], self.doc_ptr[index + 1]
+        return np.asarray(self.doc_terms[start:end]), np.asarray(self.doc_logtf[start:end])
+
+    def scores(self, terms: "np.ndarray", weights: "np.ndarray") -> "np.ndarray":
+        """
+        Dot products of a query vector with every paper: the postings of all query terms are
+        gathered in one vectorized pass and summed per paper.
+        """
+        starts = self.term_ptr[terms]
+        counts = self.term_ptr[terms + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(len(self.ids), dtype=np.float32)
+        # Positions of every posting of every query term, as one flat index array
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        contributions = self.post_weights[offsets] * np.repeat(weights, counts)
+        scores = np.bincount(self.post_docs[offsets], weights=contributions, minlength=len(self.ids))
+        scores[self.deleted] = 0
+        return scores
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "ids.json"), "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+        self.save_deleted(directory)
+
+    def save_deleted(self, directory: str) -> None:
+        np.save(os.path.join(directory, "deleted.npy"), self.deleted)
+
+    @classmethod
+    def load(cls, directory: str) -> "Segment":
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        with open(os.path.join(directory, "ids.json"), encoding="utf-8") as f:
+            ids = json.load(f)
+        deleted = np.load(os.path.join(directory, "deleted.npy")) # Small and mutable, so read into memory
+        return cls(ids, arrays, deleted)
+
+
+class RelatedIndex:
+    """
+    Incrementally updated TF-IDF similarity index over paper titles and abstracts, scored
+    lnc.ltc: papers carry log-tf cosine-normalized weights, queries log-tf times idf, so adding
+    papers only changes document frequencies, never stored weights. Papers are identified by
+    versionless id; a newer version replaces the older one. New papers are held in a buffer that
+    is sealed into an immutable segment every SEGMENT_SIZE papers, and segments are merged once
+    there are more than MAX_SEGMENTS. With a `directory`, segments are persisted there and
+    memory-mapped when the index is reopened; only one process may write to a directory (see
+    claim_directory). Methods are synchronous and thread-safe.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        features: int = RELATED_FEATURES,
+        segment_size: int = SEGMENT_SIZE,
+        max_segments: int = MAX_SEGMENTS,
+        query_terms: int = QUERY_TERMS,
+    ):
+        if np is None:
+            raise RuntimeError("The related-paper index requires NumPy (pip install numpy)")
+        self.directory = directory
+        self.features = features
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.query_terms = query_terms
+        self.segments: List[Segment] = []
+        self.df = np.zeros(features, dtype=np.int64)
+        self.store_watermark = 0 # stored_at up to which the local paper store has been indexed
+        self._segment_names: List[str] = []
+        self._next_segment = 1
+        self._pending_ids: List[str] = []
+        self._pending_rows: List[Dict[int, int]] = []
+        self._buffer: Optional[Segment] = None # Pending papers as a segment, built when first queried
+        self._versions: Dict[str, str] = {} # Versionless id -> indexed arxiv_id
+        self._locations: Dict[str, Tuple[Optional[Segment], int]] = {} # None: pending
+        self._dirty = False # Changed since last persisted
+        self._lock = threading.RLock()
+        if directory and os.path.exists(os.path.join(directory, "manifest.json")):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __contains__(self, arxiv_id: str) -> bool:
+        return _base_id(arxiv_id) in self._locations
+
+    def add(self, papers: Iterable[Paper]) -> int:
+        """
+        Indexes papers not seen before, or in a newer version. Returns how many were added.
+        """
+        added = 0
+        with self._lock:
+            for paper in papers:
+                base = _base_id(paper.arxiv_id)
+                indexed = self._versions.get(base)
+                if indexed is not None and (indexed == paper.arxiv_id or _version(indexed) > _version(paper.arxiv_id)):
+                    continue
+                row = paper_terms(paper, self.features)
+                self._remove(base)
+                self._versions[base] = paper.arxiv_id
+                self._locations[base] = (None, len(self._pending_ids))
+                self._pending_ids.append(paper.arxiv_id)
+                self._pending_rows.append(row)
+                self.df[list(row)] += 1
+                added += 1
+            if added:
+                self._buffer = None
+                self._dirty = True
+            if len(self._pending_ids) >= self.segment_size:
+                self._seal()
+        return added
+
+    def _remove(self, base: str) -> None:
+        location = self._locations.pop(base, None)
+        if location is None:
+            return
+        segment, index = location
+        if segment is None:
+            terms = list(self._pending_rows[index])
+            self._pending_rows[index] = {}
+        else:
+            terms = segment.row(index)[0]
+            segment.deleted[index] = True
+        self.df[terms] -= 1
+
+    def related(self, arxiv_id: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        The `limit` papers most similar to an indexed one, best first, as (arxiv_id, cosine) pairs.
+        Raises KeyError for papers that are not indexed.
+        """
+        base = _base_id(arxiv_id)
+        with self._lock:
+            segment, index = self._locations[base]
+            if segment is None:
+                row = self._pending_rows[index]
+                terms = np.fromiter(row, dtype=np.int64, count=len(row))
+                logtf = 1 + np.log(np.fromiter(row.values(), dtype=np.float32, count=len(row)))
+            else:
+                terms, logtf = segment.row(index)
+                terms = terms.astype(np.int64)
+            segments = list(self.segments)
+            if self._pending_ids:
+                if self._buffer is None:
+                    self._buffer = Segment.from_rows(list(self._pending_ids), self._pending_rows, self.features)
+                segments.append(self._buffer)
+            total = max(len(self), 1)
+            idf = np.log(total / np.maximum(self.df[terms], 1))
+
+        # Query weights are ltc: log tf times idf, cosine-normalized
+        weights = (logtf * idf).astype(np.float32)
+        norm = float(np.sqrt(np.dot(weights, weights)))
+        if norm == 0:
+            return []
+        weights /= norm
+        if len(terms) > self.query_terms:
+            # Only the highest-weighted terms are scored: common terms have the longest postings
+            # but contribute least, so dropping them cuts query time at little cost in ranking
+            keep = np.argpartition(-weights, self.query_terms - 1)[:self.query_terms]
+            terms, weights = terms[keep], weights[keep]
+        candidates: List[Tuple[float, str]] = []
+        for segment in segments:
+            scores = segment.scores(terms, weights)
+            count = min(limit + 1, len(scores))
+            if count == 0:
+                continue
+            top = np.argpartition(-scores, count - 1)[:count]
+            candidates.extend((float(scores[i]), segment.ids[i]) for i in top if scores[i] > 0)
+        candidates.sort(key=lambda candidate: -candidate[0])
+        return [(candidate_id, round(score, 6)) for score, candidate_id in candidates if _base_id(candidate_id) != base][:limit]
+
+    def _seal(self) -> None:
+        if not self._pending_ids:
+            return
+        segment = Segment.from_rows(self._pending_ids, self._pending_rows, self.features)
+        for index, row in enumerate(self._pending_rows):
+            if not row: # Superseded while pending
+                segment.deleted[index] = True
+        self._add_segment(segment)
+        self._pending_ids, self._pending_rows, self._buffer = [], [], None
+        if len(self.segments) > self.max_segments:
+            self._merge()
+        self._write_manifest()
+
+    def _add_segment(self, segment: Segment) -> None:
+        name = f"segment-{self._next_segment:06d}"
+        self._next_segment += 1
+        if self.directory:
+            segment.save(os.path.join(self.directory, name))
+            segment = Segment.load(os.path.join(self.directory, name))
+        for index, arxiv_id in enumerate(segment.ids):
+            if not segment.deleted[index]:
+                self._locations[_base_id(arxiv_id)] = (segment, index)
+        self.segments.append(segment)
+        self._segment_names.append(name)
+
+    def _merge(self) -> None:
+        """
+        Rewrites all sealed segments as one, dropping superseded papers.
+        """
+        ids: List[str] = []
+        lengths, terms, logtfs = [], [], []
+        for segment in self.segments:
+            keep = np.flatnonzero(~segment.deleted)
+            ids.extend(segment.ids[index] for index in keep)
+            row_lengths = np.diff(segment.doc_ptr)
+            entry_kept = np.repeat(~segment.deleted, row_lengths)
+            lengths.append(row_lengths[keep])
+            terms.append(np.asarray(segment.doc_terms)[entry_kept])
+            logtfs.append(np.asarray(segment.doc_logtf)[entry_kept])
+        doc_ptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.concatenate(lengths), out=doc_ptr[1:])
+        merged = Segment.from_forward(ids, doc_ptr, np.concatenate(terms), np.concatenate(logtfs), self.features)
+        old_names = self._segment_names
+        self.segments, self._segment_names = [], []
+        self._add_segment(merged)
+        self._write_manifest()
+        if self.directory:
+            for name in old_names:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        logger.info(f"Merged {len(old_names)} related-index segments into one of {len(ids)} papers.")
+
+    def _write_manifest(self) -> None:
+        self._dirty = False
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for name, segment in zip(self._segment_names, self.segments):
+            segment.save_deleted(os.path.join(self.directory, name))
+        np.save(os.path.join(self.directory, "df.npy"), self.df)
+        manifest = {
+            "features": self.features,
+            "segments": self._segment_names,
+            "next_segment": self._next_segment,
+            "store_watermark": self.store_watermark,
+        }
+        path = os.path.join(self.directory, "manifest.json")
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(temporary, path)
+
+    def _load(self) -> None:
+        with open(os.path.join(self.directory, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["features"] != self.features:
+            logger.warning(f"Related index at {self.directory} uses {manifest['features']} features; keeping that.")
+            self.features = manifest["features"]
+        self._next_segment = manifest["next_segment"]
+        self.store_watermark = manifest.get("store_watermark", 0)
+        self.df = np.load(os.path.join(self.directory, "df.npy"))
+        for name in manifest["segments"]:
+            segment = Segment.load(os.path.join(self.directory, name))
+            for index, arxiv_id in enumerate(segment.ids):
+                if not segment.deleted[index]:
+                    self._locations[_base_id(arxiv_id)] = (segment, index)
+                    self._versions[_base_id(arxiv_id)] = arxiv_id
+            self.segments.append(segment)
+            self._segment_names.append(name)
+
+    def mark_synced(self, stored_at: int) -> None:
+        with self._lock:
+            self.store_watermark = stored_at
+            self._dirty = True
+
+    def flush(self) -> None:
+        """
+        Seals buffered papers into a segment and persists the index.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self._seal()
+            self._write_manifest()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "papers": len(self),
+                "segments": len(self.segments),
+                "pending": sum(1 for row in self._pending_rows if row),
+                "features": self.features,
+            }
+
+
+def sync_from_store(index: RelatedIndex, store: "PaperStore", batch_size: int = 1000, stop: Optional[threading.Event] = None) -> int:
+    """
+    Indexes papers written to the local store since the last sync (e.g. by the harvester
+    running as a separate process), then persists the index. Returns how many were added.
+    Setting `stop` ends the sync after the current batch; it then resumes from the start next time.
+    The watermark trails the newest stored_at read by facets.WATERMARK_MARGIN, so that writes
+    stamped earlier but committed after the read are picked up by the next sync.
+    """
+    added = 0
+    newest = None
+    for papers, stored_at in store.iter_papers_stored_since(index.store_watermark, batch_size):
+        added += index.add(papers)
+        newest = max(newest or 0, stored_at)
+        if stop is not None and stop.is_set():
+            return added
+    if newest is not None:
+        index.mark_synced(max(index.store_watermark, newest - facets.WATERMARK_MARGIN))
+    index.flush()
+    logger.info(f"Related index synced with the local store: {added} papers added, {len(index)} indexed.")
+    return added
+
+
+# Application-scoped index installed by the FastAPI lifespan hook in main.py
+_related_index: Optional[RelatedIndex] = None
+
+
+def set_related_index(index: Optional[RelatedIndex]) -> None:
+    global _related_index
+    _related_index = index
+
+
+def get_related_index() -> Optional[RelatedIndex]:
+    return _related_index
@@ -0,0 +1,207 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import AsyncIterator, Callable, Dict, List, Mapping, Optional
+
+from src.config import env_float, env_int
+
+
+class Priority(IntEnum):
+    """
+    Upstream priority lanes; lower values are served first.
+    """
+    INTERACTIVE = 0 # User-facing /papers/latest and /papers/search requests
+    BACKGROUND = 1 # Cache refreshes and harvesting
+    BULK = 2 # Exports and other large pulls
+
+
+class QueueDeadlineExceeded(RuntimeError):
+    """
+    Raised when an upstream request would wait (or has waited) longer than its queue deadline.
+    """
+
+
+@dataclass
+class LaneStats:
+    granted: int = 0
+    rejected: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+@dataclass(eq=False)
+class _Waiter:
+    priority: int
+    sequence: int
+    future: asyncio.Future
+    enqueued_at: float
+    granted: bool = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+@dataclass
+class SchedulerStats:
+    lanes: Dict[Priority, LaneStats] = field(default_factory=lambda: {priority: LaneStats() for priority in Priority})
+
+
+class UpstreamScheduler:
+    """
+    Gate that every upstream arXiv request passes through: a token bucket limits the request
+    rate, a semaphore-like counter caps concurrent requests, and waiting requests are served in
+    priority order (FIFO within a lane). A request whose expected or actual queueing time exceeds
+    its lane's deadline fails fast with QueueDeadlineExceeded. A rate <= 0 disables rate limiting.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1 / 3,
+        burst: int = 1,
+        max_concurrency: int = 1,
+        deadlines: Optional[Mapping[Priority, Optional[float]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.deadlines: Dict[Priority, Optional[float]] = {priority: None for priority in Priority}
+        self.deadlines[Priority.INTERACTIVE] = 10.0
+        self.deadlines.update(deadlines or {})
+        self._clock = clock
+        self._tokens = float(burst)
+        self._refilled_at = clock()
+        self._running = 0
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = SchedulerStats()
+
+    @classmethod
+    def from_env(cls) -> "UpstreamScheduler":
+        interval = env_float("ARXIV_UPSTREAM_INTERVAL", 3.0)
+        return cls(
+            rate=1 / interval if interval > 0 else 0,
+            burst=env_int("ARXIV_UPSTREAM_BURST", 1),
+            max_concurrency=env_int("ARXIV_UPSTREAM_CONCURRENCY", 1),
+            deadlines={Priority.INTERACTIVE: env_float("ARXIV_UPSTREAM_QUEUE_DEADLINE", 10.0)},
+        )
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        return sum(
+            1 for waiter in self._waiters
+            if not waiter.future.done() and (priority is None or waiter.priority == priority)
+        )
+
+    def estimated_wait(self, priority: Priority) -> float:
+        """
+        Seconds until a request enqueued now at `priority` would obtain a rate token.
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        ahead = sum(1 for waiter in self._waiters if not waiter.future.done() and waiter.priority <= priority)
+        return max(0.0, (ahead + 1 - self._tokens) / self.rate)
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE) -> None:
+        lane = self.stats.lanes[priority]
+        deadline = self.deadlines.get(priority)
+        self._refill()
+        if not self.queue_depth() and self._running < self.max_concurrency and self._has_token():
+            self._take_slot()
+            lane.granted += 1
+            return
+        if deadline is not None and self.estimated_wait(priority) > deadline:
+            lane.rejected += 1
+            raise QueueDeadlineExceeded(
+                f"Upstream queue too long for {priority.name.lower()} request "
+                f"(estimated wait {self.estimated_wait(priority):.1f}s > {deadline:.1f}s)"
+            )
+
+        waiter = _Waiter(priority, next(self._sequence), asyncio.get_running_loop().create_future(), self._clock())
+        heapq.heappush(self._waiters, waiter)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(waiter.future, deadline)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.granted:
+                self.release() # Granted just as we gave up; hand the slot back
+            if isinstance(e, asyncio.TimeoutError):
+                lane.rejected += 1
+                raise QueueDeadlineExceeded(f"Upstream queue deadline of {deadline:.1f}s exceeded") from None
+            raise
+        waited = self._clock() - waiter.enqueued_at
+        lane.granted += 1
+        lane.wait_seconds_total += waited
+        lane.wait_seconds_max = max(lane.wait_seconds_max, waited)
+
+    def release(self) -> None:
+        self._running -= 1
+        self._dispatch()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        if self.rate > 0:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _has_token(self) -> bool:
+        return self.rate <= 0 or self._tokens >= 1
+
+    def _take_slot(self) -> None:
+        if self.rate > 0:
+            self._tokens -= 1
+        self._running += 1
+
+    def _dispatch(self) -> None:
+        self._refill()
+        while self._waiters and self._running < self.max_concurrency:
+            waiter = self._waiters[0]
+            if waiter.future.done(): # Timed out or cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            if not self._has_token():
+                break
+            heapq.heappop(self._waiters)
+            self._take_slot()
+            waiter.granted = True
+            waiter.future.set_result(None)
+
+        if self._timer is None and self.queue_depth() and self._running < self.max_concurrency:
+            delay = (1 - self._tokens) / self.rate
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "running": self._running,
+            "queue_depth": {priority.name.lower(): self.queue_depth(priority) for priority in Priority},
+            "lanes": {
+                priority.name.lower(): {
+                    "granted": lane.granted,
+                    "rejected": lane.rejected,
+                    "wait_seconds_total": round(lane.wait_seconds_total, 6),
+                    "wait_seconds_max": round(lane.wait_seconds_max, 6),
+                }
+                for priority, lane in self.stats.lanes.items()
+            },
+        }
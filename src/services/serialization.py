@@ -0,0 +1,228 @@
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.config import env_int
+from src.models.paper import Paper
+
+try:
+    import orjson
+except ImportError: # Optional accelerator; the stdlib encoder produces identical bytes
+    orjson = None
+
+try:
+    import brotli
+except ImportError: # Optional; without it responses are offered gzip-compressed only
+    brotli = None
+
+# Levels above 4 cost more than twice the CPU for a few percent smaller JSON bodies
+GZIP_LEVEL = 4
+BROTLI_QUALITY = 5
+
+# Cards, the compact representation of list pages, keep this much of the summary ...
+CARD_SUMMARY_CHARS = env_int("ARXIV_CARD_SUMMARY_CHARS", 280)
+# ... and this many authors, plus the total author count
+CARD_AUTHORS = env_int("ARXIV_CARD_AUTHORS", 3)
+PAPER_FIELDS = tuple(Paper.model_fields)
+CARD_FIELDS = PAPER_FIELDS + ("author_count",)
+# Projected bodies a PaperList keeps, for the most recently requested projections
+PROJECTION_MEMO_MAX = env_int("ARXIV_PROJECTION_MEMO_MAX", 2)
+
+
+@dataclass(frozen=True)
+class Projection:
+    """
+    The representation of papers in a response: full records or compact cards, optionally
+    cut down to `fields` (in the representation's field order).
+    """
+    card: bool = False
+    fields: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def of(cls, view: str = "full", fields: Iterable[str] = ()) -> "Projection":
+        """
+        Raises ValueError for an unknown view or field.
+        """
+        if view not in ("full", "card"):
+            raise ValueError(f"Unknown view '{view}'; expected 'full' or 'card'.")
+        card = view == "card"
+        known = CARD_FIELDS if card else PAPER_FIELDS
+        wanted = set(fields)
+        unknown = sorted(wanted - set(known))
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}; expected some of {', '.join(known)}.")
+        return cls(card, tuple(field for field in known if field in wanted) if wanted else None)
+
+    @property
+    def is_full(self) -> bool:
+        return not self.card and self.fields is None
+
+    def apply(self, paper: Paper) -> Dict[str, Any]:
+        item = paper_to_dict(paper) if not self.card else paper_to_card(paper)
+        if self.fields is None:
+            return item
+        return {field: item[field] for field in self.fields}
+
+
+FULL = Projection()
+
+
+class PaperList(list):
+    """
+    A list of Papers that memoizes its JSON encoding, ETag and compressed bodies, so a cached
+    result page is only serialized and compressed once no matter how many responses it serves.
+    `fetched_at` (epoch seconds) is set on complete upstream results, and `validators` holds
+    the upstream ETag/Last-Modified headers for conditional refreshes. `partial` marks results
+    missing the pages that failed upstream. Projected bodies are kept for PROJECTION_MEMO_MAX
+    projections at most, so the memoized bodies stay within a bound the response cache counts.
+    """
+    __slots__ = ("_encoded", "_etag", "_compressed", "_projected", "fetched_at", "validators", "partial")
+
+    def __init__(self, papers: Iterable[Paper] = (), fetched_at: Optional[float] = None):
+        super().__init__(papers)
+        self._encoded: Optional[bytes] = None
+        self._etag: Optional[str] = None
+        self._compressed: Dict[str, bytes] = {}
+        self._projected: Dict[Projection, bytes] = {}
+        self.fetched_at = fetched_at
+        self.validators: Dict[str, str] = {}
+        self.partial = False
+
+    def json_bytes(self) -> bytes:
+        if self._encoded is None:
+            self._encoded = dumps([paper_to_dict(paper) for paper in self])
+        return self._encoded
+
+    def projected_bytes(self, projection: Projection) -> bytes:
+        if projection.is_full:
+            return self.json_bytes()
+        body = self._projected.pop(projection, None)
+        if body is None:
+            body = dumps([projection.apply(paper) for paper in self])
+            while self._projected and len(self._projected) >= PROJECTION_MEMO_MAX:
+                del self._projected[next(iter(self._projected))] # Least recently used
+        if PROJECTION_MEMO_MAX > 0:
+            self._projected[projection] = body
+        return body
+
+    def etag(self) -> str:
+        if self._etag is None:
+            self._etag = make_etag(self.json_bytes())
+        return self._etag
+
+    def compressed(self, coding: str) -> bytes:
+        body = self._compressed.get(coding)
+        if body is None:
+            body = self._compressed[coding] = compress(self.json_bytes(), coding)
+        return body
+
+
+def paper_to_dict(paper: Paper) -> Dict[str, Any]:
+    """
+    Plain-dict form of a Paper, in model field order, matching what FastAPI's response_model
+    serialization would produce.
+    """
+    return {
+        "arxiv_id": paper.arxiv_id,
+        "title": paper.title,
+        "summary": paper.summary,
+        "authors": [{"name": author.name} for author in paper.authors],
+        "published_date": paper.published_date,
+        "updated_date": paper.updated_date,
+        "pdf_url": paper.pdf_url,
+        "categories": paper.categories,
+    }
+
+
+def paper_to_card(paper: Paper) -> Dict[str, Any]:
+    """
+    Compact form of a Paper for list pages: the summary cut to CARD_SUMMARY_CHARS at a word
+    boundary (ending in an ellipsis), the first CARD_AUTHORS authors and `author_count`.
+    """
+    summary = paper.summary
+    if len(summary) > CARD_SUMMARY_CHARS:
+        cut = summary[:CARD_SUMMARY_CHARS]
+        space = cut.rfind(" ")
+        summary = (cut[:space] if space > CARD_SUMMARY_CHARS // 2 else cut).rstrip() + "…"
+    return {
+        "arxiv_id": paper.arxiv_id,
+        "title": paper.title,
+        "summary": summary,
+        "authors": [{"name": author.name} for author in paper.authors[:CARD_AUTHORS]],
+        "published_date": paper.published_date,
+        "updated_date": paper.updated_date,
+        "pdf_url": paper.pdf_url,
+        "categories": paper.categories,
+        "author_count": len(paper.authors),
+    }
+
+
+def decode_papers(body: bytes, fetched_at: Optional[float] = None) -> PaperList:
+    """
+    Rebuilds a PaperList from its json_bytes(), which it keeps as its memoized encoding.
+    """
+    items = orjson.loads(body) if orjson is not None else json.loads(body)
+    papers = PaperList(
+        (
+            Paper.from_trusted(
+                arxiv_id=item["arxiv_id"],
+                title=item["title"],
+                summary=item["summary"],
+                author_names=[author["name"] for author in item["authors"]],
+                published_date=item["published_date"],
+                updated_date=item["updated_date"],
+                pdf_url=item["pdf_url"],
+                categories=item["categories"],
+            )
+            for item in items
+        ),
+        fetched_at=fetched_at,
+    )
+    papers._encoded = body
+    return papers
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Compact UTF-8 JSON, byte-for-byte what starlette's JSONResponse renders.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Strong ETag for a response body: a quoted 128-bit BLAKE2b digest of its bytes.
+    """
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0) # Fixed mtime keeps output deterministic
+    if coding == "br" and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if coding == "identity":
+        return body
+    raise ValueError(f"Unsupported content coding: {coding}")
+
+
+def encode_papers(papers: List[Paper], coding: str = "identity", projection: Projection = FULL) -> bytes:
+    """
+    JSON body for a list of Papers in `projection`'s representation, optionally compressed
+    with `coding` ('gzip' or 'br'). Cached pages memoize their projected bodies uncompressed.
+    """
+    if isinstance(papers, PaperList):
+        if projection.is_full:
+            return papers.json_bytes() if coding == "identity" else papers.compressed(coding)
+        return compress(papers.projected_bytes(projection), coding)
+    return compress(dumps([projection.apply(paper) for paper in papers]), coding)
+
+
+def papers_etag(papers: List[Paper]) -> str:
+    if isinstance(papers, PaperList):
+        return papers.etag()
+    return make_etag(encode_papers(papers))
@@ -0,0 +1,196 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from src.config import env_float, env_int, env_str
+
+# SQLite file shared by the worker processes of a host; empty disables the shared tier
+SHARED_CACHE_PATH = env_str("ARXIV_SHARED_CACHE_PATH", "")
+SHARED_CACHE_MAX_BYTES = env_int("ARXIV_SHARED_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+# Longest a worker may hold a key's refresh lease; others wait for its result until then
+LEASE_TTL = env_float("ARXIV_SHARED_CACHE_LEASE_TTL", 30.0)
+# How often a waiting worker checks whether the lease holder has stored its result
+LEASE_POLL_INTERVAL = 0.05
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entries ("
+    " key TEXT PRIMARY KEY, size INTEGER NOT NULL, fetched_at REAL, validators TEXT NOT NULL,"
+    " fresh_until REAL NOT NULL, stale_until REAL NOT NULL, stored_at REAL NOT NULL,"
+    " body BLOB NOT NULL)", # Last, so scans of the other columns skip its overflow pages
+    "CREATE INDEX IF NOT EXISTS ix_entries_stored_at ON entries (stored_at)",
+    "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)",
+)
+
+
+@dataclass
+class SharedEntry:
+    """
+    A cached result page: its JSON body as served, when it was fetched upstream, the upstream
+    validators for conditional refreshes, and its wall-clock expiry times.
+    """
+    body: bytes
+    fetched_at: Optional[float]
+    fresh_until: float
+    stale_until: float
+    validators: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class SharedCacheStats:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    lease_waits: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class SharedCache:
+    """
+    Result pages shared by all worker processes on a host, in a SQLite database in WAL mode:
+    readers never block each other or the writer, and every write is an atomic transaction.
+    Entries expire by wall-clock time, since workers do not share a monotonic clock. Eviction
+    drops expired entries, then the oldest written: reads never write, and popular pages are
+    rewritten whenever they are refreshed anyway.
+
+    A key's lease lets one worker at a time fetch it upstream; the others wait for its result.
+    Stats count this process's operations only.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = SHARED_CACHE_MAX_BYTES,
+        lease_ttl: float = LEASE_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lease_ttl = lease_ttl
+        self._clock = clock
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.stats = SharedCacheStats()
+        self._local = threading.local() # One connection per thread
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        for statement in _SCHEMA:
+            conn.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; writes open explicit transactions
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL") # WAL stays consistent; only the last commits may be lost on power loss
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def get(self, key: str) -> Optional[SharedEntry]:
+        """
+        The entry for `key` unless it is past its stale window; one primary-key lookup.
+        """
+        row = self._connection().execute(
+            "SELECT body, fetched_at, fresh_until, stale_until, validators FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        now = self._clock()
+        if row is None or now >= row[3]:
+            self.stats.misses += 1
+            return None
+        if now >= row[2]:
+            self.stats.stale_hits += 1
+        else:
+            self.stats.hits += 1
+        return SharedEntry(row[0], row[1], row[2], row[3], json.loads(row[4]))
+
+    def set(
+        self,
+        key: str,
+        body: bytes,
+        ttl: float,
+        stale_ttl: float,
+        fetched_at: Optional[float] = None,
+        validators: Optional[Dict[str, str]] = None,
+    ) -> None:
+        if len(body) > self.max_bytes:
+            return
+        now = self._clock()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, len(body), fetched_at, json.dumps(validators or {}), now + ttl, now + ttl + stale_ttl, now, body),
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.stats.writes += 1
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        total = conn.execute("SELECT total(size) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self.stats.evictions += conn.execute("DELETE FROM entries WHERE stale_until <= ?", (now,)).rowcount
+        total = conn.execute("SELECT total(size) FROM entries").fetchone()[0]
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY stored_at"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        self.stats.evictions += len(doomed)
+
+    def acquire_lease(self, key: str) -> bool:
+        """
+        Takes the lease on `key` for this cache's owner unless another owner holds an unexpired
+        one. Returns whether it was taken.
+        """
+        now = self._clock()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE") # Serializes lease checks across processes
+        try:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+            acquired = row is None or row[0] == self.owner or row[1] <= now
+            if acquired:
+                conn.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (key, self.owner, now + self.lease_ttl))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if not acquired:
+            self.stats.lease_waits += 1
+        return acquired
+
+    def release_lease(self, key: str) -> None:
+        self._connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def clear(self) -> None:
+        conn = self._connection()
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM leases")
+        self.stats = SharedCacheStats()
@@ -0,0 +1,374 @@
+import bisect
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.config import env_int, env_str
+from src.models.paper import Paper
+from src.services import facets
+
+if TYPE_CHECKING:
+    from src.services.paper_store import PaperStore
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_SNAPSHOT = env_str("ARXIV_SUGGEST_SNAPSHOT", "data/suggest.json")
+# Newly seen keys are merged into the main sorted array once there are this many (or 1/16 of it)
+PENDING_KEYS = env_int("ARXIV_SUGGEST_PENDING_KEYS", 4096)
+# Prefixes matching more keys than this keep a running list of their best completions
+SCAN_LIMIT = 2000
+MAX_LIMIT = 20
+
+TITLE, AUTHOR, CATEGORY = "title", "author", "category"
+# Equal scores rank categories first: they are few and short, so an exact match is the likeliest intent
+_KIND_ORDER = {CATEGORY: 0, AUTHOR: 1, TITLE: 2}
+_NO_FLOOR = (float("inf"),)
+
+_VERSION_SUFFIX_RE = re.compile(r"v\d+$")
+_SEPARATOR_RE = re.compile(r"[^\w.]+")
+_SEP = "\0" # Sorts below every key character, so a key's entries sort with the key
+_KEY_END = "\U0010ffff"
+
+
+def normalize(text: str) -> str:
+    """
+    Lookup form of a title, name or query: accents stripped, case folded, and runs of
+    punctuation and whitespace collapsed to single spaces.
+    """
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return _SEPARATOR_RE.sub(" ", text.casefold()).strip()
+
+
+def _base_id(arxiv_id: str) -> str:
+    return _VERSION_SUFFIX_RE.sub("", arxiv_id)
+
+
+def _version(arxiv_id: str) -> int:
+    match = _VERSION_SUFFIX_RE.search(arxiv_id)
+    return int(match.group()[1:]) if match else 0
+
+
+def paper_suggestions(paper: Paper) -> List[Tuple[str, str]]:
+    """
+    The (kind, text) completions a paper contributes: its title, authors and categories.
+    """
+    entries = [(TITLE, " ".join(paper.title.split()))]
+    entries.extend((AUTHOR, " ".join(author.name.split())) for author in paper.authors)
+    entries.extend((CATEGORY, category) for category in paper.categories or [])
+    return [(kind, text) for kind, text in dict.fromkeys(entries) if normalize(text)]
+
+
+def _keys(kind: str, text: str) -> List[str]:
+    key = normalize(text)
+    if kind != AUTHOR:
+        return [key]
+    # Authors are also found by surname and middle names: 'hinton' completes to 'Geoffrey Hinton'
+    words = key.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def _target(entry: str) -> int:
+    return int(entry[entry.rindex(_SEP) + 1:])
+
+
+def _prefix_range(entries: List[str], prefix: str) -> Tuple[int, int]:
+    lo = bisect.bisect_left(entries, prefix)
+    return lo, bisect.bisect_left(entries, prefix + _KEY_END, lo)
+
+
+class SuggestIndex:
+    """
+    Prefix index of completions for the search box, scored by how many papers each occurs in.
+
+    Keys are held as sorted arrays of '<key>\\0<suggestion id>' strings and found by bisection:
+    a large one, and a small one taking newly seen keys by insertion, merged into the large
+    one once it grows (two sorted runs, which Python's sort merges in linear time). A prefix
+    matching more than SCAN_LIMIT keys (the first keystrokes) keeps a list of its best
+    completions, built on first use and updated as scores change, so no query ranks more
+    than a few thousand candidates.
+
+    Queries read without locking: additions only insert keys or bump scores, and a merge
+    swaps in the new arrays in one assignment.
+    """
+
+    def __init__(self, path: Optional[str] = None, pending_keys: int = PENDING_KEYS):
+        self.path = path
+        self.pending_keys = pending_keys
+        self.store_watermark = 0 # stored_at up to which the local paper store has been indexed
+        self._texts: List[Tuple[str, str]] = [] # Suggestion id -> (kind, text)
+        self._scores: List[int] = [] # Suggestion id -> number of papers
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._papers: Dict[str, Tuple[str, List[int]]] = {} # Versionless id -> (indexed arxiv_id, suggestion ids)
+        self._runs: Tuple[List[str], List[str]] = ([], []) # Merged keys, keys added since
+        self._tops: Dict[str, List[int]] = {} # Wide prefix -> best suggestion ids, unordered
+        self._floors: Dict[str, Tuple] = {} # Wide prefix -> rank a suggestion must beat to enter its list
+        self._top_length = 0 # Longest prefix in _tops
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._papers)
+
+    def add(self, papers: Iterable[Paper]) -> int:
+        """
+        Counts papers not seen before, or in a newer version. Returns how many were added.
+        """
+        added = 0
+        with self._lock:
+            for paper in papers:
+                base = _base_id(paper.arxiv_id)
+                indexed = self._papers.get(base)
+                previous = set()
+                if indexed is not None:
+                    if indexed[0] == paper.arxiv_id or _version(indexed[0]) > _version(paper.arxiv_id):
+                        continue
+                    previous = set(indexed[1])
+                suggestions = []
+                for entry in paper_suggestions(paper):
+                    suggestion = self._ids.get(entry)
+                    keys = None
+                    if suggestion is None:
+                        suggestion = self._ids[entry] = len(self._texts)
+                        self._texts.append(entry)
+                        self._scores.append(0)
+                        keys = _keys(*entry)
+                        for key in keys:
+                            bisect.insort(self._runs[1], f"{key}{_SEP}{suggestion}")
+                    suggestions.append(suggestion)
+                    if suggestion not in previous:
+                        self._scores[suggestion] += 1
+                        self._offer(suggestion, keys)
+                # Completions the new version no longer has, e.g. a changed title
+                for suggestion in previous.difference(suggestions):
+                    self._scores[suggestion] -= 1
+                    self._forget(suggestion)
+                self._papers[base] = (paper.arxiv_id, suggestions)
+                added += 1
+            if added:
+                self._dirty = True
+            merged, recent = self._runs
+            if len(recent) > max(self.pending_keys, len(merged) // 16):
+                self._merge()
+        return added
+
+    def _rank(self, suggestion: int) -> Tuple[int, int, str]:
+        kind, text = self._texts[suggestion]
+        return (-self._scores[suggestion], _KIND_ORDER[kind], text)
+
+    def _prefixes(self, suggestion: int, keys: Optional[List[str]] = None) -> Iterator[str]:
+        # Wide prefixes (those with a list) the suggestion's keys start with
+        for key in keys or _keys(*self._texts[suggestion]):
+            for length in range(1, min(len(key), self._top_length) + 1):
+                if key[:length] in self._tops:
+                    yield key[:length]
+
+    def _offer(self, suggestion: int, keys: Optional[List[str]] = None) -> None:
+        # Enters a suggestion whose score rose into the lists it now belongs in
+        if not self._tops:
+            return
+        rank = self._rank(suggestion)
+        for prefix in self._prefixes(suggestion, keys):
+            top = self._tops[prefix]
+            if rank >= self._floors[prefix] or suggestion in top:
+                continue
+            if len(top) < MAX_LIMIT:
+                top.append(suggestion)
+            else:
+                weakest = max(range(len(top)), key=lambda i: self._rank(top[i]))
+                if rank < self._rank(top[weakest]):
+                    top[weakest] = suggestion
+            self._set_floor(prefix)
+
+    def _forget(self, suggestion: int) -> None:
+        # A member whose score fell may no longer belong in a list, and whatever should replace
+        # it is unknown: drop the list, to be rebuilt by the next query
+        if not self._tops:
+            return
+        for prefix in set(self._prefixes(suggestion)):
+            if suggestion in self._tops[prefix]:
+                del self._tops[prefix], self._floors[prefix]
+
+    def _set_floor(self, prefix: str) -> None:
+        # The rank a suggestion must beat to enter a list: its weakest member's once full. Members
+        # only improve between updates, so the stored floor never excludes a suggestion wrongly
+        top = self._tops[prefix]
+        self._floors[prefix] = max(map(self._rank, top)) if len(top) >= MAX_LIMIT else _NO_FLOOR
+
+    def _merge(self) -> None:
+        merged, recent = self._runs
+        merged = merged + recent
+        merged.sort()
+        self._runs = (merged, [])
+
+    def suggest(self, query: str, limit: int = 8) -> List[Tuple[str, str, int]]:
+        """
+        Up to `limit` (at most MAX_LIMIT) completions of `query`, most popular first, as
+        (text, kind, papers) triples.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        candidates = self._tops.get(prefix)
+        if candidates is None:
+            merged, recent = self._runs
+            lo, hi = _prefix_range(merged, prefix)
+            recent_lo, recent_hi = _prefix_range(recent, prefix)
+            if hi - lo + recent_hi - recent_lo > SCAN_LIMIT:
+                candidates = self._widen(prefix)
+            else:
+                candidates = [_target(entry) for entry in merged[lo:hi] + recent[recent_lo:recent_hi]]
+        return [
+            (self._texts[suggestion][1], self._texts[suggestion][0], self._scores[suggestion])
+            for suggestion in self._top(candidates, limit)
+        ]
+
+    def _widen(self, prefix: str) -> List[int]:
+        # Ranks every key under a wide prefix once; the list is then kept up to date by _offer.
+        # While a merge holds the lock the result is still right for this query, but is not kept
+        if not self._lock.acquire(blocking=False):
+            return self._top(map(_target, self._entries(prefix)), MAX_LIMIT)
+        try:
+            return self._keep_top(prefix, self._entries(prefix))
+        finally:
+            self._lock.release()
+
+    def _entries(self, prefix: str) -> List[str]:
+        entries = []
+        for run in self._runs:
+            lo, hi = _prefix_range(run, prefix)
+            entries.extend(run[lo:hi])
+        return entries
+
+    def _keep_top(self, prefix: str, entries: List[str]) -> List[int]:
+        top = self._top(map(_target, entries), MAX_LIMIT)
+        if top:
+            self._tops[prefix] = top
+            self._set_floor(prefix)
+            self._top_length = max(self._top_length, len(prefix))
+        return top
+
+    def warm(self, max_length: int = 3) -> None:
+        """
+        Builds the lists of all wide prefixes up to `max_length` characters, so that after a
+        bulk load no keystroke pays for ranking them. Prefixes of one length split the sorted
+        keys into consecutive ranges, so each length is a single pass.
+        """
+        with self._lock:
+            self._merge()
+            merged = self._runs[0]
+            for length in range(1, max_length + 1):
+                lo = 0
+                while lo < len(merged):
+                    key = merged[lo][:merged[lo].index(_SEP)]
+                    if len(key) < length:
+                        lo = bisect.bisect_left(merged, key + _SEP + _KEY_END, lo)
+                        continue
+                    hi = _prefix_range(merged, key[:length])[1]
+                    if hi - lo > SCAN_LIMIT and key[:length] not in self._tops:
+                        self._keep_top(key[:length], merged[lo:hi])
+                    lo = hi
+
+    def _top(self, suggestions: Iterable[int], limit: int) -> List[int]:
+        scores = self._scores
+        return heapq.nsmallest(min(limit, MAX_LIMIT), {suggestion for suggestion in suggestions if scores[suggestion] > 0}, key=self._rank)
+
+    def mark_synced(self, stored_at: int) -> None:
+        with self._lock:
+            self.store_watermark = stored_at
+            self._dirty = True
+
+    def flush(self) -> None:
+        """
+        Writes a snapshot of the index, if anything changed since the last one.
+        """
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            self._merge()
+            content = json.dumps({
+                "store_watermark": self.store_watermark,
+                "suggestions": [[kind, text, score] for (kind, text), score in zip(self._texts, self._scores)],
+                "papers": self._papers,
+                "keys": self._runs[0],
+                "tops": self._tops,
+            }, ensure_ascii=False, separators=(",", ":"))
+            self._dirty = False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp" # Workers may flush at once
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temporary, self.path)
+
+    def _load(self) -> None:
+        started = time.perf_counter()
+        with open(self.path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        self.store_watermark = snapshot["store_watermark"]
+        for kind, text, score in snapshot["suggestions"]:
+            self._ids[(kind, text)] = len(self._texts)
+            self._texts.append((kind, text))
+            self._scores.append(score)
+        self._papers = {base: (arxiv_id, suggestions) for base, (arxiv_id, suggestions) in snapshot["papers"].items()}
+        self._runs = (snapshot["keys"], [])
+        self._tops = snapshot["tops"]
+        for prefix in self._tops:
+            self._set_floor(prefix)
+        self._top_length = max(map(len, self._tops), default=0)
+        logger.info(f"Suggestion index loaded from {self.path}: {len(self._texts)} completions in {time.perf_counter() - started:.2f}s.")
+
+    def stats(self) -> Dict[str, int]:
+        merged, recent = self._runs
+        return {
+            "papers": len(self._papers),
+            "completions": len(self._texts),
+            "keys": len(merged) + len(recent),
+            "pending": len(recent),
+            "wide_prefixes": len(self._tops),
+        }
+
+
+def sync_from_store(index: SuggestIndex, store: "PaperStore", batch_size: int = 1000, stop: Optional[threading.Event] = None) -> int:
+    """
+    Adds papers written to the local store since the last sync, then snapshots the index.
+    Returns how many were added. Setting `stop` ends the sync after the current batch.
+    Like the facet index, the watermark trails the newest stored_at read by a margin, so that
+    writes committed after the read are picked up by the next sync.
+    """
+    added = 0
+    newest = None
+    for papers, stored_at in store.iter_papers_stored_since(index.store_watermark, batch_size):
+        added += index.add(papers)
+        newest = max(newest or 0, stored_at)
+        if stop is not None and stop.is_set():
+            return added
+    if newest is not None:
+        index.mark_synced(max(index.store_watermark, newest - facets.WATERMARK_MARGIN))
+    index.warm()
+    index.flush()
+    logger.info(f"Suggestion index synced with the local store: {added} papers added, {len(index)} indexed.")
+    return added
+
+
+# Application-scoped index installed by the FastAPI lifespan hook in main.py
+_suggest_index: Optional[SuggestIndex] = None
+
+
+def set_suggest_index(index: Optional[SuggestIndex]) -> None:
+    global _suggest_index
+    _suggest_index = index
+
+
+def get_suggest_index() -> Optional[SuggestIndex]:
+    return _suggest_index
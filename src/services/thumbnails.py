@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import importlib.util
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Protocol, Tuple
+
+import httpx
+
+from src.config import env_float, env_int, env_str
+from src.services import arxiv_service
+from src.services.coalesce import SingleFlight
+from src.services.http_client import HttpClientSettings
+from src.services.metrics import STAGE_SECONDS
+from src.services.scheduler import Priority, UpstreamScheduler
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = env_str("ARXIV_THUMBNAIL_DIR", "data/thumbnails")
+THUMBNAIL_WIDTH = env_int("ARXIV_THUMBNAIL_WIDTH", 400)
+THUMBNAIL_CACHE_MAX_BYTES = env_int("ARXIV_THUMBNAIL_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+THUMBNAIL_WORKERS = env_int("ARXIV_THUMBNAIL_WORKERS", 2)
+# PDFs larger than this are not downloaded for rendering
+THUMBNAIL_MAX_PDF_BYTES = env_int("ARXIV_THUMBNAIL_MAX_PDF_BYTES", 50 * 1024 * 1024)
+PDF_BASE_URL = env_str("ARXIV_PDF_BASE_URL", "https://arxiv.org/pdf/")
+# PDF downloads are paced like API requests, one every this many seconds (0 disables pacing),
+# at most this many at a time. They have a scheduler of their own: a large PDF takes far longer
+# than an API request, and must not hold one of the API scheduler's few slots meanwhile
+THUMBNAIL_PDF_INTERVAL = env_float("ARXIV_THUMBNAIL_PDF_INTERVAL", 3.0)
+THUMBNAIL_PDF_CONCURRENCY = env_int("ARXIV_THUMBNAIL_PDF_CONCURRENCY", 2)
+
+MEDIA_TYPES = {"png": "image/png", "webp": "image/webp"}
+
+
+class PdfNotFound(LookupError):
+    """
+    Raised when no PDF exists for an arXiv id.
+    """
+
+
+class ThumbnailUnavailable(RuntimeError):
+    """
+    Raised when thumbnails cannot be rendered here, because PyMuPDF is not installed.
+    """
+
+
+def renderer_available() -> bool:
+    return importlib.util.find_spec("pymupdf") is not None or importlib.util.find_spec("fitz") is not None
+
+
+def default_image_format() -> str:
+    """
+    WebP when Pillow is installed to encode it, otherwise PNG (which PyMuPDF writes itself).
+    """
+    return "webp" if importlib.util.find_spec("PIL") is not None else "png"
+
+
+def render_first_page(pdf: bytes, width: int, image_format: str) -> bytes:
+    """
+    Renders page one of a PDF to an image `width` pixels wide. Runs in a worker process,
+    so it must stay a picklable module-level function.
+    """
+    try:
+        import pymupdf
+    except ImportError: # Releases before 1.24.3 only provide the legacy module name
+        import fitz as pymupdf
+
+    with pymupdf.open(stream=pdf, filetype="pdf") as document:
+        if document.page_count == 0:
+            raise ValueError("PDF has no pages")
+        page = document[0]
+        zoom = width / page.rect.width
+        pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+        if image_format == "png":
+            return pixmap.tobytes("png")
+        from PIL import Image
+
+        image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+        output = io.BytesIO()
+        image.save(output, format="WEBP", quality=80, method=4)
+        return output.getvalue()
+
+
+class PdfFetcher(Protocol):
+    async def fetch(self, arxiv_id: str, priority: Priority) -> bytes:
+        ...
+
+
+class HttpPdfFetcher:
+    """
+    Downloads PDFs from arXiv using the shared client, through the PDF scheduler (paced and
+    prioritized like API requests, but apart from them) unless given another.
+    """
+
+    def __init__(
+        self,
+        base_url: str = PDF_BASE_URL,
+        max_bytes: int = THUMBNAIL_MAX_PDF_BYTES,
+        client: Optional[httpx.AsyncClient] = None,
+        scheduler: Optional[UpstreamScheduler] = None,
+    ):
+        self.base_url = base_url
+        self.max_bytes = max_bytes
+        self.client = client
+        self.scheduler = scheduler
+
+    async def fetch(self, arxiv_id: str, priority: Priority = Priority.INTERACTIVE) -> bytes:
+        url = urllib.parse.urljoin(self.base_url, arxiv_id)
+        async with (self.scheduler or _pdf_scheduler).slot(priority):
+            client = self.client or arxiv_service.get_http_client()
+            if client is not None:
+                return await self._download(client, url)
+            async with httpx.AsyncClient(timeout=HttpClientSettings.from_env().timeout) as temporary_client:
+                return await self._download(temporary_client, url)
+
+    async def _download(self, client: httpx.AsyncClient, url: str) -> bytes:
+        with STAGE_SECONDS.time(stage="pdf_download"):
+            async with client.stream("GET", url, follow_redirects=True) as response:
+                if response.status_code == 404:
+                    raise PdfNotFound(f"No PDF at {url}")
+                response.raise_for_status()
+                chunks = []
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+                    if received > self.max_bytes:
+                        raise ValueError(f"PDF at {url} exceeds {self.max_bytes} bytes")
+                    chunks.append(chunk)
+                return b"".join(chunks)
+
+
+class DirectoryPdfFetcher:
+    """
+    Reads PDFs from a local directory as `<arxiv_id>.pdf` ('/' in old-style ids replaced by '_').
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    async def fetch(self, arxiv_id: str, priority: Priority = Priority.INTERACTIVE) -> bytes:
+        path = os.path.join(self.directory, arxiv_id.replace("/", "_") + ".pdf")
+        try:
+            return await asyncio.to_thread(_read_file, path)
+        except FileNotFoundError:
+            raise PdfNotFound(f"No PDF at {path}") from None
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_atomically(path: str, data: bytes) -> None:
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+class ThumbnailCache:
+    """
+    Size-bounded, content-addressed thumbnail store on disk. Images live under blobs/ named by
+    the SHA-256 of their bytes, so identical renders (e.g. a paper requested with and without
+    its version suffix) share one file; refs/ maps each requested key to a blob. Blobs are
+    evicted least-recently-used first, with recency kept in file mtimes so it survives restarts;
+    refs to evicted blobs are dropped when next read. Methods are synchronous; async callers
+    should run them in a worker thread.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._blobs_dir = os.path.join(directory, "blobs")
+        self._refs_dir = os.path.join(directory, "refs")
+        os.makedirs(self._blobs_dir, exist_ok=True)
+        os.makedirs(self._refs_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._blobs: "OrderedDict[str, int]" = OrderedDict() # Blob name -> size, least recently used first
+        self.total_bytes = 0
+        self._load()
+
+    def _load(self) -> None:
+        found = []
+        for prefix in os.listdir(self._blobs_dir):
+            prefix_dir = os.path.join(self._blobs_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                if name.endswith(".tmp"):
+                    continue
+                stat = os.stat(os.path.join(prefix_dir, name))
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(found):
+            self._blobs[name] = size
+            self.total_bytes += size
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def _blob_path(self, name: str) -> str:
+        return os.path.join(self._blobs_dir, name[:2], name)
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self._refs_dir, urllib.parse.quote(key, safe=""))
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        """
+        Returns (blob name, image bytes) for `key`, or None on a miss.
+        """
+        try:
+            name = _read_file(self._ref_path(key)).decode()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if name not in self._blobs:
+                self._remove(self._ref_path(key))
+                return None
+            self._blobs.move_to_end(name)
+        try:
+            data = _read_file(self._blob_path(name))
+            os.utime(self._blob_path(name))
+        except FileNotFoundError: # Evicted by another process sharing the directory
+            return None
+        return name, data
+
+    def put(self, key: str, data: bytes, extension: str) -> str:
+        """
+        Stores an image for `key` and returns its blob name.
+        """
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = self._blob_path(name)
+        with self._lock:
+            if name in self._blobs:
+                self._blobs.move_to_end(name)
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _write_atomically(path, data)
+                self._blobs[name] = len(data)
+                self.total_bytes += len(data)
+            _write_atomically(self._ref_path(key), name.encode())
+            self._evict()
+        return name
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and len(self._blobs) > 1:
+            name, size = self._blobs.popitem(last=False)
+            self.total_bytes -= size
+            self._remove(self._blob_path(name))
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@dataclass
+class Thumbnail:
+    content: bytes
+    media_type: str
+    etag: str
+
+
+@dataclass
+class ThumbnailStats:
+    hits: int = 0
+    renders: int = 0
+    failures: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"hits": self.hits, "renders": self.renders, "failures": self.failures}
+
+
+class ThumbnailService:
+    """
+    First-page thumbnails: served from the disk cache, otherwise the PDF is fetched and page one
+    is rendered in a process pool so the event loop never blocks on rasterizing. Concurrent
+    requests for the same thumbnail share one render.
+    """
+
+    def __init__(
+        self,
+        cache: ThumbnailCache,
+        fetcher: PdfFetcher,
+        width: int = THUMBNAIL_WIDTH,
+        image_format: Optional[str] = None,
+        executor: Optional[Executor] = None,
+        renderer: Callable[[bytes, int, str], bytes] = render_first_page,
+        max_workers: int = THUMBNAIL_WORKERS,
+    ):
+        self.cache = cache
+        self.fetcher = fetcher
+        self.width = width
+        self.image_format = image_format or default_image_format()
+        self.renderer = renderer
+        self.max_workers = max_workers
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._flights = SingleFlight()
+        self.stats = ThumbnailStats()
+
+    def _key(self, arxiv_id: str) -> str:
+        return f"{arxiv_id}@{self.width}.{self.image_format}"
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # Spawned, not forked: a fork would copy the event loop's threads and locks mid-use
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def get(self, arxiv_id: str, priority: Priority = Priority.INTERACTIVE) -> Thumbnail:
+        key = self._key(arxiv_id)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            self.stats.hits += 1
+            return self._thumbnail(*cached)
+        return await self._flights.do(key, lambda: self._render(arxiv_id, key, priority))
+
+    async def _render(self, arxiv_id: str, key: str, priority: Priority) -> Thumbnail:
+        if self.renderer is render_first_page and not renderer_available():
+            raise ThumbnailUnavailable("Thumbnail rendering requires PyMuPDF (pip install pymupdf)")
+        try:
+            pdf = await self.fetcher.fetch(arxiv_id, priority)
+            with STAGE_SECONDS.time(stage="thumbnail_render"):
+                data = await asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(), self.renderer, pdf, self.width, self.image_format
+                )
+            name = await asyncio.to_thread(self.cache.put, key, data, self.image_format)
+        except Exception:
+            self.stats.failures += 1
+            raise
+        self.stats.renders += 1
+        return self._thumbnail(name, data)
+
+    def _thumbnail(self, name: str, data: bytes) -> Thumbnail:
+        digest, _, extension = name.partition(".")
+        return Thumbnail(content=data, media_type=MEDIA_TYPES[extension], etag=f'"{digest[:32]}"')
+
+    async def prewarm(self, arxiv_ids: Iterable[str], concurrency: int = 2) -> int:
+        """
+        Renders thumbnails for `arxiv_ids` ahead of requests, in the background scheduler lane.
+        Returns how many are now cached; failures are logged and skipped.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(arxiv_id: str) -> bool:
+            async with semaphore:
+                try:
+                    await self.get(arxiv_id, Priority.BACKGROUND)
+                    return True
+                except Exception as e:
+                    logger.warning(f"Thumbnail prewarm failed for {arxiv_id}: {e}")
+                    return False
+
+        results = await asyncio.gather(*(warm(arxiv_id) for arxiv_id in dict.fromkeys(arxiv_ids)))
+        return sum(results)
+
+    async def prewarm_latest(self, max_papers: int = 25) -> int:
+        papers = await arxiv_service.get_latest_papers(max_results=max_papers)
+        return await self.prewarm(paper.arxiv_id for paper in papers)
+
+    async def run_prewarm_forever(self, interval: float, max_papers: int = 25) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                warmed = await self.prewarm_latest(max_papers)
+                logger.info(f"Thumbnail prewarm: {warmed} latest-feed thumbnails cached.")
+            except Exception as e:
+                logger.warning(f"Thumbnail prewarm run failed: {e}")
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def close(self) -> None:
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_pdf_scheduler = UpstreamScheduler(
+    rate=1 / THUMBNAIL_PDF_INTERVAL if THUMBNAIL_PDF_INTERVAL > 0 else 0, max_concurrency=THUMBNAIL_PDF_CONCURRENCY
+)
+
+
+def set_pdf_scheduler(scheduler: UpstreamScheduler) -> None:
+    global _pdf_scheduler
+    _pdf_scheduler = scheduler
+
+
+def get_pdf_scheduler() -> UpstreamScheduler:
+    return _pdf_scheduler
+
+
+# Installed by main.py's lifespan
+_thumbnail_service: Optional[ThumbnailService] = None
+
+
+def set_thumbnail_service(service: Optional[ThumbnailService]) -> None:
+    global _thumbnail_service
+    _thumbnail_service = service
+
+
+def get_thumbnail_service() -> Optional[ThumbnailService]:
+    return _thumbnail_service
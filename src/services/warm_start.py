@@ -0,0 +1,115 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+from src.config import env_float, env_int, env_str
+from src.services.cache import ResponseCache
+from src.services.serialization import PaperList, decode_papers
+
+logger = logging.getLogger(__name__)
+
+# Hot result pages are saved here at shutdown and restored at startup; empty disables it
+WARM_SNAPSHOT = env_str("ARXIV_WARM_SNAPSHOT", "data/warm_start.bin")
+# The snapshot is also rewritten this often (seconds; 0 disables), so a crash loses little
+WARM_SNAPSHOT_INTERVAL = env_float("ARXIV_WARM_SNAPSHOT_INTERVAL", 300.0)
+# Most recently used result pages kept; restoring one takes a fraction of a millisecond
+WARM_MAX_ENTRIES = env_int("ARXIV_WARM_MAX_ENTRIES", 128)
+
+_MAGIC = b"ARXWARM1"
+# Per page: fetched_at (NaN if unknown), fresh until, stale until (epoch seconds), then the
+# byte lengths of the key, validators and body that follow it
+_RECORD = struct.Struct("<dddIII")
+
+
+def save(cache: ResponseCache, path: str, max_entries: int = WARM_MAX_ENTRIES, now: Optional[float] = None) -> int:
+    """
+    Writes the cache's most recently used result pages to `path`, atomically. Pages are kept
+    as the JSON bodies they are served as, and the file is zlib-compressed. Returns how many
+    pages were written.
+    """
+    now = time.time() if now is None else now
+    chunks: List[bytes] = []
+    count = 0
+    for key, papers, fresh_for, stale_for in cache.entries(max_entries):
+        if not isinstance(papers, PaperList):
+            continue
+        key_bytes = json.dumps(key).encode()
+        validators = json.dumps(papers.validators).encode()
+        body = papers.json_bytes()
+        fetched_at = papers.fetched_at if papers.fetched_at is not None else math.nan
+        chunks.append(_RECORD.pack(fetched_at, now + fresh_for, now + fresh_for + stale_for, len(key_bytes), len(validators), len(body)))
+        chunks.extend((key_bytes, validators, body))
+        count += 1
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp" # Workers may save at once
+    with open(temporary, "wb") as f:
+        f.write(_MAGIC + zlib.compress(b"".join(chunks), 6))
+    os.replace(temporary, path)
+    return count
+
+
+def _records(data: bytes) -> List[Tuple[Tuple, bytes, dict, float, float, float]]:
+    payload = zlib.decompress(data[len(_MAGIC):])
+    records = []
+    offset = 0
+    while offset < len(payload):
+        fetched_at, fresh_until, stale_until, key_length, validators_length, body_length = _RECORD.unpack_from(payload, offset)
+        offset += _RECORD.size
+        key = tuple(json.loads(payload[offset:offset + key_length]))
+        offset += key_length
+        validators = json.loads(payload[offset:offset + validators_length])
+        offset += validators_length
+        body = payload[offset:offset + body_length]
+        offset += body_length
+        records.append((key, body, validators, fetched_at, fresh_until, stale_until))
+    return records
+
+
+def load(cache: ResponseCache, path: str, now: Optional[float] = None) -> int:
+    """
+    Restores the pages saved at `path` into the cache with the lifetimes they had left; pages
+    that expired meanwhile are skipped, and pages past their TTL come back stale, to be served
+    while they are refreshed. Returns how many pages were restored.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return 0
+    try:
+        if not data.startswith(_MAGIC):
+            raise ValueError("not a warm-start snapshot")
+        records = _records(data)
+    except (ValueError, struct.error, zlib.error) as e:
+        logger.warning(f"Ignoring unreadable warm-start snapshot {path}: {e}")
+        return 0
+    now = time.time() if now is None else now
+    restored = 0
+    # Saved most recently used first; restored in reverse so they stay the most recently used
+    for key, body, validators, fetched_at, fresh_until, stale_until in reversed(records):
+        if stale_until <= now:
+            continue
+        papers = decode_papers(body, None if math.isnan(fetched_at) else fetched_at)
+        papers.validators = validators
+        cache.set(key, papers, max(0.0, fresh_until - now), stale_until - max(now, fresh_until))
+        restored += 1
+    return restored
+
+
+async def save_forever(cache: ResponseCache, path: str, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            count = await asyncio.to_thread(save, cache, path)
+            logger.debug(f"Warm-start snapshot of {count} pages written to {path}.")
+        except Exception as e:
+            logger.warning(f"Failed to write the warm-start snapshot to {path}: {e}")
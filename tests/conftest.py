@@ -0,0 +1,41 @@
+import pytest
+import respx
+
+from src.services import arxiv_service, related, suggest, thumbnails, warm_start
+from src.services.scheduler import UpstreamScheduler
+
+
+@pytest.fixture
+def respx_router():
+    # respx only ships a `respx_mock` fixture; the service tests use this name.
+    with respx.mock(assert_all_called=False) as router:
+        yield router
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    # Module-level caches must not leak results between tests
+    arxiv_service.clear_cache()
+    yield
+    arxiv_service.clear_cache()
+
+
+@pytest.fixture(autouse=True)
+def unthrottled_scheduler():
+    # Tests must not wait on arXiv's real request pacing
+    original, original_pdf = arxiv_service.get_scheduler(), thumbnails.get_pdf_scheduler()
+    arxiv_service.set_scheduler(UpstreamScheduler(rate=0, max_concurrency=100))
+    thumbnails.set_pdf_scheduler(UpstreamScheduler(rate=0, max_concurrency=100))
+    yield
+    arxiv_service.set_scheduler(original)
+    thumbnails.set_pdf_scheduler(original_pdf)
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(monkeypatch, tmp_path):
+    # The app lifespan opens the thumbnail cache, the paper indexes and their snapshots; keep them out of data/
+    monkeypatch.setattr(thumbnails, "THUMBNAIL_DIR", str(tmp_path / "thumbnails"))
+    monkeypatch.setattr(related, "RELATED_DIR", str(tmp_path / "related"))
+    monkeypatch.setattr(suggest, "SUGGEST_SNAPSHOT", str(tmp_path / "suggest.json"))
+    monkeypatch.setattr(warm_start, "WARM_SNAPSHOT", str(tmp_path / "warm_start.bin"))
+    return tmp_path
@@ -1,10 +1,19 @@
+import asyncio
+import re
+import time
 import pytest
+from datetime import date
 import httpx
 from respx import MockRouter
 from typing import List
 
 from src.models.paper import Paper, PaperAuthor
-from src.services.arxiv_service import fetch_papers, get_latest_papers, search_papers_by_keyword, ARXIV_API_URL
+from src.services import arxiv_service, planner
+from src.services.metrics import STAGE_SECONDS, UPSTREAM_REQUESTS
+from src.services.pagination import Cursor
+from src.services.serialization import PaperList
+from src.services.scheduler import Priority, QueueDeadlineExceeded, UpstreamScheduler
+from src.services.arxiv_service import fetch_papers, get_latest_papers, search_papers_by_keyword, set_http_client, get_http_client, build_search_query, export_papers, stream_papers, ARXIV_API_URL
 
 # Sample Atom XML for mocking responses
 SAMPLE_ATOM_XML_SUCCESS = """<?xml version="1.0" encoding="UTF-8"?>
@@ -156,6 +165,737 @@ async def test_search_papers_by_keyword(respx_router: MockRouter):
     
     assert len(papers) == 3 # Sample XML has 3 entries
     assert papers[0].title == "Test Paper Title 1"
+@pytest.mark.asyncio
+async def test_fetch_papers_uses_injected_client(respx_router: MockRouter):
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+
+    async with httpx.AsyncClient() as client:
+        papers = await fetch_papers(search_query="cat:cs.AI", client=client)
+        assert len(papers) == 3
+        assert not client.is_closed # The injected client is owned by the caller, not closed per request
+
+    assert route.call_count == 1
+
+@pytest.mark.asyncio
+async def test_fetch_papers_uses_shared_client(respx_router: MockRouter):
+    respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+
+    async with httpx.AsyncClient() as client:
+        set_http_client(client)
+        try:
+            assert get_http_client() is client
+            await fetch_papers(search_query="cat:cs.AI")
+            await fetch_papers(search_query="cat:cs.LG")
+            assert not client.is_closed
+        finally:
+            set_http_client(None)
+    assert get_http_client() is None
+
+@pytest.mark.asyncio
+async def test_fetch_papers_cache_hit_skips_upstream(respx_router: MockRouter):
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+
+    first = await fetch_papers(search_query="cat:cs.AI", cache_ttl=60)
+    second = await fetch_papers(search_query="  cat:cs.AI ", cache_ttl=60) # Normalized to the same key
+
+    assert route.call_count == 1
+    assert second == first
+    stats = arxiv_service.get_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+@pytest.mark.asyncio
+async def test_shared_cache_serves_pages_fetched_by_another_worker(respx_router: MockRouter, tmp_path):
+    from src.services.shared_cache import SharedCache
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+    path = str(tmp_path / "cache.db")
+    arxiv_service.set_shared_cache(SharedCache(path))
+    try:
+        first = await fetch_papers(search_query="cat:cs.AI", cache_ttl=60)
+        await asyncio.gather(*arxiv_service._background_tasks)
+        arxiv_service.clear_cache() # Another worker: same shared cache, cold in-process cache
+        arxiv_service.get_shared_cache().close()
+        arxiv_service.set_shared_cache(SharedCache(path))
+        second = await fetch_papers(search_query="cat:cs.AI", cache_ttl=60)
+        third = await fetch_papers(search_query="cat:cs.AI", cache_ttl=60)
+        stats = arxiv_service.get_shared_cache_stats()
+    finally:
+        arxiv_service.get_shared_cache().close()
+        arxiv_service.set_shared_cache(None)
+
+    assert route.call_count == 1
+    assert second == first and third is second # Then served from the in-process cache
+    assert second.json_bytes() == first.json_bytes()
+    assert arxiv_service.freshness_lifetime(second, 60) > 0
+    assert stats["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_shared_cache_lease_makes_other_workers_wait_for_the_holder(respx_router: MockRouter, tmp_path, monkeypatch):
+    from src.services import shared_cache
+    from src.services.serialization import encode_papers
+    monkeypatch.setattr(shared_cache, "LEASE_POLL_INTERVAL", 0.01)
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+    path = str(tmp_path / "cache.db")
+    holder = shared_cache.SharedCache(path)
+    arxiv_service.set_shared_cache(shared_cache.SharedCache(path))
+    key = arxiv_service._shared_key(arxiv_service._cache_key(arxiv_service._build_query_params("cat:cs.AI", 0, 10, "submittedDate", "descending")))
+    try:
+        assert holder.acquire_lease(key)
+        waiting = asyncio.create_task(fetch_papers(search_query="cat:cs.AI", cache_ttl=60))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        holder.set(key, encode_papers([Paper.from_trusted("2301.00009v1", "From the holder", "", [], "2023-01-09")]), 60, 0)
+        papers = await asyncio.wait_for(waiting, 5)
+    finally:
+        holder.close()
+        arxiv_service.get_shared_cache().close()
+        arxiv_service.set_shared_cache(None)
+
+    assert [paper.title for paper in papers] == ["From the holder"]
+    assert route.call_count == 0
+
+@pytest.mark.asyncio
+async def test_fetch_papers_without_ttl_bypasses_cache(respx_router: MockRouter):
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+
+    await fetch_papers(search_query="cat:cs.AI")
+    await fetch_papers(search_query="cat:cs.AI")
+
+    assert route.call_count == 2
+
+@pytest.mark.asyncio
+async def test_fetch_papers_errors_are_not_cached(respx_router: MockRouter):
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=[
+        httpx.Response(500, text="Internal Server Error"),
+        httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS),
+    ])
+
+    assert await fetch_papers(search_query="cat:cs.AI", cache_ttl=60) == []
+    assert len(await fetch_papers(search_query="cat:cs.AI", cache_ttl=60)) == 3
+    assert route.call_count == 2
+
+@pytest.mark.asyncio
+async def test_fetch_papers_serves_stale_while_revalidating(respx_router: MockRouter):
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=[
+        httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS),
+        httpx.Response(200, text=SAMPLE_ATOM_XML_EMPTY),
+    ])
+
+    # ttl=0 makes the entry stale immediately, but still inside the stale window
+    assert len(await fetch_papers(search_query="cat:cs.AI", cache_ttl=0)) == 3
+    stale = await fetch_papers(search_query="cat:cs.AI", cache_ttl=0)
+    assert len(stale) == 3 # Stale value served instantly
+
+    await asyncio.gather(*arxiv_service._background_tasks)
+    assert route.call_count == 2
+    assert arxiv_service.get_cache_stats()["stale_hits"] >= 1
+
+@pytest.mark.asyncio
+async def test_fetch_papers_coalesces_concurrent_identical_queries(respx_router: MockRouter):
+    async def slow_response(request):
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS)
+
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=slow_response)
+
+    results = await asyncio.gather(*[fetch_papers(search_query="cat:cs.AI", start=0, max_results=25) for _ in range(20)])
+
+    assert route.call_count == 1
+    assert all(len(papers) == 3 for papers in results)
+    assert arxiv_service.get_coalescing_stats()["coalesced"] == 19
+
+@pytest.mark.asyncio
+async def test_fetched_papers_are_written_to_store(respx_router: MockRouter, tmp_path):
+    from src.services.paper_store import PaperStore
+    respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+    store = PaperStore(str(tmp_path / "papers.db"))
+    arxiv_service.set_paper_store(store)
+    try:
+        await fetch_papers(search_query="cat:cs.AI")
+        await asyncio.gather(*arxiv_service._background_tasks)
+        assert store.count() == 3
+        assert store.get_paper("2301.00002").title == "Test Paper Title 2: Updated"
+    finally:
+        arxiv_service.set_paper_store(None)
+        store.close()
+
+@pytest.mark.asyncio
+async def test_search_papers_by_keyword_local_backend(respx_router: MockRouter, tmp_path, monkeypatch):
+    from src.services.paper_store import PaperStore
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+    store = PaperStore(str(tmp_path / "papers.db"))
+    store.upsert_papers(await fetch_papers(search_query="cat:cs.AI"))
+    monkeypatch.setattr(arxiv_service, "SEARCH_BACKEND", "local")
+    arxiv_service.set_paper_store(store)
+    try:
+        papers = await search_papers_by_keyword(keyword="Updated", start=0, max_results=5)
+        assert [paper.arxiv_id for paper in papers] == ["2301.00002v2"]
+        assert route.call_count == 1 # Only the seeding fetch went upstream
+    finally:
+        arxiv_service.set_paper_store(None)
+        store.close()
+
+@pytest.mark.asyncio
+async def test_filtered_latest_papers_and_facets_come_from_the_facet_index(respx_router: MockRouter, tmp_path, monkeypatch):
+    from src.services import facets
+    from src.services.facets import FacetFilter, FacetIndex
+    from src.services.paper_store import PaperStore
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+    store = PaperStore(str(tmp_path / "papers.db"))
+    store.upsert_papers(await fetch_papers(search_query="cat:cs.AI"))
+    monkeypatch.setattr(arxiv_service, "SEARCH_BACKEND", "local")
+    monkeypatch.setattr(planner, "PLANNER_ENABLED", False)
+    arxiv_service.set_paper_store(store)
+    facets.set_facet_index(FacetIndex())
+    try:
+        filters = FacetFilter.of(["cs.AI", "math.CO"], date_from=date(2023, 1, 1))
+        papers = await arxiv_service.get_latest_papers(start=0, max_results=5, filters=filters)
+        searched = await search_papers_by_keyword("Updated", max_results=5, filters=FacetFilter.of(None, date(2023, 1, 2)))
+        counts = await arxiv_service.get_facets(FacetFilter.of(["math.CO"]))
+    finally:
+        facets.set_facet_index(None)
+        arxiv_service.set_paper_store(None)
+        store.close()
+
+    assert [paper.arxiv_id for paper in papers] == ["2301.00002v2", "2301.00001v1"]
+    assert [paper.arxiv_id for paper in searched] == ["2301.00002v2"]
+    assert counts.total == 1 and counts.categories["cs.AI"] == 1
+    assert route.call_count == 1 # Only the seeding fetch went upstream
+
+@pytest.mark.asyncio
+async def test_local_pages_resume_after_the_cursor_paper(tmp_path, monkeypatch):
+    from src.services import facets
+    from src.services.facets import FacetFilter, FacetIndex
+    from src.services.paper_store import PaperStore
+
+    def stored(day: int, title: str) -> Paper:
+        return Paper.from_trusted(f"2301.{day:05d}v1", title, "", [], f"2023-01-{day:02d}T00:00:00Z", categories=["cs.AI"])
+
+    store = PaperStore(str(tmp_path / "papers.db"))
+    store.upsert_papers([stored(day, f"Graph {day}") for day in range(1, 6)])
+    monkeypatch.setattr(arxiv_service, "SEARCH_BACKEND", "local")
+    monkeypatch.setattr(planner, "PLANNER_ENABLED", False)
+    arxiv_service.set_paper_store(store)
+    facets.set_facet_index(FacetIndex())
+    only_ai = FacetFilter.of(["cs.AI"])
+    try:
+        latest = await arxiv_service.get_latest_papers(max_results=3, filters=only_ai)
+        searched = await search_papers_by_keyword("graph", max_results=3)
+        filtered = await search_papers_by_keyword("graph", max_results=3, filters=only_ai)
+        # Stored before the next pages: newer, and better matches, so offsets shift by two
+        store.upsert_papers([stored(day, "Graph graph graph") for day in (6, 7)])
+        await arxiv_service.refresh_facets(force=True)
+        latest_next = await arxiv_service.get_latest_papers(max_results=3, filters=only_ai, cursor=Cursor.after("latest", latest[-1], 2))
+        searched_next = await search_papers_by_keyword("graph", max_results=3, cursor=Cursor.after("search", searched[-1], 2))
+        filtered_next = await search_papers_by_keyword("graph", max_results=3, filters=only_ai, cursor=Cursor.after("search", filtered[-1], 2))
+    finally:
+        facets.set_facet_index(None)
+        arxiv_service.set_paper_store(None)
+        store.close()
+
+    assert [paper.title for paper in latest + latest_next] == ["Graph 5", "Graph 4", "Graph 3", "Graph 2", "Graph 1"]
+    assert [paper.title for paper in searched + searched_next] == ["Graph 1", "Graph 2", "Graph 3", "Graph 4", "Graph 5"]
+    assert [paper.title for paper in filtered + filtered_next] == ["Graph 1", "Graph 2", "Graph 3", "Graph 4", "Graph 5"]
+
+@pytest.mark.asyncio
+async def test_filtered_latest_papers_go_upstream_without_a_facet_index(respx_router: MockRouter):
+    from src.services.facets import FacetFilter
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+
+    await arxiv_service.get_latest_papers(max_results=5, filters=FacetFilter.of(["cs.CL"], date(2024, 1, 1), date(2024, 1, 31)))
+
+    assert route.calls.last.request.url.params["search_query"] == "(cat:cs.CL) AND submittedDate:[202401010000 TO 202401312359]"
+    assert await arxiv_service.get_facets(FacetFilter()) is None
+
+def dated_responder(days):
+    """
+    Serves one cs.AI paper per day of January 2023, newest first, within the query's submittedDate range.
+    """
+    async def respond(request):
+        params = request.url.params
+        dates = re.search(r"submittedDate:\[(\d{8})\d{4} TO (\d{8})\d{4}\]", params["search_query"])
+        lower, upper = dates.groups() if dates else ("0", "9")
+        matching = [day for day in sorted(days, reverse=True) if lower <= f"202301{day:02d}" <= upper]
+        start = int(params["start"])
+        entries = "".join(
+            f"<entry><id>http://arxiv.org/abs/2301.{day:05d}v1</id><published>2023-01-{day:02d}T00:00:00Z</published>"
+            f"<title>Paper {day}</title><summary>Summary</summary></entry>"
+            for day in matching[start:start + int(params["max_results"])]
+        )
+        return httpx.Response(200, text=f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>')
+    return respond
+
+@pytest.mark.asyncio
+async def test_planned_latest_papers_merge_local_and_upstream_segments(respx_router: MockRouter, tmp_path, monkeypatch):
+    from src.services import facets
+    from src.services.facets import FacetFilter, FacetIndex
+    from src.services.paper_store import HarvestState, PaperStore
+    monkeypatch.setattr(planner, "FRESH_MAX", 50)
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=dated_responder(range(1, 9)))
+    store = PaperStore(str(tmp_path / "papers.db"))
+    store.upsert_papers([
+        Paper.from_trusted(f"2301.{day:05d}v1", f"Stored {day}", "", [], f"2023-01-{day:02d}T00:00:00Z", categories=["cs.AI"])
+        for day in range(1, 5)
+    ])
+    # Days 2-3 are covered; day 1 partly, day 4 (the watermark's) partly, and the run is long over
+    store.save_harvest_state(HarvestState("cs.AI", watermark="2023-01-04T06:00:00Z", covered_since="2023-01-01T12:00:00Z", last_run_at=0))
+    arxiv_service.set_paper_store(store)
+    facets.set_facet_index(FacetIndex())
+    only_ai = FacetFilter.of(["cs.AI"])
+    try:
+        first = await arxiv_service.get_latest_papers(start=0, max_results=3, filters=only_ai)
+        first_plan = planner.current_plan()
+        second = await arxiv_service.get_latest_papers(start=3, max_results=5, filters=only_ai)
+        second_plan = planner.current_plan()
+        monkeypatch.setattr(planner, "FRESH_MAX", 5) # Days 4-8 no longer fit: the harvester is too far behind
+        first_again = await arxiv_service.get_latest_papers(start=0, max_results=2, filters=only_ai)
+        fallback = await arxiv_service.get_latest_papers(start=4, max_results=2, filters=only_ai)
+        await asyncio.gather(*arxiv_service._background_tasks)
+    finally:
+        facets.set_facet_index(None)
+        arxiv_service.set_paper_store(None)
+        store.close()
+
+    assert [paper.title for paper in first] == ["Paper 8", "Paper 7", "Paper 6"]
+    assert (first_plan.route, first_plan.served) == ("split", {"upstream"})
+    assert [paper.title for paper in second] == ["Paper 5", "Paper 4", "Stored 3", "Stored 2", "Paper 1"]
+    assert second_plan.header() == "route=split; served=local+upstream; segments=upstream:2023-01-04..,local:2023-01-02..2023-01-03,upstream:..2023-01-01"
+    assert [paper.title for paper in first_again] == ["Paper 8", "Paper 7"] # The page ends among fresh papers
+    assert [paper.title for paper in fallback] == ["Paper 4", "Paper 3"]
+    assert planner.current_plan().reason == "too-many-fresh"
+    fresh_limits = [
+        int(call.request.url.params["max_results"]) for call in route.calls
+        if call.request.url.params["search_query"].startswith("(cat:cs.AI) AND submittedDate:[20230104")
+    ]
+    assert fresh_limits == [3, 8, 2, 5] # Only as many fresh papers as each page needs
+    queries = {call.request.url.params["search_query"] for call in route.calls}
+    assert queries == {
+        "(cat:cs.AI) AND submittedDate:[202301040000 TO 999912312359]",
+        "(cat:cs.AI) AND submittedDate:[000101010000 TO 202301012359]",
+        "(cat:cs.AI)",
+    }
+
+@pytest.mark.asyncio
+async def test_planned_latest_papers_resolve_cursors_by_paper(respx_router: MockRouter, tmp_path, monkeypatch):
+    from src.services import facets
+    from src.services.facets import FacetFilter, FacetIndex
+    from src.services.paper_store import HarvestState, PaperStore
+    days = list(range(1, 9))
+    respx_router.get(ARXIV_API_URL).mock(side_effect=dated_responder(days))
+    store = PaperStore(str(tmp_path / "papers.db"))
+    store.upsert_papers([
+        Paper.from_trusted(f"2301.{day:05d}v1", f"Stored {day}", "", [], f"2023-01-{day:02d}T00:00:00Z", categories=["cs.AI"])
+        for day in range(1, 5)
+    ])
+    store.save_harvest_state(HarvestState("cs.AI", watermark="2023-01-04T06:00:00Z", covered_since="2023-01-01T12:00:00Z", last_run_at=0))
+    arxiv_service.set_paper_store(store)
+    facets.set_facet_index(FacetIndex())
+    only_ai = FacetFilter.of(["cs.AI"])
+    try:
+        first = await arxiv_service.get_latest_papers(start=0, max_results=3, filters=only_ai)
+        days.append(9) # Published upstream before the next page; offsets shift by one
+        second = await arxiv_service.get_latest_papers(max_results=3, filters=only_ai, cursor=Cursor.after("latest", first[-1], 2))
+        third = await arxiv_service.get_latest_papers(max_results=3, filters=only_ai, cursor=Cursor.after("latest", second[-1], 5))
+        third_plan = planner.current_plan()
+        await asyncio.gather(*arxiv_service._background_tasks)
+    finally:
+        facets.set_facet_index(None)
+        arxiv_service.set_paper_store(None)
+        store.close()
+
+    assert [paper.title for paper in first] == ["Paper 8", "Paper 7", "Paper 6"]
+    assert [paper.title for paper in second] == ["Paper 5", "Paper 4", "Stored 3"]
+    assert [paper.title for paper in third] == ["Stored 2", "Paper 1"]
+    assert third_plan.header() == "route=split; served=local+upstream; segments=local:2023-01-02..2023-01-03,upstream:..2023-01-01"
+
+def test_build_search_query():
+    assert build_search_query(keyword="graph neural") == "all:graph neural"
+    assert build_search_query(categories=["cs.AI", "cs.LG"]) == "(cat:cs.AI OR cat:cs.LG)"
+    assert build_search_query() == "(cat:cs.AI OR cat:math.CO OR cat:physics.hep-ph)"
+    assert build_search_query(keyword="llm", categories=["cs.CL"], date_from=date(2024, 1, 1), date_to=date(2024, 1, 31)) == (
+        "all:llm AND (cat:cs.CL) AND submittedDate:[202401010000 TO 202401312359]"
+    )
+    assert build_search_query(keyword="x", date_from=date(2024, 2, 1)).endswith("submittedDate:[202402010000 TO 999912312359]")
+
+@pytest.mark.asyncio
+async def test_export_papers_pages_until_short_page(respx_router: MockRouter):
+    two_entries = SAMPLE_ATOM_XML_SUCCESS.split("  <entry>\n    <id>http://arxiv.org/abs/2301.00003v1")[0] + "</feed>"
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=[
+        httpx.Response(200, text=two_entries),
+        httpx.Response(200, text=SAMPLE_ATOM_XML_EMPTY),
+    ])
+
+    papers = [paper async for paper in export_papers("cat:cs.AI", limit=100, page_size=2)]
+
+    assert [paper.arxiv_id for paper in papers] == ["2301.00001v1", "2301.00002v2"]
+    assert route.call_count == 2
+    assert route.calls[1].request.url.params["start"] == "2"
+
+@pytest.mark.asyncio
+async def test_export_papers_respects_limit(respx_router: MockRouter):
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+
+    papers = [paper async for paper in export_papers("cat:cs.AI", limit=3, page_size=10)]
+
+    assert len(papers) == 3
+    assert route.call_count == 1
+    assert route.calls[0].request.url.params["max_results"] == "3"
+
+@pytest.mark.asyncio
+async def test_stream_papers_raises_upstream_errors(respx_router: MockRouter):
+    respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(503, text="Unavailable"))
+    with pytest.raises(httpx.HTTPStatusError):
+        [paper async for paper in stream_papers("cat:cs.AI")]
+
+@pytest.mark.asyncio
+async def test_stalled_export_consumer_does_not_hold_the_upstream_slot(respx_router: MockRouter):
+    respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+    scheduler = UpstreamScheduler(rate=0, max_concurrency=1, deadlines={Priority.INTERACTIVE: 0.5})
+    arxiv_service.set_scheduler(scheduler)
+    export = export_papers("cat:cs.AI", limit=10, page_size=5)
+
+    await export.__anext__() # The consumer then stalls mid-page
+
+    assert scheduler.running == 0
+    assert len(await fetch_papers("cat:cs.CL")) == 3
+    await export.aclose()
+
+@pytest.mark.asyncio
+async def test_fetch_papers_propagates_queue_deadline(respx_router: MockRouter):
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+    scheduler = UpstreamScheduler(rate=0, max_concurrency=1, deadlines={Priority.INTERACTIVE: 0.01})
+    arxiv_service.set_scheduler(scheduler)
+    await scheduler.acquire() # Occupy the only upstream slot
+
+    with pytest.raises(QueueDeadlineExceeded):
+        await fetch_papers("cat:cs.AI")
+    scheduler.release()
+
+    assert route.call_count == 0
+
+def numbered_feed(numbers):
+    entries = "".join(
+        f"<entry><id>http://arxiv.org/abs/2301.{number:05d}v1</id><published>2023-01-01T00:00:00Z</published>"
+        f"<title>Paper {number}</title><summary>Summary</summary></entry>"
+        for number in numbers
+    )
+    return f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'
+
+def paged_responder(total, failing_starts=(), shift_at=None, delays=None):
+    """
+    Serves results 0..total-1 by start/max_results. `shift_at` simulates a paper being inserted
+    upstream before that page is served, so the page repeats the previous page's last paper.
+    """
+    async def respond(request):
+        start = int(request.url.params["start"])
+        max_results = int(request.url.params["max_results"])
+        await asyncio.sleep((delays or {}).get(start, 0))
+        if start in failing_starts:
+            return httpx.Response(500, text="Internal Server Error")
+        first = start - 1 if start == shift_at else start
+        return httpx.Response(200, text=numbered_feed(range(first, min(first + max_results, total))))
+    return respond
+
+@pytest.mark.asyncio
+async def test_fetch_papers_fans_out_large_queries(respx_router: MockRouter, monkeypatch):
+    monkeypatch.setattr(arxiv_service, "FANOUT_PAGE_SIZE", 2)
+    # Later pages answer first; the merge must still follow page order
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=paged_responder(6, delays={0: 0.03, 2: 0.01}))
+
+    papers = await fetch_papers("cat:cs.AI", max_results=6)
+
+    assert [paper.title for paper in papers] == [f"Paper {number}" for number in range(6)]
+    assert sorted(call.request.url.params["start"] for call in route.calls) == ["0", "2", "4"]
+    assert {call.request.url.params["max_results"] for call in route.calls} == {"2"}
+
+@pytest.mark.asyncio
+async def test_fetch_papers_fan_out_drops_duplicates_across_pages(respx_router: MockRouter, monkeypatch):
+    monkeypatch.setattr(arxiv_service, "FANOUT_PAGE_SIZE", 2)
+    respx_router.get(ARXIV_API_URL).mock(side_effect=paged_responder(6, shift_at=2))
+
+    papers = await fetch_papers("cat:cs.AI", max_results=6)
+
+    assert [paper.title for paper in papers] == ["Paper 0", "Paper 1", "Paper 2", "Paper 4", "Paper 5"]
+
+@pytest.mark.asyncio
+async def test_fetch_papers_fan_out_returns_partial_results(respx_router: MockRouter, monkeypatch):
+    monkeypatch.setattr(arxiv_service, "FANOUT_PAGE_SIZE", 2)
+    respx_router.get(ARXIV_API_URL).mock(side_effect=paged_responder(6, failing_starts={2}))
+
+    papers = await fetch_papers("cat:cs.AI", max_results=6, cache_ttl=60)
+
+    assert [paper.title for paper in papers] == ["Paper 0", "Paper 1", "Paper 4", "Paper 5"]
+    assert papers.partial
+    assert arxiv_service.get_cache_stats()["entries"] == 0 # Partial results are not cached
+    with pytest.raises(arxiv_service.PartialFetchError) as excinfo:
+        await fetch_papers("cat:cs.AI", max_results=6, raise_on_error=True)
+    assert len(excinfo.value.papers) == 4
+
+@pytest.mark.asyncio
+async def test_fetch_papers_fan_out_stops_after_short_page(respx_router: MockRouter, monkeypatch):
+    monkeypatch.setattr(arxiv_service, "FANOUT_PAGE_SIZE", 2)
+    # Two pages start at once; the rest wait half a second for rate tokens
+    scheduler = UpstreamScheduler(rate=2, burst=2, max_concurrency=2)
+    arxiv_service.set_scheduler(scheduler)
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=paged_responder(3))
+
+    papers = await fetch_papers("cat:cs.AI", max_results=10)
+
+    assert len(papers) == 3
+    assert route.call_count == 2 # Pages after the short one were cancelled while still queued
+    assert scheduler.running == 0 and scheduler.queue_depth() == 0
+
+@pytest.mark.asyncio
+async def test_fetch_papers_fan_out_raises_deadline_rejections(respx_router: MockRouter, monkeypatch):
+    monkeypatch.setattr(arxiv_service, "FANOUT_PAGE_SIZE", 2)
+    scheduler = UpstreamScheduler(rate=0, max_concurrency=2, deadlines={Priority.INTERACTIVE: 0.05})
+    arxiv_service.set_scheduler(scheduler)
+    respx_router.get(ARXIV_API_URL).mock(side_effect=paged_responder(6, delays={0: 0.2, 2: 0.2}))
+
+    # The third page cannot get a slot before its deadline; the query fails instead of being cut short
+    with pytest.raises(QueueDeadlineExceeded):
+        await fetch_papers("cat:cs.AI", max_results=6)
+
+@pytest.mark.asyncio
+async def test_fetch_papers_does_not_fan_out_on_a_serial_scheduler(respx_router: MockRouter, monkeypatch):
+    monkeypatch.setattr(arxiv_service, "FANOUT_PAGE_SIZE", 2)
+    arxiv_service.set_scheduler(UpstreamScheduler(rate=0, max_concurrency=1))
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=paged_responder(6))
+
+    assert len(await fetch_papers("cat:cs.AI", max_results=6)) == 6
+    assert route.call_count == 1
+
+@pytest.mark.asyncio
+async def test_fetch_papers_fan_out_all_pages_failing(respx_router: MockRouter, monkeypatch):
+    monkeypatch.setattr(arxiv_service, "FANOUT_PAGE_SIZE", 2)
+    respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(503, text="Unavailable"))
+
+    assert await fetch_papers("cat:cs.AI", max_results=6) == []
+    with pytest.raises(httpx.HTTPStatusError):
+        await fetch_papers("cat:cs.AI", max_results=6, raise_on_error=True)
+
+@pytest.mark.asyncio
+async def test_fetch_papers_records_stage_and_upstream_metrics(respx_router: MockRouter):
+    respx_router.get(ARXIV_API_URL).mock(side_effect=[
+        httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS),
+        httpx.Response(503, text="Unavailable"),
+        httpx.ConnectError("Connection failed"),
+    ])
+    stages = {stage: STAGE_SECONDS.count(stage=stage) for stage in ("queue", "upstream_headers", "download", "parse")}
+    statuses = {status: UPSTREAM_REQUESTS.value(status=status) for status in ("200", "503", "error")}
+
+    await fetch_papers("cat:cs.AI", start=0)
+    await fetch_papers("cat:cs.AI", start=1)
+    await fetch_papers("cat:cs.AI", start=2)
+
+    assert {stage: STAGE_SECONDS.count(stage=stage) - count for stage, count in stages.items()} == {
+        "queue": 3, "upstream_headers": 2, "download": 1, "parse": 1,
+    }
+    assert {status: UPSTREAM_REQUESTS.value(status=status) - count for status, count in statuses.items()} == {
+        "200": 1, "503": 1, "error": 1,
+    }
+
+@pytest.mark.asyncio
+async def test_stale_refresh_sends_conditional_request(respx_router: MockRouter):
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=[
+        httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS, headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}),
+        httpx.Response(304),
+    ])
+    papers = await fetch_papers("cat:cs.AI", cache_ttl=0.01)
+    assert papers.validators == {"etag": '"v1"', "last-modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    first_fetched_at = papers.fetched_at
+    await asyncio.sleep(0.02)
+
+    assert await fetch_papers("cat:cs.AI", cache_ttl=0.01) is papers # Stale entry served, refresh starts
+    await asyncio.gather(*arxiv_service._background_tasks)
+
+    refresh = route.calls[1].request
+    assert refresh.headers["If-None-Match"] == '"v1"'
+    assert refresh.headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert papers.fetched_at > first_fetched_at
+    lookup = arxiv_service._response_cache.get(arxiv_service._cache_key(arxiv_service._build_query_params("cat:cs.AI", 0, 10, "submittedDate", "descending")))
+    assert lookup.value is papers and not lookup.is_stale # The 304 renewed the cached page
+
+def test_freshness_lifetime():
+    fresh = PaperList(fetched_at=time.time() - 100)
+    assert 0 < arxiv_service.freshness_lifetime(fresh, 600) <= 500
+    assert arxiv_service.freshness_lifetime(PaperList(fetched_at=time.time() - 1000), 600) == 0
+    assert arxiv_service.freshness_lifetime([], 600) is None
+
+def id_list_responder(known, failing=()):
+    """
+    Answers id_list requests with the requested ids found in `known` (id -> version), like arXiv.
+    """
+    def respond(request):
+        ids = request.url.params["id_list"].split(",")
+        if set(ids) & set(failing):
+            return httpx.Response(500, text="Internal Server Error")
+        entries = "".join(
+            f"<entry><id>http://arxiv.org/abs/{arxiv_id.split('v')[0]}v{known[arxiv_id.split('v')[0]]}</id>"
+            f"<published>2023-01-01T00:00:00Z</published><title>Paper {arxiv_id.split('v')[0]}</title>"
+            f"<summary>Summary</summary></entry>"
+            for arxiv_id in ids if arxiv_id.split("v")[0] in known
+        )
+        return httpx.Response(200, text=f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>')
+    return respond
+
+@pytest.mark.asyncio
+async def test_fetch_papers_by_ids_keeps_order_and_reports_missing(respx_router: MockRouter):
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=id_list_responder({"2301.00001": 2, "2301.00003": 1}))
+
+    lookup = await arxiv_service.fetch_papers_by_ids(["2301.00003", "2301.00009", "2301.00001v2", "2301.00003"])
+
+    assert [paper.arxiv_id for paper in lookup.papers] == ["2301.00003v1", "2301.00001v2"]
+    assert lookup.missing == ["2301.00009"] and lookup.unavailable == []
+    assert route.call_count == 1
+    params = route.calls[0].request.url.params
+    assert params["id_list"] == "2301.00003,2301.00009,2301.00001v2"
+    assert "search_query" not in params and params["max_results"] == "3"
+
+@pytest.mark.asyncio
+async def test_papers_listed_in_a_feed_are_looked_up_without_upstream_requests(respx_router: MockRouter):
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS))
+    papers = await get_latest_papers(max_results=3)
+
+    lookup = await arxiv_service.fetch_papers_by_ids([papers[0].arxiv_id]) # Expanding its card
+
+    assert lookup.papers == [papers[0]]
+    assert route.call_count == 1
+    assert "id_list" not in route.calls[0].request.url.params
+
+@pytest.mark.asyncio
+async def test_fetch_papers_by_ids_versioned_id_needs_exact_version(respx_router: MockRouter):
+    respx_router.get(ARXIV_API_URL).mock(side_effect=id_list_responder({"2301.00001": 2}))
+
+    lookup = await arxiv_service.fetch_papers_by_ids(["2301.00001v1"])
+
+    assert lookup.papers == [] and lookup.missing == ["2301.00001v1"]
+
+@pytest.mark.asyncio
+async def test_fetch_papers_by_ids_only_fetches_unknown_ids(respx_router: MockRouter, tmp_path):
+    from src.services.paper_store import PaperStore
+    store = PaperStore(str(tmp_path / "papers.db"))
+    store.upsert_papers([Paper(arxiv_id="2301.00002v1", title="Stored", summary="S", authors=[], published_date="2023-01-01T00:00:00Z")])
+    arxiv_service.set_paper_store(store)
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=id_list_responder({"2301.00001": 1, "2301.00003": 1}))
+    try:
+        first = await arxiv_service.fetch_papers_by_ids(["2301.00001", "2301.00002"])
+        await asyncio.gather(*arxiv_service._background_tasks)
+        second = await arxiv_service.fetch_papers_by_ids(["2301.00002", "2301.00001", "2301.00003"])
+    finally:
+        arxiv_service.set_paper_store(None)
+
+    assert [paper.title for paper in first.papers] == ["Paper 2301.00001", "Stored"]
+    assert [paper.title for paper in second.papers] == ["Stored", "Paper 2301.00001", "Paper 2301.00003"]
+    assert [call.request.url.params["id_list"] for call in route.calls] == ["2301.00001", "2301.00003"]
+    assert store.get_paper("2301.00001").arxiv_id == "2301.00001v1" # Written through
+    store.close()
+
+@pytest.mark.asyncio
+async def test_fetch_papers_by_ids_batches_evenly_and_isolates_failures(respx_router: MockRouter):
+    ids = [f"2301.{number:05d}" for number in range(1, 6)]
+    route = respx_router.get(ARXIV_API_URL).mock(
+        side_effect=id_list_responder({arxiv_id: 1 for arxiv_id in ids}, failing={"2301.00005"})
+    )
+
+    lookup = await arxiv_service.fetch_papers_by_ids(ids, batch_size=4)
+
+    assert sorted(call.request.url.params["id_list"] for call in route.calls) == [
+        "2301.00001,2301.00002,2301.00003", "2301.00004,2301.00005",
+    ]
+    assert [paper.arxiv_id for paper in lookup.papers] == ["2301.00001v1", "2301.00002v1", "2301.00003v1"]
+    assert lookup.unavailable == ["2301.00004", "2301.00005"] and lookup.missing == []
+
+class ChangingFeed:
+    """
+    Upstream ordering (newest first) that tests can change between requests, serving
+    start/max_results windows like arXiv. Paper n is published on day n.
+    """
+    def __init__(self, numbers):
+        self.numbers = list(numbers)
+
+    def __call__(self, request):
+        start = int(request.url.params["start"])
+        window = self.numbers[start:start + int(request.url.params["max_results"])]
+        entries = "".join(
+            f"<entry><id>http://arxiv.org/abs/2301.{number:05d}v1</id>"
+            f"<published>2023-{1 + number // 28:02d}-{1 + number % 28:02d}T00:00:00Z</published>"
+            f"<title>Paper {number}</title><summary>Summary</summary></entry>"
+            for number in window
+        )
+        return httpx.Response(200, text=f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>')
+
+def titles(papers):
+    return [int(paper.title.split()[1]) for paper in papers]
+
+@pytest.mark.asyncio
+async def test_fetch_papers_after_has_no_duplicates_when_papers_are_published(respx_router: MockRouter, monkeypatch):
+    monkeypatch.setattr(arxiv_service, "SNAPSHOT_PAGE_SIZE", 4)
+    feed = ChangingFeed(range(50, 30, -1))
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=feed)
+
+    first = await fetch_papers("cat:cs.AI", 0, 3)
+    feed.numbers[:0] = [52, 51] # Published while the first page was being read
+    cursor = Cursor.after("latest", first[-1], 2)
+    second = await arxiv_service.fetch_papers_after("cat:cs.AI", cursor, 3)
+    third = await arxiv_service.fetch_papers_after("cat:cs.AI", Cursor.after("latest", second[-1], 5), 3)
+
+    assert titles(first) == [50, 49, 48]
+    assert titles(second) == [47, 46, 45]
+    assert titles(third) == [44, 43, 42]
+    # The snapshot was opened at the cursor's offset and only ever extended; nothing was re-fetched
+    assert [call.request.url.params["start"] for call in route.calls] == ["0", "2", "6", "10"]
+
+@pytest.mark.asyncio
+async def test_fetch_papers_after_steps_back_when_papers_are_withdrawn(respx_router: MockRouter, monkeypatch):
+    monkeypatch.setattr(arxiv_service, "SNAPSHOT_PAGE_SIZE", 4)
+    feed = ChangingFeed(range(50, 30, -1))
+    respx_router.get(ARXIV_API_URL).mock(side_effect=feed)
+    first = await fetch_papers("cat:cs.AI", 0, 10)
+    for withdrawn in (50, 49, 48, 47, 46, 45, 41):
+        feed.numbers.remove(withdrawn)
+
+    papers = await arxiv_service.fetch_papers_after("cat:cs.AI", Cursor.after("latest", first[-1], 9), 3)
+
+    assert titles(first)[-1] == 41
+    assert titles(papers) == [40, 39, 38] # 41 itself is gone; the page continues after where it was
+
+@pytest.mark.asyncio
+async def test_fetch_papers_after_end_of_results(respx_router: MockRouter, monkeypatch):
+    monkeypatch.setattr(arxiv_service, "SNAPSHOT_PAGE_SIZE", 4)
+    respx_router.get(ARXIV_API_URL).mock(side_effect=ChangingFeed([5, 4, 3, 2, 1]))
+    first = await fetch_papers("cat:cs.AI", 0, 3)
+
+    second = await arxiv_service.fetch_papers_after("cat:cs.AI", Cursor.after("latest", first[-1], 2), 3)
+    third = await arxiv_service.fetch_papers_after("cat:cs.AI", Cursor.after("latest", second[-1], 4), 3)
+
+    assert titles(second) == [2, 1] and third == []
+
+@pytest.mark.asyncio
+async def test_get_related_papers_indexes_unknown_paper_and_hydrates_matches(respx_router: MockRouter):
+    pytest.importorskip("numpy")
+    from src.services.related import RelatedIndex, set_related_index
+    index = RelatedIndex()
+    index.add([
+        Paper.from_trusted("2301.00001v1", "Quantum error correction", "surface codes for logical qubits", [], "2023-01-01"),
+        Paper.from_trusted("2301.00002v3", "Protein folding", "structure prediction from sequences", [], "2023-01-01"),
+    ])
+    set_related_index(index)
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=[
+        httpx.Response(200, text=numbered_feed([9]).replace("Paper 9", "Decoding surface codes").replace("Summary", "quantum error correction for logical qubits")),
+        httpx.Response(200, text=SAMPLE_ATOM_XML_SUCCESS), # Carries 2301.00001v1
+    ])
+    try:
+        matches = await arxiv_service.get_related_papers("2301.00009", limit=5)
+        await asyncio.gather(*arxiv_service._background_tasks)
+    finally:
+        set_related_index(None)
+
+    assert [(paper.arxiv_id, score > 0) for paper, score in matches] == [("2301.00001v1", True)]
+    assert "2301.00009" in index # Indexed on first request
+    assert [call.request.url.params["id_list"] for call in route.calls] == ["2301.00009", "2301.00001"]
+
 # Ensure pytest, pytest-asyncio, and respx are in requirements-dev.txt or requirements.txt
 # `respx_router` is a fixture automatically provided by `respx`.
 # `caplog` is a fixture automatically provided by `pytest` for log capturing.
@@ -181,8 +921,4 @@ async def test_search_papers_by_keyword(respx_router: MockRouter):
 # The test for PDF link fallback on paper2 was also confirmed to be correct: `http://arxiv.org/pdf/2301.00002v2`
 # (derived from `<link href="http://arxiv.org/abs/2301.00002v2" />`).
 # The test for paper3 (no PDF link) correctly asserts `paper3.pdf_url is None`.
-# All looks consistent now.I have created the `tests/services/test_arxiv_service.py` file with the tests for the arXiv service. The tests cover successful fetching, various error conditions (HTTP errors, request errors, malformed XML), and the helper functions `get_latest_papers` and `search_papers_by_keyword`. `respx` is used for mocking HTTP calls, and `caplog` for asserting log messages.
-
-Now I will proceed to **Step 3: Write Tests for `main.py` API Endpoints (`tests/test_main.py`)**.
-
-I will create the `tests/test_main.py` file and implement tests for the `/`, `/papers/latest`, and `/papers/search` endpoints using `fastapi.testing.TestClient` and `unittest.mock.patch`.
+# All looks consistent now.
@@ -0,0 +1,139 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from src.services.atom_parser import (
+    AtomStreamParser,
+    MalformedFeedError,
+    iter_papers,
+    parse_feed,
+    parse_feed_with_feedparser,
+    parse_stream,
+)
+from tests.services.test_arxiv_service import SAMPLE_ATOM_XML_SUCCESS
+
+# Shaped like a real export.arxiv.org response: extra namespaces, feed-level metadata,
+# multi-line titles, escaped characters and arXiv-specific elements
+ARXIV_SHAPED_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" xmlns:arxiv="http://arxiv.org/schemas/atom">
+  <link href="http://arxiv.org/api/query?search_query=cat:cs.AI" rel="self" type="application/atom+xml"/>
+  <title type="html">ArXiv Query: search_query=cat:cs.AI</title>
+  <id>http://arxiv.org/api/abcdef</id>
+  <updated>2024-01-05T00:00:00-05:00</updated>
+  <opensearch:totalResults xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">2</opensearch:totalResults>
+  <entry>
+    <id>http://arxiv.org/abs/2401.00001v2</id>
+    <updated>2024-01-04T10:00:00Z</updated>
+    <published>2024-01-01T09:00:00Z</published>
+    <title>Bounds on $\\epsilon$-nets &amp; Friends:
+  A Multi-line Title</title>
+    <summary>  We show that a &lt; b &amp; c &gt; d for "all" cases.
+Second line with unicode: ü λ.
+</summary>
+    <author><name>  Ada   Lovelace </name><arxiv:affiliation>Analytical Engines</arxiv:affiliation></author>
+    <author><name>Alan Turing</name></author>
+    <arxiv:comment>12 pages, 3 figures</arxiv:comment>
+    <link href="http://arxiv.org/abs/2401.00001v2" rel="alternate" type="text/html"/>
+    <link title="pdf" href="http://arxiv.org/pdf/2401.00001v2" rel="related" type="application/pdf"/>
+    <link title="doi" href="http://dx.doi.org/10.1000/xyz" rel="related"/>
+    <arxiv:primary_category term="cs.AI" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="cs.AI" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="math.CO" scheme="http://arxiv.org/schemas/atom"/>
+  </entry>
+  <entry>
+    <id>http://arxiv.org/abs/2401.00002v1</id>
+    <published>2024-01-02T09:00:00Z</published>
+    <title>No links at all</title>
+    <summary>The id doubles as the link, so the PDF URL is derived from it.</summary>
+    <author><name>Grace Hopper</name></author>
+  </entry>
+  <entry>
+    <id>http://arxiv.org/abs/2401.00003v1</id>
+    <updated>2024-01-03T09:00:00Z</updated>
+    <published>2024-01-03T09:00:00Z</published>
+    <title>Last alternate link wins</title>
+    <summary>S</summary>
+    <link href="http://example.org/first"/>
+    <link href="http://arxiv.org/abs/2401.00003v1" rel="alternate"/>
+  </entry>
+</feed>
+"""
+
+
+@pytest.mark.parametrize("feed", [SAMPLE_ATOM_XML_SUCCESS, ARXIV_SHAPED_FEED], ids=["sample", "arxiv-shaped"])
+def test_streaming_parser_matches_feedparser(feed):
+    data = feed.encode("utf-8")
+    assert parse_feed(data) == parse_feed_with_feedparser(data)
+
+
+def test_streaming_parser_field_mapping():
+    papers = parse_feed(ARXIV_SHAPED_FEED.encode("utf-8"))
+
+    first = papers[0]
+    assert first.arxiv_id == "2401.00001v2"
+    assert first.title == "Bounds on $\\epsilon$-nets & Friends:\n  A Multi-line Title"
+    assert first.summary.startswith('We show that a < b & c > d for "all" cases.')
+    assert [author.name for author in first.authors] == ["Ada   Lovelace", "Alan Turing"]
+    assert str(first.pdf_url) == "http://arxiv.org/pdf/2401.00001v2"
+    assert first.categories == ["cs.AI", "math.CO"]
+
+    second = papers[1]
+    assert second.updated_date == "2024-01-02T09:00:00Z"
+    assert str(second.pdf_url) == "http://arxiv.org/pdf/2401.00002v1"
+    assert second.categories == []
+
+    assert str(papers[2].pdf_url) == "http://arxiv.org/pdf/2401.00003v1"
+
+
+def test_incremental_feeding_yields_entries_as_they_complete():
+    data = ARXIV_SHAPED_FEED.encode("utf-8")
+    parser = AtomStreamParser()
+    papers = []
+    completed_before_end = 0
+    for offset in range(0, len(data), 7):
+        papers.extend(parser.feed(data[offset:offset + 7]))
+        if offset + 7 < len(data):
+            completed_before_end = len(papers)
+    papers.extend(parser.close())
+
+    assert papers == parse_feed(data)
+    assert completed_before_end == 3 # All entries were emitted before the closing </feed>
+
+
+async def chunked(data: bytes, size: int = 64):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+
+@pytest.mark.asyncio
+async def test_parse_stream_and_iter_papers():
+    data = ARXIV_SHAPED_FEED.encode("utf-8")
+    assert await parse_stream(chunked(data)) == parse_feed(data)
+    assert [paper async for paper in iter_papers(chunked(data))] == parse_feed(data)
+
+
+@pytest.mark.asyncio
+async def test_parse_stream_falls_back_to_feedparser_for_malformed_feed():
+    # An unescaped ampersand makes the XML ill-formed, but feedparser recovers the entry
+    broken = SAMPLE_ATOM_XML_SUCCESS.replace("Test Paper Title 1", "Tom & Jerry").encode("utf-8")
+    papers = await parse_stream(chunked(broken))
+    assert len(papers) == 3
+    assert papers[0].title == "Tom & Jerry"
+
+
+@pytest.mark.asyncio
+async def test_parse_stream_keeps_no_fallback_buffer_past_its_cap():
+    data = ARXIV_SHAPED_FEED.encode("utf-8")
+    assert await parse_stream(chunked(data), fallback_max_bytes=128) == parse_feed(data)
+
+    broken = SAMPLE_ATOM_XML_SUCCESS.replace("Test Paper Title 1", "Tom & Jerry").encode("utf-8")
+    with pytest.raises(MalformedFeedError):
+        await parse_stream(chunked(broken), fallback_max_bytes=128)
+
+
+@pytest.mark.asyncio
+async def test_unrecoverable_feed_raises():
+    with pytest.raises(MalformedFeedError):
+        await parse_stream(chunked(b"This is not XML, it's just a string."))
+    with pytest.raises(ET.ParseError):
+        [paper async for paper in iter_papers(chunked(b"<feed><entry></feed>"))]
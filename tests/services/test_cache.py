@@ -0,0 +1,91 @@
+from src.services.cache import ResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_returns_fresh_then_stale_then_expires():
+    clock = FakeClock()
+    cache = ResponseCache(stale_ttl=5.0, clock=clock)
+    cache.set("k", "value", ttl=10.0)
+
+    lookup = cache.get("k")
+    assert lookup.value == "value" and not lookup.is_stale
+
+    clock.now = 12.0
+    lookup = cache.get("k")
+    assert lookup.value == "value" and lookup.is_stale
+
+    clock.now = 15.0
+    assert cache.get("k") is None
+    assert len(cache) == 0
+    assert cache.stats.hits == 1
+    assert cache.stats.stale_hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.expirations == 1
+
+
+def test_lru_eviction_by_entry_count():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a") # "a" becomes most recently used
+    cache.set("c", 3, ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a").value == 1
+    assert cache.get("c").value == 3
+    assert cache.stats.evictions == 1
+
+
+def test_eviction_by_total_bytes():
+    cache = ResponseCache(max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx", ttl=60)
+    cache.set("b", "yyyy", ttl=60)
+    cache.set("c", "zzzz", ttl=60)
+
+    assert cache.total_bytes == 8
+    assert cache.get("a") is None
+    assert cache.stats.evictions == 1
+
+
+def test_oversized_value_is_not_cached():
+    cache = ResponseCache(max_bytes=10, sizeof=len)
+    cache.set("small", "xx", ttl=60)
+    cache.set("huge", "x" * 11, ttl=60)
+
+    assert cache.get("huge") is None
+    assert cache.get("small").value == "xx"
+
+
+def test_replacing_key_updates_size_and_clear_resets_stats():
+    cache = ResponseCache(sizeof=len)
+    cache.set("a", "xxxx", ttl=60)
+    cache.set("a", "xx", ttl=60)
+    assert cache.total_bytes == 2
+    cache.get("a")
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.total_bytes == 0
+    assert cache.stats.hits == 0
+
+
+def test_entries_lists_live_entries_most_recently_used_first():
+    clock = FakeClock()
+    cache = ResponseCache(stale_ttl=5.0, clock=clock)
+    cache.set("a", 1, ttl=10.0)
+    cache.set("b", 2, ttl=2.0)
+    cache.set("c", 3, ttl=20.0)
+    cache.get("a")
+    clock.now = 4.0
+
+    assert cache.entries(10) == [("a", 1, 6.0, 5.0), ("c", 3, 16.0, 5.0), ("b", 2, 0.0, 3.0)]
+    assert cache.entries(1) == [("a", 1, 6.0, 5.0)]
+    clock.now = 7.0
+    assert [key for key, *_ in cache.entries(10)] == ["a", "c"]
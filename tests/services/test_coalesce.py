@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from src.services.coalesce import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_flight():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return ["result"]
+
+    waiters = [asyncio.create_task(flight.do("key", fetch)) for _ in range(10)]
+    await asyncio.sleep(0)
+    assert len(flight) == 1
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats.flights == 1
+    assert flight.stats.coalesced == 9
+    assert len(flight) == 0 # Finished flights are forgotten so later calls fetch again
+
+
+@pytest.mark.asyncio
+async def test_distinct_keys_do_not_coalesce():
+    flight = SingleFlight()
+
+    async def fetch(value):
+        await asyncio.sleep(0)
+        return value
+
+    results = await asyncio.gather(flight.do("a", lambda: fetch(1)), flight.do("b", lambda: fetch(2)))
+
+    assert results == [1, 2]
+    assert flight.stats.flights == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_every_waiter():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        raise ValueError("upstream failed")
+
+    waiters = [asyncio.create_task(flight.do("key", fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_does_not_cancel_the_flight():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "done"
+
+    disconnected = asyncio.create_task(flight.do("key", fetch))
+    remaining = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+
+    disconnected.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await remaining == "done"
+    assert disconnected.cancelled()
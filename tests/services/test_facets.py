@@ -0,0 +1,153 @@
+import random
+import threading
+from datetime import date
+
+from sqlalchemy import text
+
+from src.models.paper import Paper
+from src.services.facets import FacetFilter, FacetIndex, bitmap_of, positions_of, published_key
+from src.services.paper_store import PaperStore
+
+CATEGORIES = ["cs.AI", "cs.CL", "cs.LG", "math.CO"]
+
+
+def random_rows(rng, count, first_rowid=1):
+    rows = []
+    for rowid in range(first_rowid, first_rowid + count):
+        day = date.fromordinal(date(2023, 11, 1).toordinal() + rng.randrange(120))
+        published = f"{day.isoformat()}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00Z"
+        rows.append((rowid, published, rng.sample(CATEGORIES, rng.randint(1, 2))))
+    return rows
+
+
+def brute_force(rows, filters, default_categories=()):
+    categories = filters.categories or set(default_categories)
+    first, last = filters.day_range
+    matching = [
+        (published_key(published), rowid) for rowid, (published, terms) in rows.items()
+        if (not categories or categories & set(terms)) and first <= published_key(published) // 10**6 <= last
+    ]
+    return [rowid for _, rowid in sorted(matching, reverse=True)]
+
+
+def test_bitmaps_round_trip():
+    assert list(positions_of(bitmap_of([0, 7, 8, 300, 301]))) == [0, 7, 8, 300, 301]
+    assert list(positions_of(bitmap_of([100, 164], base=100), base=100)) == [100, 164]
+    assert bitmap_of([]) == 0
+
+
+def test_published_key():
+    assert published_key("2023-01-02T10:11:12Z") == 20230102101112
+    assert published_key("2023-01-02") == 20230102000000
+    assert published_key("unknown") == 0
+
+
+def test_pages_match_a_full_scan_across_updates():
+    rng = random.Random(11)
+    index = FacetIndex()
+    rows = {}
+    for batch in range(4):
+        new_rows = random_rows(rng, 150, first_rowid=1 + batch * 150)
+        # Later batches also rewrite earlier papers, e.g. a new version with other categories
+        for rowid, _, _ in random_rows(rng, 20):
+            new_rows.append((rowid, *random_rows(rng, 1)[0][1:]))
+        index.update(new_rows)
+        rows.update({rowid: (published, terms) for rowid, published, terms in new_rows})
+
+    filters = [
+        FacetFilter(),
+        FacetFilter.of(["cs.CL"]),
+        FacetFilter.of(["cs.AI", "math.CO"], date(2023, 12, 10), date(2024, 1, 31)),
+        FacetFilter.of(None, date(2024, 1, 1)),
+        FacetFilter.of(None, None, date(2023, 11, 30)),
+    ]
+    for facet_filter in filters:
+        expected = brute_force(rows, facet_filter)
+        bitmap = index.select(facet_filter)
+        assert bitmap.bit_count() == len(expected)
+        for start in (0, 7, 95, len(expected) - 3):
+            assert index.page(bitmap, start, 25) == expected[start:start + 25]
+        assert [rowid for rowid in rows if index.accepts(rowid, facet_filter)] == sorted(expected)
+
+
+def test_counts_apply_the_other_facets_filters():
+    index = FacetIndex()
+    index.update([
+        (1, "2024-01-05T00:00:00Z", ["cs.AI"]),
+        (2, "2024-01-06T00:00:00Z", ["cs.AI", "cs.CL"]),
+        (3, "2024-02-01T00:00:00Z", ["cs.CL"]),
+        (4, "2023-12-31T00:00:00Z", ["math.CO"]),
+    ])
+
+    counts = index.counts(FacetFilter.of(["cs.AI"], date(2024, 1, 1), date(2024, 1, 31)))
+
+    assert counts.total == 2
+    # Categories within January, whatever their category; months and days of cs.AI, whatever their date
+    assert counts.categories == {"cs.AI": 2, "cs.CL": 1}
+    assert counts.months == {"2024-01": 2}
+    assert counts.days == {"2024-01-06": 1, "2024-01-05": 1}
+    # Without filters, default categories stand in for the category filter
+    assert index.counts(FacetFilter(), ["cs.CL"]).months == {"2024-02": 1, "2024-01": 1}
+    assert index.counts(FacetFilter(), within=bitmap_of([3, 4])).total == 2
+
+
+def test_refresh_indexes_papers_stored_since_the_last_refresh(tmp_path):
+    store = PaperStore(str(tmp_path / "papers.db"))
+    paper = Paper.from_trusted("2401.00001v1", "A", "", [], "2024-01-05T00:00:00Z", categories=["cs.AI", "cs.CL"])
+    store.upsert_papers([paper])
+    index = FacetIndex()
+
+    assert index.refresh(store) == 1
+    assert index.counts(FacetFilter()).categories == {"cs.AI": 1, "cs.CL": 1}
+
+    store.upsert_papers([paper.model_copy(update={"arxiv_id": "2401.00001v2", "categories": ["math.CO"]})])
+    index.refresh(store)
+    assert len(index) == 1
+    assert index.counts(FacetFilter()).categories == {"math.CO": 1}
+    store.close()
+
+
+def test_refresh_indexes_writes_that_commit_after_a_newer_one(tmp_path):
+    store = PaperStore(str(tmp_path / "papers.db"))
+    store.upsert_papers([Paper.from_trusted("2401.00001v1", "A", "", [], "2024-01-05T00:00:00Z", categories=["cs.AI"])])
+    index = FacetIndex()
+    index.refresh(store)
+
+    # Stamped before the paper indexed above, committed after that refresh
+    store.upsert_papers([Paper.from_trusted("2401.00002v1", "B", "", [], "2024-01-06T00:00:00Z", categories=["cs.CL"])])
+    with store.engine.begin() as conn:
+        conn.execute(text("UPDATE papers SET stored_at = stored_at - 30 WHERE paper_id = '2401.00002'"))
+    index.refresh(store)
+
+    assert index.counts(FacetFilter()).categories == {"cs.AI": 1, "cs.CL": 1}
+    store.close()
+
+
+def test_queries_run_safely_alongside_updates():
+    rng = random.Random(3)
+    index = FacetIndex()
+    index.update(random_rows(rng, 500))
+    errors = []
+    done = threading.Event()
+
+    def query():
+        filters = FacetFilter.of(["cs.AI"], date(2023, 12, 3), date(2024, 1, 20))
+        try:
+            while not done.is_set():
+                index.counts(filters)
+                index.page(index.select(filters), 10, 25)
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=query) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for _ in range(300):
+        # Moving papers across years adds and drops month and day bitmaps
+        day = date.fromordinal(date(2000, 1, 1).toordinal() + rng.randrange(9000))
+        index.update([(rng.randrange(1, 500), f"{day.isoformat()}T00:00:00Z", [rng.choice(CATEGORIES)]) for _ in range(20)])
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
@@ -0,0 +1,142 @@
+import httpx
+import pytest
+from respx import MockRouter
+
+from src.services.arxiv_service import ARXIV_API_URL
+from src.services.harvester import Harvester
+from src.services.metrics import HARVEST_RETRIES
+from src.services.paper_store import PaperStore
+
+
+def atom_feed(entries):
+    """
+    entries: (arxiv_id, updated) pairs, newest first.
+    """
+    body = "".join(
+        f"""<entry>
+    <id>http://arxiv.org/abs/{arxiv_id}</id>
+    <updated>{updated}</updated>
+    <published>{updated}</published>
+    <title>Paper {arxiv_id}</title>
+    <summary>Summary {arxiv_id}</summary>
+    <author><name>Someone</name></author>
+    <link href="http://arxiv.org/abs/{arxiv_id}" rel="alternate" type="text/html"/>
+    <category term="cs.AI" scheme="http://arxiv.org/schemas/atom"/>
+  </entry>"""
+        for arxiv_id, updated in entries
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">{body}</feed>'
+
+
+@pytest.fixture
+def store(tmp_path):
+    paper_store = PaperStore(str(tmp_path / "papers.db"))
+    yield paper_store
+    paper_store.close()
+
+
+def harvester_for(store, **kwargs):
+    options = {"categories": ["cs.AI"], "page_size": 2, "backfill_days": 3650, "end_retries": 1, "end_retry_delay": 0}
+    options.update(kwargs)
+    return Harvester(store, **options)
+
+
+@pytest.mark.asyncio
+async def test_first_run_pages_until_exhausted_and_sets_watermark(respx_router: MockRouter, store):
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=[
+        httpx.Response(200, text=atom_feed([("2401.00003v1", "2024-01-03T00:00:00Z"), ("2401.00002v1", "2024-01-02T00:00:00Z")])),
+        httpx.Response(200, text=atom_feed([("2401.00001v1", "2024-01-01T00:00:00Z")])),
+        httpx.Response(200, text=atom_feed([("2401.00001v1", "2024-01-01T00:00:00Z")])), # The short page, confirmed
+    ])
+
+    result = await harvester_for(store).harvest_category("cs.AI")
+
+    assert result.completed
+    assert result.stored == 3
+    assert store.count() == 3
+    assert route.calls[0].request.url.params["sortBy"] == "lastUpdatedDate"
+    assert route.calls[1].request.url.params["start"] == "2"
+    assert route.calls[2].request.url.params["start"] == "2"
+    state = store.get_harvest_state("cs.AI")
+    assert state.watermark == "2024-01-03T00:00:00Z"
+    assert state.resume_start == 0 and not state.in_progress
+    assert state.covered_since is not None
+
+
+@pytest.mark.asyncio
+async def test_incremental_run_stops_at_watermark(respx_router: MockRouter, store):
+    state = store.get_harvest_state("cs.AI")
+    state.watermark = "2024-01-03T00:00:00Z"
+    store.save_harvest_state(state)
+    route = respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=atom_feed([
+        ("2401.00004v2", "2024-01-05T00:00:00Z"),
+        ("2401.00002v1", "2024-01-02T00:00:00Z"), # Older than the watermark: the walk stops here
+    ])))
+
+    result = await harvester_for(store).harvest_category("cs.AI")
+
+    assert route.call_count == 1
+    assert result.completed
+    assert result.stored == 1
+    assert store.get_paper("2401.00004").arxiv_id == "2401.00004v2"
+    assert store.get_harvest_state("cs.AI").watermark == "2024-01-05T00:00:00Z"
+
+
+@pytest.mark.asyncio
+async def test_failed_run_resumes_from_checkpoint(respx_router: MockRouter, store):
+    respx_router.get(ARXIV_API_URL).mock(side_effect=[
+        httpx.Response(200, text=atom_feed([("2401.00003v1", "2024-01-03T00:00:00Z"), ("2401.00002v1", "2024-01-02T00:00:00Z")])),
+        httpx.Response(503, text="Service Unavailable"),
+    ])
+    results = await harvester_for(store).run_once()
+    assert not results[0].completed
+
+    state = store.get_harvest_state("cs.AI")
+    assert state.in_progress
+    assert state.resume_start == 2
+    assert state.run_high_water == "2024-01-03T00:00:00Z"
+
+    respx_router.get(ARXIV_API_URL).mock(side_effect=[
+        httpx.Response(200, text=atom_feed([("2401.00001v1", "2024-01-01T00:00:00Z")])),
+        httpx.Response(200, text=atom_feed([("2401.00001v1", "2024-01-01T00:00:00Z")])),
+    ])
+    result = await harvester_for(store).harvest_category("cs.AI")
+
+    assert result.completed
+    assert store.count() == 3
+    assert store.get_harvest_state("cs.AI").watermark == "2024-01-03T00:00:00Z"
+
+
+@pytest.mark.asyncio
+async def test_transient_empty_page_does_not_end_the_run(respx_router: MockRouter, store):
+    route = respx_router.get(ARXIV_API_URL).mock(side_effect=[
+        httpx.Response(200, text=atom_feed([("2401.00004v1", "2024-01-04T00:00:00Z"), ("2401.00003v1", "2024-01-03T00:00:00Z")])),
+        httpx.Response(200, text=atom_feed([])), # arXiv hiccup in mid-listing
+        httpx.Response(200, text=atom_feed([("2401.00002v1", "2024-01-02T00:00:00Z"), ("2401.00001v1", "2024-01-01T00:00:00Z")])),
+        httpx.Response(200, text=atom_feed([])),
+        httpx.Response(200, text=atom_feed([])),
+    ])
+
+    retries = HARVEST_RETRIES.value(category="cs.AI")
+    result = await harvester_for(store).harvest_category("cs.AI")
+
+    assert result.completed
+    assert store.count() == 4
+    assert [call.request.url.params["start"] for call in route.calls] == ["0", "2", "2", "4", "4"]
+    assert HARVEST_RETRIES.value(category="cs.AI") - retries == 2
+    state = store.get_harvest_state("cs.AI")
+    assert state.watermark == "2024-01-04T00:00:00Z" and state.resume_start == 0
+
+
+@pytest.mark.asyncio
+async def test_page_budget_leaves_run_resumable(respx_router: MockRouter, store):
+    respx_router.get(ARXIV_API_URL).mock(return_value=httpx.Response(200, text=atom_feed([
+        ("2401.00003v1", "2024-01-03T00:00:00Z"), ("2401.00002v1", "2024-01-02T00:00:00Z"),
+    ])))
+
+    result = await harvester_for(store, max_pages=1).harvest_category("cs.AI")
+
+    assert not result.completed
+    state = store.get_harvest_state("cs.AI")
+    assert state.resume_start == 2
+    assert state.watermark == state.covered_since # Not advanced until the run completes
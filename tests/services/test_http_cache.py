@@ -0,0 +1,38 @@
+from src.services import serialization
+from src.services.http_cache import cache_control, etag_matches, negotiate_encoding, variant_etag
+
+ETAG = '"0123456789abcdef"'
+
+
+def test_negotiate_encoding_prefers_available_codings(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+    assert negotiate_encoding("gzip, deflate, br") == "gzip"
+    assert negotiate_encoding("br") == "identity"
+    assert negotiate_encoding(None) == "identity"
+    assert negotiate_encoding("gzip;q=0, *;q=0.5") == "identity"
+    assert negotiate_encoding("*") == "gzip"
+
+    monkeypatch.setattr(serialization, "brotli", object())
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+
+
+def test_etag_matches_identity_and_compressed_variants(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+    assert etag_matches(ETAG, ETAG)
+    assert etag_matches(f'"other", W/{ETAG}', ETAG)
+    assert etag_matches(variant_etag(ETAG, "gzip"), ETAG)
+    assert etag_matches("*", ETAG)
+    assert not etag_matches('"other"', ETAG)
+    assert not etag_matches(None, ETAG)
+
+
+def test_variant_etag_distinguishes_codings():
+    assert variant_etag(ETAG, "identity") == ETAG
+    assert variant_etag(ETAG, "gzip") == '"0123456789abcdef-gzip"'
+
+
+def test_cache_control():
+    assert cache_control(None) == "no-cache"
+    assert cache_control(120) == "public, max-age=120"
+    assert cache_control(0, 3600) == "public, max-age=0, stale-while-revalidate=3600"
@@ -0,0 +1,55 @@
+import pytest
+
+from src.services.http_client import HttpClientSettings, create_http_client
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("ARXIV_HTTP_MAX_CONNECTIONS", "50")
+    monkeypatch.setenv("ARXIV_HTTP_MAX_KEEPALIVE", "25")
+    monkeypatch.setenv("ARXIV_HTTP_KEEPALIVE_EXPIRY", "12.5")
+    monkeypatch.setenv("ARXIV_HTTP_READ_TIMEOUT", "60")
+    monkeypatch.setenv("ARXIV_HTTP_HTTP2", "true")
+
+    settings = HttpClientSettings.from_env()
+
+    assert settings.max_connections == 50
+    assert settings.max_keepalive_connections == 25
+    assert settings.keepalive_expiry == 12.5
+    assert settings.read_timeout == 60.0
+    assert settings.http2 is True
+    assert settings.connect_timeout == HttpClientSettings().connect_timeout # Unset values keep defaults
+
+
+def test_settings_limits_and_timeouts():
+    settings = HttpClientSettings(max_connections=7, max_keepalive_connections=3, keepalive_expiry=9.0,
+                                  connect_timeout=1.0, read_timeout=2.0, write_timeout=3.0, pool_timeout=4.0)
+    assert settings.limits.max_connections == 7
+    assert settings.limits.max_keepalive_connections == 3
+    assert settings.limits.keepalive_expiry == 9.0
+    assert settings.timeout.connect == 1.0
+    assert settings.timeout.read == 2.0
+    assert settings.timeout.write == 3.0
+    assert settings.timeout.pool == 4.0
+
+
+@pytest.mark.asyncio
+async def test_create_http_client_applies_timeouts():
+    client = create_http_client(HttpClientSettings(read_timeout=42.0))
+    try:
+        assert client.timeout.read == 42.0
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_create_http_client_http2_falls_back_without_h2(caplog):
+    try:
+        import h2  # noqa: F401
+        pytest.skip("h2 is installed; fallback path not exercised")
+    except ImportError:
+        pass
+    client = create_http_client(HttpClientSettings(http2=True))
+    try:
+        assert "falling back to HTTP/1.1" in caplog.text
+    finally:
+        await client.aclose()
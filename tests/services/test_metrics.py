@@ -0,0 +1,63 @@
+import pytest
+
+from src.services.metrics import MetricsRegistry
+
+
+def test_counter_renders_labelled_samples():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ["status"])
+    requests.inc(status="200")
+    requests.inc(2, status="200")
+    requests.inc(status="500")
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{status="200"} 3',
+        'requests_total{status="500"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 3.65" in lines
+    assert "latency_seconds_count 4" in lines
+
+
+def test_histogram_timer_records_one_observation():
+    registry = MetricsRegistry()
+    stage = registry.histogram("stage_seconds", "Stage.", ["stage"])
+    with stage.time(stage="parse"):
+        pass
+
+    assert stage.count(stage="parse") == 1
+    assert stage.count(stage="encode") == 0
+
+
+def test_collected_metrics_are_read_at_render_time():
+    registry = MetricsRegistry()
+    state = {"entries": 1}
+    registry.collected("cache_entries", "Entries.", "gauge", lambda: [({}, state["entries"])])
+    state["entries"] = 7
+
+    assert "cache_entries 7" in registry.render().splitlines()
+
+
+def test_label_values_are_escaped_and_label_names_checked():
+    registry = MetricsRegistry()
+    counter = registry.counter("odd_total", "Odd.", ["value"])
+    counter.inc(value='say "hi"\n')
+
+    assert 'odd_total{value="say \\"hi\\"\\n"} 1' in registry.render()
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+    with pytest.raises(ValueError):
+        registry.counter("odd_total", "Duplicate.")
@@ -0,0 +1,47 @@
+import pytest
+
+from src.models.paper import Paper
+from src.services.pagination import Cursor, FeedSnapshot, InvalidCursor
+
+
+def make_paper(number, day):
+    return Paper(arxiv_id=f"2301.{number:05d}v1", title=f"Paper {number}", summary="S", authors=[],
+                 published_date=f"2023-01-{day:02d}T00:00:00Z")
+
+
+def test_cursor_round_trip_and_scope_check():
+    cursor = Cursor.after("search:llm", make_paper(7, 3), 24)
+
+    token = cursor.encode()
+
+    assert "=" not in token and Cursor.decode(token, "search:llm") == cursor
+    with pytest.raises(InvalidCursor):
+        Cursor.decode(token, "latest")
+    for malformed in ("not a cursor", "WzFd", Cursor.after("latest", make_paper(1, 1), -1).encode()):
+        with pytest.raises(InvalidCursor):
+            Cursor.decode(malformed, "latest")
+
+
+def test_snapshot_drops_papers_repeated_by_shifted_pages():
+    snapshot = FeedSnapshot()
+    assert snapshot.extend([make_paper(5, 5), make_paper(4, 4)], requested=2) == 2
+    # Two papers were published meanwhile, so the next page starts with 5 and 4 again
+    assert snapshot.extend([make_paper(5, 5), make_paper(4, 4)], requested=2) == 0
+    assert snapshot.extend([make_paper(3, 3)], requested=2) == 1
+
+    assert [paper.title for paper in snapshot.papers] == ["Paper 5", "Paper 4", "Paper 3"]
+    assert snapshot.next_offset == 5 and snapshot.exhausted
+
+
+def test_snapshot_position_after_cursor():
+    snapshot = FeedSnapshot(start=10)
+    snapshot.extend([make_paper(9, 9), make_paper(8, 8), make_paper(6, 6)], requested=3)
+
+    assert snapshot.position_after(Cursor.after("latest", make_paper(8, 8), 11)) == 2
+    # The cursor's paper was withdrawn: continue with the next older one
+    assert snapshot.position_after(Cursor.after("latest", make_paper(7, 7), 12)) == 2
+    # Older than everything held, and the snapshot may continue
+    assert snapshot.position_after(Cursor.after("latest", make_paper(1, 1), 20)) is None
+    # Newer than the snapshot's first paper, which does not start at the top
+    assert snapshot.starts_after(Cursor.after("latest", make_paper(10, 10), 9))
+    assert snapshot.position_after(Cursor.after("latest", make_paper(10, 10), 9)) is None
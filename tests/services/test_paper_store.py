@@ -0,0 +1,98 @@
+import pytest
+
+from src.models.paper import Paper, PaperAuthor
+from src.services.paper_store import PaperStore, build_match_query, split_arxiv_id
+from src.services.serialization import paper_to_dict
+
+
+def make_paper(arxiv_id, title, summary="A summary.", authors=("Author One",), categories=("cs.AI",),
+               published="2023-01-01T00:00:00Z"):
+    return Paper(
+        arxiv_id=arxiv_id,
+        title=title,
+        summary=summary,
+        authors=[PaperAuthor(name=name) for name in authors],
+        published_date=published,
+        updated_date=published,
+        pdf_url=f"http://arxiv.org/pdf/{arxiv_id}",
+        categories=list(categories),
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    paper_store = PaperStore(str(tmp_path / "papers.db"))
+    yield paper_store
+    paper_store.close()
+
+
+def test_split_arxiv_id():
+    assert split_arxiv_id("2301.00001v2") == ("2301.00001", 2)
+    assert split_arxiv_id("hep-th/9901001v1") == ("hep-th/9901001", 1)
+    assert split_arxiv_id("2301.00001") == ("2301.00001", 1)
+
+
+def test_build_match_query_quotes_tokens():
+    assert build_match_query('quantum  "computing') == '"quantum" """computing"'
+    assert build_match_query("   ") == ""
+
+
+def test_upsert_and_get_round_trip(store):
+    paper = make_paper("2301.00001v1", "Graph Neural Networks", authors=("Ada Lovelace", "Alan Turing"),
+                       categories=("cs.LG", "cs.AI"))
+    assert store.upsert_papers([paper]) == 1
+
+    loaded = store.get_paper("2301.00001")
+    assert paper_to_dict(loaded) == paper_to_dict(paper)
+    assert [author.name for author in loaded.authors] == ["Ada Lovelace", "Alan Turing"]
+    assert loaded.categories == ["cs.LG", "cs.AI"]
+
+
+def test_upsert_keeps_newest_version(store):
+    store.upsert_papers([make_paper("2301.00001v2", "Second version")])
+    assert store.upsert_papers([make_paper("2301.00001v1", "First version")]) == 0
+    assert store.get_paper("2301.00001v1").title == "Second version"
+
+    store.upsert_papers([make_paper("2301.00001v3", "Third version")])
+    assert store.count() == 1
+    assert store.get_paper("2301.00001").arxiv_id == "2301.00001v3"
+    assert store.search("Second") == [] # The replaced version is removed from the FTS index
+
+
+def test_get_papers_by_requested_id(store):
+    store.upsert_papers([make_paper("2301.00001v2", "First"), make_paper("hep-th/9901001v1", "Second")])
+
+    found = store.get_papers(["2301.00001", "2301.00001v1", "hep-th/9901001v1", "2301.00009"])
+
+    assert {arxiv_id: paper.title for arxiv_id, paper in found.items()} == {
+        "2301.00001": "First", "hep-th/9901001v1": "Second",
+    }
+    assert store.get_papers([]) == {}
+
+
+def test_search_ranks_title_matches_first_and_paginates(store):
+    store.upsert_papers([
+        make_paper("2301.00001v1", "A study of graphs", summary="We mention transformers once."),
+        make_paper("2301.00002v1", "Transformers for everything", summary="Transformers are great."),
+        make_paper("2301.00003v1", "Unrelated topic", summary="Nothing to see here."),
+    ])
+
+    results = store.search("transformers")
+    assert [paper.arxiv_id for paper in results] == ["2301.00002v1", "2301.00001v1"]
+
+    assert [paper.arxiv_id for paper in store.search("transformers", start=1, max_results=1)] == ["2301.00001v1"]
+
+
+def test_search_matches_author_names_and_stems(store):
+    store.upsert_papers([make_paper("2301.00001v1", "Some paper", authors=("Grace Hopper",))])
+
+    assert len(store.search("hopper")) == 1
+    assert len(store.search("papers")) == 1 # Porter stemming
+    assert store.search('"unbalanced') == [] # FTS5 syntax in user input is neutralised
+
+
+def test_in_memory_store():
+    paper_store = PaperStore(":memory:")
+    paper_store.upsert_papers([make_paper("2301.00001v1", "In memory")])
+    assert paper_store.count() == 1
+    paper_store.close()
@@ -0,0 +1,73 @@
+from datetime import date
+
+from src.services import planner
+from src.services.paper_store import HarvestState
+from src.services.planner import LOCAL, SPLIT, UPSTREAM, Coverage, Segment, category_coverage, plan_query
+
+NOW = 1_700_000_000.0
+
+
+def harvested(category, covered_since="2024-01-01T08:00:00Z", watermark="2024-03-10T20:00:00Z", last_run_at=NOW - 60, in_progress=False):
+    return HarvestState(
+        category=category,
+        covered_since=covered_since,
+        watermark=watermark,
+        run_high_water="2024-03-11T01:00:00Z" if in_progress else None,
+        last_run_at=last_run_at,
+    )
+
+
+def test_coverage_is_whole_days_and_reaches_now_after_a_recent_run():
+    assert category_coverage(harvested("cs.AI"), NOW) == Coverage(date(2024, 1, 2))
+    # A stale or running harvest only vouches for the days before its watermark's
+    assert category_coverage(harvested("cs.AI", last_run_at=NOW - planner.MAX_LAG - 1), NOW) == Coverage(date(2024, 1, 2), date(2024, 3, 9))
+    assert category_coverage(harvested("cs.AI", in_progress=True), NOW) == Coverage(date(2024, 1, 2), date(2024, 3, 9))
+    assert category_coverage(harvested("cs.AI", watermark="2024-01-02T10:00:00Z", in_progress=True), NOW) is None
+    assert category_coverage(HarvestState(category="cs.AI"), NOW) is None
+    assert category_coverage(None, NOW) is None
+
+
+def test_covered_queries_are_local():
+    coverage = {"cs.AI": harvested("cs.AI"), "cs.CL": harvested("cs.CL")}
+
+    plan = plan_query(["cs.AI", "cs.CL"], date(2024, 2, 1), None, coverage, NOW)
+
+    assert (plan.route, plan.segments) == (LOCAL, (Segment(LOCAL, date(2024, 2, 1), None),))
+
+
+def test_partly_covered_queries_split_newest_first():
+    coverage = {
+        "cs.AI": harvested("cs.AI"),
+        "cs.CL": harvested("cs.CL", covered_since="2024-01-20T00:00:00Z", last_run_at=NOW - planner.MAX_LAG - 1),
+    }
+
+    plan = plan_query(["cs.AI", "cs.CL"], None, None, coverage, NOW)
+
+    # Coverage is what every category covers: cs.CL's shorter history, and its older watermark
+    assert plan.route == SPLIT
+    assert plan.segments == (
+        Segment(UPSTREAM, date(2024, 3, 10), None),
+        Segment(LOCAL, date(2024, 1, 21), date(2024, 3, 9)),
+        Segment(UPSTREAM, None, date(2024, 1, 20)),
+    )
+    assert plan_query(["cs.AI"], date(2023, 12, 1), date(2024, 1, 31), coverage, NOW).segments == (
+        Segment(LOCAL, date(2024, 1, 2), date(2024, 1, 31)),
+        Segment(UPSTREAM, date(2023, 12, 1), date(2024, 1, 1)),
+    )
+
+
+def test_uncovered_queries_go_upstream_whole():
+    coverage = {"cs.AI": harvested("cs.AI")}
+
+    assert plan_query([], None, None, coverage, NOW).reason == "all-categories"
+    assert plan_query(["cs.AI", "math.CO"], None, None, coverage, NOW).reason == "uncovered-category"
+    plan = plan_query(["cs.AI"], date(2023, 1, 1), date(2023, 12, 31), coverage, NOW)
+    assert (plan.route, plan.reason) == (UPSTREAM, "outside-coverage")
+    assert plan.segments == (Segment(UPSTREAM, date(2023, 1, 1), date(2023, 12, 31)),)
+
+
+def test_plan_header():
+    plan = plan_query(["cs.AI"], None, None, {"cs.AI": harvested("cs.AI")}, NOW)
+    plan.served.add(LOCAL)
+
+    assert plan.header() == "route=split; served=local; segments=local:2024-01-02..,upstream:..2024-01-01"
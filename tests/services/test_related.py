@@ -0,0 +1,141 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import text
+
+from src.models.paper import Paper
+from src.services.paper_store import PaperStore
+from src.services import related
+from src.services.related import RelatedIndex, claim_directory, paper_terms, sync_from_store
+
+np = pytest.importorskip("numpy")
+
+TOPICS = {
+    "graphs": "graph neural networks message passing node classification over graph structure",
+    "quantum": "quantum error correction surface codes logical qubits decoherence thresholds",
+    "proteins": "protein structure prediction folding amino acid sequences alignment",
+}
+
+
+def make_paper(arxiv_id, topic, variant=""):
+    return Paper.from_trusted(
+        arxiv_id=arxiv_id,
+        title=f"On {topic} {variant}",
+        summary=f"{TOPICS[topic]} {variant} experiments",
+        author_names=[],
+        published_date="2023-01-01T00:00:00Z",
+    )
+
+
+def corpus():
+    papers = []
+    for number, topic in enumerate(["graphs", "quantum", "proteins"] * 4):
+        papers.append(make_paper(f"2301.{number:05d}v1", topic, f"variant{number}"))
+    return papers
+
+
+def test_paper_terms_hash_unigrams_and_bigrams():
+    terms = paper_terms(Paper.from_trusted("1", "Graph", "the graph graph neural", [], "2023"), features=1 << 20)
+
+    # 'graph': twice from the title, twice from the abstract; 'neural', 'graph graph' and 'graph neural' once
+    assert sorted(terms.values()) == [1, 1, 1, 4]
+
+
+def test_related_ranks_papers_on_the_same_topic_first():
+    index = RelatedIndex(segment_size=5)
+    index.add(corpus())
+
+    matches = index.related("2301.00000", limit=3)
+
+    assert {int(arxiv_id[5:10]) % 3 for arxiv_id, _ in matches} == {0} # All graph papers, excluding itself
+    assert "2301.00000v1" not in [arxiv_id for arxiv_id, _ in matches]
+    assert all(0 < score <= 1 for _, score in matches)
+    assert [score for _, score in matches] == sorted((score for _, score in matches), reverse=True)
+    with pytest.raises(KeyError):
+        index.related("2399.99999")
+
+
+def test_newer_version_replaces_older_one():
+    index = RelatedIndex(segment_size=5)
+    index.add(corpus())
+    assert index.add([make_paper("2301.00000v2", "quantum", "revised")]) == 1
+    assert index.add([make_paper("2301.00000v1", "graphs")]) == 0 # Older versions are ignored
+
+    matches = [arxiv_id for arxiv_id, _ in index.related("2301.00000v2", limit=3)]
+
+    assert len(index) == 12
+    assert {int(arxiv_id[5:10]) % 3 for arxiv_id in matches} == {1}
+
+
+def test_index_persists_and_reopens_memory_mapped(tmp_path):
+    index = RelatedIndex(str(tmp_path), segment_size=4)
+    papers = corpus()
+    for batch in (papers[:4], papers[4:8], papers[8:10]):
+        index.add(batch)
+    index.flush()
+    expected = index.related("2301.00001", limit=5)
+
+    reopened = RelatedIndex(str(tmp_path), segment_size=4)
+
+    assert len(reopened) == 10 and reopened.stats()["segments"] == 3
+    assert isinstance(reopened.segments[0].post_weights, np.memmap)
+    assert reopened.related("2301.00001", limit=5) == expected
+    reopened.add(papers[10:])
+    assert len(reopened.related("2301.00001", limit=10)) == 3 # The other quantum papers, including new ones
+
+
+def test_segments_are_merged_and_superseded_versions_dropped(tmp_path):
+    index = RelatedIndex(str(tmp_path), segment_size=3, max_segments=2)
+    papers = corpus()
+    index.add(papers[:3])
+    index.add(papers[3:6])
+    index.add([make_paper("2301.00000v2", "graphs", "revised"), *papers[6:8]]) # Third segment: merge
+
+    assert index.stats()["segments"] == 1
+    assert len(index.segments[0]) == 8 # 2301.00000v1 was dropped by the merge
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("segment-")) == ["segment-000004"]
+    assert RelatedIndex(str(tmp_path)).related("2301.00003", limit=2) == index.related("2301.00003", limit=2)
+
+
+def test_sync_from_store_indexes_new_papers_once(tmp_path):
+    store = PaperStore(str(tmp_path / "papers.db"))
+    store.upsert_papers(corpus())
+    index = RelatedIndex(str(tmp_path / "related"))
+
+    assert sync_from_store(index, store, batch_size=5) == 12
+    assert sync_from_store(index, store) == 0
+    assert RelatedIndex(str(tmp_path / "related")).store_watermark == index.store_watermark > 0
+    store.close()
+
+
+def test_sync_from_store_indexes_writes_that_commit_after_a_newer_one(tmp_path):
+    store = PaperStore(str(tmp_path / "papers.db"))
+    papers = corpus()
+    store.upsert_papers(papers[:3])
+    index = RelatedIndex(str(tmp_path / "related"))
+    sync_from_store(index, store)
+
+    # Stamped before the papers synced above, committed after that sync
+    store.upsert_papers(papers[3:4])
+    with store.engine.begin() as conn:
+        conn.execute(text("UPDATE papers SET stored_at = stored_at - 30 WHERE paper_id = :paper_id"), {"paper_id": papers[3].arxiv_id[:-2]})
+
+    assert sync_from_store(index, store) == 1
+    assert index.stats()["papers"] == 4
+    store.close()
+
+
+def test_each_process_claims_its_own_directory(tmp_path):
+    if related.fcntl is None:
+        pytest.skip("Directory claims need fcntl")
+    directory = str(tmp_path / "related")
+
+    assert claim_directory(directory) == directory
+    assert claim_directory(directory) == directory # Claimed again by the same process
+    other = subprocess.run(
+        [sys.executable, "-c", f"from src.services.related import claim_directory; print(claim_directory({directory!r}))"],
+        capture_output=True, text=True, check=True,
+    )
+    assert other.stdout.strip() == os.path.join(directory, "worker-1")
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from src.services.scheduler import Priority, QueueDeadlineExceeded, UpstreamScheduler
+
+
+@pytest.mark.asyncio
+async def test_unlimited_scheduler_grants_immediately():
+    scheduler = UpstreamScheduler(rate=0, max_concurrency=10)
+
+    async with scheduler.slot():
+        assert scheduler.running == 1
+    assert scheduler.running == 0
+    assert scheduler.stats.lanes[Priority.INTERACTIVE].granted == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_queues_excess_requests():
+    scheduler = UpstreamScheduler(rate=0, max_concurrency=2)
+    release = asyncio.Event()
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with scheduler.slot():
+            peak = max(peak, scheduler.running)
+            await release.wait()
+
+    tasks = [asyncio.create_task(request()) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert scheduler.running == 2
+    assert scheduler.queue_depth() == 3
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert peak == 2
+    assert scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_by_priority_then_arrival():
+    scheduler = UpstreamScheduler(rate=0, max_concurrency=1)
+    order = []
+    await scheduler.acquire() # Hold the only slot so everything below queues
+
+    async def request(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+
+    tasks = [
+        asyncio.create_task(request("bulk", Priority.BULK)),
+        asyncio.create_task(request("background-1", Priority.BACKGROUND)),
+        asyncio.create_task(request("interactive", Priority.INTERACTIVE)),
+        asyncio.create_task(request("background-2", Priority.BACKGROUND)),
+    ]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["interactive", "background-1", "background-2", "bulk"]
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_requests():
+    scheduler = UpstreamScheduler(rate=50, burst=1, max_concurrency=10) # One token every 20ms
+    loop = asyncio.get_running_loop()
+    granted_at = []
+
+    async def request():
+        async with scheduler.slot(Priority.BACKGROUND):
+            granted_at.append(loop.time())
+
+    await asyncio.gather(*(request() for _ in range(4)))
+
+    gaps = [later - earlier for earlier, later in zip(granted_at, granted_at[1:])]
+    assert all(gap >= 0.015 for gap in gaps)
+
+
+@pytest.mark.asyncio
+async def test_request_fails_fast_when_estimated_wait_exceeds_deadline():
+    now = [0.0]
+    scheduler = UpstreamScheduler(rate=0.1, burst=1, deadlines={Priority.INTERACTIVE: 5.0}, clock=lambda: now[0])
+    async with scheduler.slot():
+        pass # Spends the only token; the next one is 10s away
+
+    with pytest.raises(QueueDeadlineExceeded):
+        await scheduler.acquire(Priority.INTERACTIVE)
+    assert scheduler.stats.lanes[Priority.INTERACTIVE].rejected == 1
+    assert scheduler.queue_depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_queued_request_times_out_at_deadline():
+    scheduler = UpstreamScheduler(rate=0, max_concurrency=1, deadlines={Priority.INTERACTIVE: 0.05})
+    await scheduler.acquire()
+
+    with pytest.raises(QueueDeadlineExceeded):
+        await scheduler.acquire(Priority.INTERACTIVE)
+    scheduler.release()
+
+    assert scheduler.running == 0
+    assert scheduler.queue_depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    scheduler = UpstreamScheduler(rate=0, max_concurrency=1)
+    await scheduler.acquire()
+    waiter = asyncio.create_task(scheduler.acquire(Priority.BULK))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    scheduler.release()
+
+    assert scheduler.running == 0
+    async with scheduler.slot(): # The slot is still usable
+        assert scheduler.running == 1
+
+
+def test_snapshot_reports_lanes():
+    snapshot = UpstreamScheduler().snapshot()
+
+    assert snapshot["running"] == 0
+    assert set(snapshot["queue_depth"]) == {"interactive", "background", "bulk"}
+    assert snapshot["lanes"]["interactive"]["granted"] == 0
@@ -0,0 +1,159 @@
+import gzip
+import json
+import warnings
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from src.models.paper import Paper, PaperAuthor
+from src.services import serialization
+from src.services.serialization import PaperList, Projection, decode_papers, encode_papers, paper_to_dict, papers_etag
+
+VALIDATED = Paper(
+    arxiv_id="2301.00001v1",
+    title="Ünïcode title \"quoted\"",
+    summary="Summary with a < b & λ.",
+    authors=[PaperAuthor(name="Author A"), PaperAuthor(name="Author B")],
+    published_date="2023-01-01T10:00:00Z",
+    updated_date="2023-01-01T12:00:00Z",
+    pdf_url="http://arxiv.org/pdf/2301.00001v1",
+    categories=["cs.AI"],
+)
+NO_PDF = Paper(arxiv_id="2301.00002v1", title="T", summary="S", authors=[], published_date="2023-01-02T00:00:00Z")
+
+
+def fastapi_encoding(papers):
+    # What response_model serialization followed by JSONResponse would have produced
+    return json.dumps(jsonable_encoder(papers), ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+@pytest.mark.parametrize("use_orjson", [True, False], ids=["orjson", "stdlib"])
+def test_encode_papers_matches_fastapi_serialization(monkeypatch, use_orjson):
+    if use_orjson and serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+
+    assert encode_papers([VALIDATED, NO_PDF]) == fastapi_encoding([VALIDATED, NO_PDF])
+
+
+def test_trusted_construction_matches_validated_model():
+    trusted = Paper.from_trusted(
+        arxiv_id=VALIDATED.arxiv_id,
+        title=VALIDATED.title,
+        summary=VALIDATED.summary,
+        author_names=["Author A", "Author B"],
+        published_date=VALIDATED.published_date,
+        updated_date=VALIDATED.updated_date,
+        pdf_url="http://arxiv.org/pdf/2301.00001v1",
+        categories=["cs.AI"],
+    )
+
+    assert paper_to_dict(trusted) == paper_to_dict(VALIDATED)
+    assert encode_papers([trusted]) == fastapi_encoding([VALIDATED])
+    assert trusted.model_fields_set == set(Paper.model_fields)
+    assert trusted.model_copy(update={"title": "Copy"}).title == "Copy"
+
+
+def test_trusted_papers_equal_validated_ones_and_serialize_cleanly():
+    trusted = Paper.from_trusted(
+        VALIDATED.arxiv_id, VALIDATED.title, VALIDATED.summary, ["Author A", "Author B"], VALIDATED.published_date,
+        VALIDATED.updated_date, "http://arxiv.org/pdf/2301.00001v1", ["cs.AI"],
+    )
+    other = Paper.from_trusted("2301.00002v1", "T", "S", [], "2023-01-02T00:00:00Z")
+
+    assert trusted == VALIDATED
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert trusted.model_dump_json() == VALIDATED.model_dump_json()
+        assert trusted.model_dump() == VALIDATED.model_dump()
+    assert trusted.model_fields_set is not other.model_fields_set
+    assert trusted.authors[0].model_fields_set is not trusted.authors[1].model_fields_set
+    with pytest.raises(ValueError):
+        Paper(arxiv_id="2301.00003v1", title="T", summary="S", authors=[], published_date="2023-01-03T00:00:00Z", pdf_url="not a url")
+
+
+@pytest.mark.parametrize("mode", ["validation", "serialization"])
+def test_pdf_url_schema_is_unchanged(mode):
+    # The published schema of pdf_url, as it was when the field was an HttpUrl
+    assert Paper.model_json_schema(mode=mode)["properties"]["pdf_url"] == {
+        "anyOf": [{"format": "uri", "maxLength": 2083, "minLength": 1, "type": "string"}, {"type": "null"}],
+        "default": None,
+        "title": "Pdf Url",
+    }
+
+
+@pytest.mark.parametrize("use_orjson", [True, False], ids=["orjson", "stdlib"])
+def test_decode_papers_round_trips_and_keeps_the_body(monkeypatch, use_orjson):
+    if use_orjson and serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+    body = encode_papers([VALIDATED, NO_PDF])
+
+    papers = decode_papers(body, fetched_at=5.0)
+
+    assert [paper_to_dict(paper) for paper in papers] == [paper_to_dict(VALIDATED), paper_to_dict(NO_PDF)]
+    assert encode_papers(papers) is body and papers.fetched_at == 5.0
+
+
+def test_paper_list_memoizes_encoding():
+    papers = PaperList([VALIDATED])
+    first = encode_papers(papers)
+    assert encode_papers(papers) is first
+    assert isinstance(papers, list) and papers[0] is VALIDATED
+
+
+def test_paper_list_memoizes_etag_and_compressed_bodies():
+    papers = PaperList([VALIDATED, NO_PDF])
+    compressed = encode_papers(papers, "gzip")
+
+    assert gzip.decompress(compressed) == encode_papers(papers)
+    assert encode_papers(papers, "gzip") is compressed
+    assert papers_etag(papers) is papers_etag(papers)
+    assert papers_etag(papers) == papers_etag([VALIDATED, NO_PDF]) # Derived from content only
+    assert papers_etag(papers) != papers_etag([VALIDATED])
+
+
+def test_card_projection_truncates_summary_and_authors(monkeypatch):
+    monkeypatch.setattr(serialization, "CARD_SUMMARY_CHARS", 20)
+    monkeypatch.setattr(serialization, "CARD_AUTHORS", 1)
+    long = VALIDATED.model_copy(update={"summary": "A rather long summary that goes on"})
+    card = Projection.of("card").apply(long)
+
+    assert card["summary"] == "A rather long…"
+    assert (card["authors"], card["author_count"]) == ([{"name": "Author A"}], 2)
+    assert Projection.of("card").apply(NO_PDF)["summary"] == "S"
+    assert Projection.of("card", ["author_count", "arxiv_id"]).apply(long) == {"arxiv_id": "2301.00001v1", "author_count": 2}
+    assert Projection.of("full", ["title"]).apply(long) == {"title": long.title}
+    with pytest.raises(ValueError):
+        Projection.of("full", ["author_count"]) # Cards only
+    with pytest.raises(ValueError):
+        Projection.of("tiny")
+
+
+def test_paper_list_memoizes_projected_encodings():
+    papers = PaperList([VALIDATED, NO_PDF])
+    cards = Projection.of("card", ["arxiv_id"])
+
+    body = encode_papers(papers, projection=cards)
+    assert json.loads(body) == [{"arxiv_id": "2301.00001v1"}, {"arxiv_id": "2301.00002v1"}]
+    assert encode_papers(papers, projection=cards) is body
+    assert encode_papers(papers, projection=Projection.of("full")) is papers.json_bytes()
+    assert gzip.decompress(encode_papers(papers, "gzip", cards)) == body
+    assert encode_papers([VALIDATED, NO_PDF], projection=cards) == body
+
+
+def test_paper_list_memoizes_only_recent_projections(monkeypatch):
+    monkeypatch.setattr(serialization, "PROJECTION_MEMO_MAX", 2)
+    papers = PaperList([VALIDATED, NO_PDF])
+    projections = [Projection.of("card"), Projection.of("full", ["title"]), Projection.of("card", ["arxiv_id"])]
+
+    card_body = encode_papers(papers, projection=projections[0])
+    for projection in projections[1:]:
+        encode_papers(papers, projection=projection)
+
+    assert len(papers._projected) == 2
+    assert projections[0] not in papers._projected # The least recently used, dropped
+    assert encode_papers(papers, projection=projections[0]) == card_body
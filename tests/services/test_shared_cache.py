@@ -0,0 +1,85 @@
+import multiprocessing
+
+from src.services.shared_cache import SharedCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def write_from_other_process(path):
+    cache = SharedCache(path)
+    assert cache.acquire_lease("page")
+    cache.set("page", b"[]", ttl=60, stale_ttl=0, fetched_at=1.0, validators={"etag": '"v1"'})
+    cache.close()
+
+
+def test_entries_are_fresh_then_stale_then_gone(tmp_path):
+    clock = FakeClock()
+    cache = SharedCache(str(tmp_path / "cache.db"), clock=clock)
+    cache.set("page", b"[1]", ttl=10, stale_ttl=5, fetched_at=999.0, validators={"etag": '"a"'})
+
+    entry = cache.get("page")
+    assert (entry.body, entry.fetched_at, entry.validators) == (b"[1]", 999.0, {"etag": '"a"'})
+    assert clock.now < entry.fresh_until
+    clock.now += 12
+    assert cache.get("page").body == b"[1]"
+    clock.now += 3
+    assert cache.get("page") is None
+    assert (cache.stats.hits, cache.stats.stale_hits, cache.stats.misses, cache.stats.writes) == (1, 1, 1, 1)
+    cache.close()
+
+
+def test_eviction_drops_expired_then_oldest_entries(tmp_path):
+    clock = FakeClock()
+    cache = SharedCache(str(tmp_path / "cache.db"), max_bytes=10, clock=clock)
+    cache.set("short", b"aaaa", ttl=1, stale_ttl=0)
+    clock.now += 1
+    cache.set("old", b"bbbb", ttl=60, stale_ttl=0)
+    clock.now += 1
+    cache.set("new", b"cccc", ttl=60, stale_ttl=0) # 12 bytes: the expired entry goes first
+
+    assert cache.get("old") is not None
+    clock.now += 1
+    cache.set("newest", b"dddd", ttl=60, stale_ttl=0)
+    assert cache.get("old") is None
+    assert [cache.get(key).body for key in ("new", "newest")] == [b"cccc", b"dddd"]
+    assert cache.stats.evictions == 2
+    cache.set("huge", b"x" * 11, ttl=60, stale_ttl=0)
+    assert cache.get("huge") is None
+    cache.close()
+
+
+def test_one_owner_holds_a_lease_until_released_or_expired(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "cache.db")
+    worker, other = SharedCache(path, lease_ttl=30, clock=clock), SharedCache(path, lease_ttl=30, clock=clock)
+
+    assert worker.acquire_lease("page")
+    assert worker.acquire_lease("page") # Re-entrant for its owner
+    assert not other.acquire_lease("page")
+    assert other.acquire_lease("another page")
+    worker.release_lease("page")
+    assert other.acquire_lease("page")
+    clock.now += 31 # The holder died without releasing it
+    assert worker.acquire_lease("page")
+    assert other.stats.lease_waits == 1
+    worker.close()
+    other.close()
+
+
+def test_entries_and_leases_are_shared_across_processes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SharedCache(path)
+    process = multiprocessing.get_context("spawn").Process(target=write_from_other_process, args=(path,))
+    process.start()
+    process.join(30)
+
+    assert process.exitcode == 0
+    assert cache.get("page").validators == {"etag": '"v1"'}
+    assert not cache.acquire_lease("page") # Still held by the other (now gone) worker until it expires
+    cache.close()
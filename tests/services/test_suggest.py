@@ -0,0 +1,153 @@
+import random
+
+from sqlalchemy import text
+
+from src.models.paper import Paper
+from src.services import suggest
+from src.services.paper_store import PaperStore
+from src.services.suggest import SuggestIndex, normalize, sync_from_store
+
+
+def make_paper(arxiv_id, title, authors, categories=None):
+    return Paper.from_trusted(
+        arxiv_id=arxiv_id,
+        title=title,
+        summary="",
+        author_names=authors,
+        published_date="2023-01-01T00:00:00Z",
+        categories=categories or ["cs.CL"],
+    )
+
+
+def brute_force(papers, query, limit):
+    # Expected completions, computed from scratch: distinct (kind, text) pairs counted per paper
+    counts = {}
+    for paper in papers:
+        for kind, text in suggest.paper_suggestions(paper):
+            counts[(kind, text)] = counts.get((kind, text), 0) + 1
+    prefix = normalize(query)
+    matches = [
+        (text, kind, count) for (kind, text), count in counts.items()
+        if any(key.startswith(prefix) for key in suggest._keys(kind, text))
+    ]
+    matches.sort(key=lambda match: (-match[2], suggest._KIND_ORDER[match[1]], match[0]))
+    return matches[:limit]
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+    assert normalize("  Schrödinger's  CAT: a Review ") == "schrodinger s cat a review"
+    assert normalize("cs.CL") == "cs.cl"
+
+
+def test_suggest_completes_titles_authors_and_categories_by_popularity():
+    index = SuggestIndex()
+    index.add([
+        make_paper("2301.00001v1", "Graph Neural Networks", ["Ada Lovelace", "Alan Turing"], ["cs.LG"]),
+        make_paper("2301.00002v1", "Graph Transformers", ["Alan Turing"], ["cs.LG", "cs.CL"]),
+        make_paper("2301.00003v1", "Grammar Induction", ["Grace Hopper"], ["cs.CL"]),
+    ])
+
+    assert index.suggest("gra") == [
+        ("Grace Hopper", "author", 1),
+        ("Grammar Induction", "title", 1),
+        ("Graph Neural Networks", "title", 1),
+        ("Graph Transformers", "title", 1),
+    ]
+    # Authors are found by any of their names
+    assert index.suggest("turing") == [("Alan Turing", "author", 2)]
+    assert index.suggest("CS.") == [("cs.CL", "category", 2), ("cs.LG", "category", 2)]
+    assert index.suggest("graph t", limit=1) == [("Graph Transformers", "title", 1)]
+    assert index.suggest("  ") == []
+
+
+def test_newer_version_replaces_counts_of_older_one():
+    index = SuggestIndex()
+    index.add([make_paper("2301.00001v1", "Old Title", ["Ada Lovelace"])])
+    index.add([make_paper("2301.00001v1", "Old Title", ["Ada Lovelace"])]) # Seen before: not counted again
+    index.add([make_paper("2301.00001v2", "New Title", ["Ada Lovelace"])])
+    index.add([make_paper("2301.00001v1", "Old Title", ["Ada Lovelace"])]) # Older: ignored
+
+    assert index.suggest("ada") == [("Ada Lovelace", "author", 1)]
+    assert index.suggest("old") == []
+    assert index.suggest("new") == [("New Title", "title", 1)]
+
+
+def test_wide_prefixes_stay_exact_as_papers_arrive(monkeypatch):
+    # A low scan limit makes most prefixes 'wide', exercising the maintained top lists and merges
+    monkeypatch.setattr(suggest, "SCAN_LIMIT", 3)
+    rng = random.Random(7)
+    names = ["Ana Li", "Anh Le", "Bo Lin", "Ben Lee", "Bea Liu", "Al Low"]
+    words = ["alpha", "albedo", "beta", "bayes", "blind", "alto"]
+    index = SuggestIndex(pending_keys=5)
+    papers, versions = {}, {}
+    for number in range(160):
+        # Every fourth paper is a new version of an earlier one, with different metadata
+        base = f"2301.{rng.randrange(number) if number % 4 == 3 else number:05d}"
+        versions[base] = versions.get(base, 0) + 1
+        paper = make_paper(
+            f"{base}v{versions[base]}",
+            " ".join(rng.choices(words, k=3)),
+            rng.sample(names, rng.randint(1, 3)),
+            rng.sample(["cs.CL", "cs.LG", "astro-ph.GA"], 1),
+        )
+        papers[base] = paper
+        index.add([paper])
+        if number % 10 == 9:
+            for query in ["a", "al", "b", "be", "l", "li", "alpha a", "c"]:
+                assert index.suggest(query, 5) == brute_force(papers.values(), query, 5), query
+    assert index.stats()["wide_prefixes"] > 0
+
+
+def test_wide_prefix_list_is_rebuilt_when_a_member_drops(monkeypatch):
+    monkeypatch.setattr(suggest, "SCAN_LIMIT", 0)
+    monkeypatch.setattr(suggest, "MAX_LIMIT", 2)
+    index = SuggestIndex()
+    index.add([
+        make_paper(f"2301.0000{number}v1", f"Zeta {number}", [author])
+        for number, author in enumerate(["Ann Ash", "Ann Ash", "Abe Ash", "Abe Ash", "Amy Ash"])
+    ])
+    assert index.suggest("a", 2) == [("Abe Ash", "author", 2), ("Ann Ash", "author", 2)]
+
+    index.add([make_paper("2301.00000v2", "Zeta 0", ["Zed Zu"])])
+    assert index.suggest("a", 2) == [("Abe Ash", "author", 2), ("Amy Ash", "author", 1)]
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "suggest.json")
+    index = SuggestIndex(path)
+    index.add([make_paper("2301.00001v1", "Graph Neural Networks", ["Ada Lovelace"])])
+    index.warm()
+    index.flush()
+
+    reopened = SuggestIndex(path)
+    assert len(reopened) == 1
+    assert reopened.suggest("gr") == index.suggest("gr")
+    # Versions seen before the snapshot are still recognised
+    assert reopened.add([make_paper("2301.00001v1", "Graph Neural Networks", ["Ada Lovelace"])]) == 0
+
+
+def test_sync_from_store_adds_new_papers_once(tmp_path):
+    store = PaperStore(str(tmp_path / "papers.db"))
+    store.upsert_papers([make_paper("2301.00001v1", "Graph Neural Networks", ["Ada Lovelace"])])
+    index = SuggestIndex(str(tmp_path / "suggest.json"))
+
+    assert sync_from_store(index, store) == 1
+    assert sync_from_store(index, store) == 0
+    assert SuggestIndex(str(tmp_path / "suggest.json")).suggest("ada") == [("Ada Lovelace", "author", 1)]
+    store.close()
+
+
+def test_sync_from_store_adds_writes_that_commit_after_a_newer_one(tmp_path):
+    store = PaperStore(str(tmp_path / "papers.db"))
+    store.upsert_papers([make_paper("2301.00001v1", "Graph Neural Networks", ["Ada Lovelace"])])
+    index = SuggestIndex(str(tmp_path / "suggest.json"))
+    sync_from_store(index, store)
+
+    # Stamped before the paper synced above, committed after that sync
+    store.upsert_papers([make_paper("2301.00002v1", "Quantum Walks", ["Grace Hopper"])])
+    with store.engine.begin() as conn:
+        conn.execute(text("UPDATE papers SET stored_at = stored_at - 30 WHERE paper_id = '2301.00002'"))
+
+    assert sync_from_store(index, store) == 1
+    assert index.suggest("grace") == [("Grace Hopper", "author", 1)]
+    store.close()
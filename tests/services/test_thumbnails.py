@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from respx import MockRouter
+
+from src.services.arxiv_service import ARXIV_ID_RE
+from src.services.thumbnails import (
+    DirectoryPdfFetcher,
+    HttpPdfFetcher,
+    PdfNotFound,
+    ThumbnailCache,
+    ThumbnailService,
+    get_pdf_scheduler,
+    render_first_page,
+)
+from src.services.scheduler import Priority, UpstreamScheduler
+
+
+def fake_render(pdf: bytes, width: int, image_format: str) -> bytes:
+    return b"IMG:" + pdf + f":{width}".encode()
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=2)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def pdf_dir(tmp_path):
+    directory = tmp_path / "pdfs"
+    directory.mkdir()
+    (directory / "2301.00001v1.pdf").write_bytes(b"pdf-one")
+    (directory / "2301.00001.pdf").write_bytes(b"pdf-one") # Same document, unversioned id
+    (directory / "hep-th_9901001v1.pdf").write_bytes(b"pdf-old")
+    return directory
+
+
+def make_service(tmp_path, pdf_dir, executor, max_bytes=1024 * 1024, fetcher=None):
+    return ThumbnailService(
+        ThumbnailCache(str(tmp_path / "thumbs"), max_bytes=max_bytes),
+        fetcher or DirectoryPdfFetcher(str(pdf_dir)),
+        width=200,
+        image_format="png",
+        executor=executor,
+        renderer=fake_render,
+    )
+
+
+@pytest.mark.asyncio
+async def test_renders_once_then_serves_from_disk(tmp_path, pdf_dir, executor):
+    service = make_service(tmp_path, pdf_dir, executor)
+
+    first = await service.get("2301.00001v1")
+    second = await service.get("2301.00001v1")
+
+    assert first.content == b"IMG:pdf-one:200"
+    assert first.media_type == "image/png"
+    assert second.content == first.content and second.etag == first.etag
+    assert service.stats.as_dict() == {"hits": 1, "renders": 1, "failures": 0}
+
+    # A new service over the same directory finds the cached image without rendering
+    restarted = make_service(tmp_path, pdf_dir, executor)
+    assert (await restarted.get("2301.00001v1")).content == first.content
+    assert restarted.stats.renders == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_render(tmp_path, pdf_dir, executor):
+    service = make_service(tmp_path, pdf_dir, executor)
+
+    results = await asyncio.gather(*(service.get("2301.00001v1") for _ in range(5)))
+
+    assert service.stats.renders == 1
+    assert all(result.content == results[0].content for result in results)
+
+
+@pytest.mark.asyncio
+async def test_identical_images_share_one_blob(tmp_path, pdf_dir, executor):
+    service = make_service(tmp_path, pdf_dir, executor)
+
+    versioned = await service.get("2301.00001v1")
+    unversioned = await service.get("2301.00001")
+
+    assert versioned.etag == unversioned.etag
+    assert len(service.cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_pdf_raises_not_found(tmp_path, pdf_dir, executor):
+    service = make_service(tmp_path, pdf_dir, executor)
+
+    with pytest.raises(PdfNotFound):
+        await service.get("2301.99999v1")
+    assert service.stats.failures == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), max_bytes=25)
+    cache.put("a", b"a" * 10, "png")
+    cache.put("b", b"b" * 10, "png")
+    assert cache.get("a") is not None # a is now more recent than b
+    cache.put("c", b"c" * 10, "png")
+
+    assert cache.get("b") is None
+    assert cache.get("a")[1] == b"a" * 10
+    assert cache.get("c")[1] == b"c" * 10
+    assert cache.total_bytes == 20
+    assert not os.path.exists(tmp_path / "thumbs" / "refs" / "b") # Dangling ref dropped on read
+
+
+@pytest.mark.asyncio
+async def test_prewarm_renders_and_skips_failures(tmp_path, pdf_dir, executor):
+    service = make_service(tmp_path, pdf_dir, executor)
+
+    warmed = await service.prewarm(["2301.00001v1", "hep-th/9901001v1", "2301.99999v1", "2301.00001v1"])
+
+    assert warmed == 2
+    assert service.stats.renders == 2
+
+
+@pytest.mark.asyncio
+async def test_http_fetcher_downloads_pdf(respx_router: MockRouter):
+    respx_router.get("https://arxiv.org/pdf/2301.00001v1").mock(return_value=httpx.Response(200, content=b"%PDF-1.4"))
+    respx_router.get("https://arxiv.org/pdf/2301.99999v1").mock(return_value=httpx.Response(404))
+    fetcher = HttpPdfFetcher()
+
+    assert await fetcher.fetch("2301.00001v1") == b"%PDF-1.4"
+    with pytest.raises(PdfNotFound):
+        await fetcher.fetch("2301.99999v1")
+
+
+@pytest.mark.asyncio
+async def test_http_fetcher_does_not_hold_upstream_slots(respx_router: MockRouter):
+    from src.services import arxiv_service
+    released = asyncio.Event()
+
+    async def slow_pdf(request):
+        await released.wait()
+        return httpx.Response(200, content=b"%PDF-1.4")
+
+    respx_router.get("https://arxiv.org/pdf/2301.00001v1").mock(side_effect=slow_pdf)
+    fetcher = HttpPdfFetcher()
+    download = asyncio.create_task(fetcher.fetch("2301.00001v1"))
+    await asyncio.sleep(0.01)
+
+    assert get_pdf_scheduler().running == 1
+    assert arxiv_service.get_scheduler().running == 0
+    released.set()
+    assert await download == b"%PDF-1.4"
+
+
+@pytest.mark.asyncio
+async def test_prewarm_downloads_are_paced(respx_router: MockRouter, tmp_path, executor):
+    started = []
+
+    def pdf(request):
+        started.append(time.monotonic())
+        return httpx.Response(200, content=b"%PDF-1.4")
+
+    respx_router.get(url__regex=r"https://arxiv.org/pdf/.*").mock(side_effect=pdf)
+    scheduler = UpstreamScheduler(rate=20, burst=1, max_concurrency=4) # One download every 50ms
+    service = make_service(tmp_path, None, executor, fetcher=HttpPdfFetcher(scheduler=scheduler))
+
+    assert await service.prewarm(["2301.00001v1", "2301.00002v1", "2301.00003v1"], concurrency=3) == 3
+
+    gaps = [later - earlier for earlier, later in zip(started, started[1:])]
+    assert len(gaps) == 2 and min(gaps) >= 0.04
+    assert scheduler.stats.lanes[Priority.BACKGROUND].granted == 3
+
+
+@pytest.mark.parametrize("arxiv_id, valid", [
+    ("2301.00001", True),
+    ("2301.00001v12", True),
+    ("0704.0001", True),
+    ("hep-th/9901001v1", True),
+    ("math.CO/0101001", True),
+    ("../etc/passwd", False),
+    ("2301.00001/../x", False),
+])
+def test_arxiv_id_pattern(arxiv_id, valid):
+    assert bool(ARXIV_ID_RE.match(arxiv_id)) is valid
+
+
+@pytest.mark.parametrize("image_format, magic", [("png", b"\x89PNG"), ("webp", b"RIFF")])
+def test_render_first_page(image_format, magic):
+    pymupdf = pytest.importorskip("pymupdf")
+    if image_format == "webp":
+        pytest.importorskip("PIL")
+    document = pymupdf.open()
+    page = document.new_page(width=612, height=792)
+    page.insert_text((72, 72), "A first page")
+    pdf = document.tobytes()
+
+    image = render_first_page(pdf, 200, image_format)
+
+    assert image.startswith(magic)
+
+
+@pytest.mark.asyncio
+async def test_service_renders_in_worker_processes(tmp_path):
+    pymupdf = pytest.importorskip("pymupdf")
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    document = pymupdf.open()
+    document.new_page(width=612, height=792).insert_text((72, 72), "A first page")
+    (pdf_dir / "2301.00001v1.pdf").write_bytes(document.tobytes())
+    service = ThumbnailService(ThumbnailCache(str(tmp_path / "thumbs")), DirectoryPdfFetcher(str(pdf_dir)), width=200, image_format="png", max_workers=1)
+    try:
+        thumbnail = await service.get("2301.00001v1")
+    finally:
+        service.close()
+
+    assert thumbnail.content.startswith(b"\x89PNG")
+    assert service.stats.renders == 1
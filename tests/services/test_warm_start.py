@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from src.models.paper import Paper
+from src.services import warm_start
+from src.services.cache import ResponseCache
+from src.services.serialization import PaperList
+
+NOW = 1_700_000_000.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def page(*arxiv_ids, fetched_at=NOW - 30):
+    papers = PaperList(
+        [Paper(arxiv_id=arxiv_id, title=f"Title {arxiv_id}", summary="S", authors=[], published_date="2024-01-01T00:00:00Z") for arxiv_id in arxiv_ids],
+        fetched_at=fetched_at,
+    )
+    papers.validators = {"etag": f'"{arxiv_ids[0]}"'}
+    return papers
+
+
+def test_snapshot_round_trips_pages_lifetimes_and_recency(tmp_path):
+    path = str(tmp_path / "warm" / "snapshot.bin")
+    cache = ResponseCache(stale_ttl=100.0, clock=FakeClock())
+    cache.set(("cat:cs.AI", 0, 2, "submittedDate", "descending"), page("2401.00001v1", "2401.00002v1"), ttl=60)
+    cache.set(("all:llm", 0, 1, "relevance", "descending"), page("2401.00003v1", fetched_at=None), ttl=10)
+    cache.set(("not", "a page"), ["plain list"], ttl=60) # Only pages with a known encoding are kept
+
+    assert warm_start.save(cache, path, now=NOW) == 2
+    clock = FakeClock()
+    restored = ResponseCache(stale_ttl=100.0, clock=clock)
+    assert warm_start.load(restored, path, now=NOW + 20) == 2
+
+    latest = restored.get(("cat:cs.AI", 0, 2, "submittedDate", "descending"))
+    assert [paper.arxiv_id for paper in latest.value] == ["2401.00001v1", "2401.00002v1"]
+    assert (latest.value.fetched_at, latest.value.validators, latest.is_stale) == (NOW - 30, {"etag": '"2401.00001v1"'}, False)
+    search = restored.get(("all:llm", 0, 1, "relevance", "descending"))
+    assert search.value.fetched_at is None and search.is_stale # Its 10s TTL ran out while the app was down
+    assert [key[0] for key, *_ in restored.entries(10)] == ["all:llm", "cat:cs.AI"]
+    clock.now = 40.0
+    assert restored.get(("cat:cs.AI", 0, 2, "submittedDate", "descending")).is_stale
+
+
+def test_expired_pages_are_not_restored(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    cache = ResponseCache(stale_ttl=100.0, clock=FakeClock())
+    cache.set(("a",), page("2401.00001v1"), ttl=10)
+    cache.set(("b",), page("2401.00002v1"), ttl=500)
+    warm_start.save(cache, path, now=NOW)
+
+    restored = ResponseCache(stale_ttl=100.0)
+    assert warm_start.load(restored, path, now=NOW + 200) == 1
+    assert restored.get(("a",)) is None
+
+
+def test_concurrent_saves_publish_whole_snapshots(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    cache = ResponseCache(stale_ttl=100.0, clock=FakeClock())
+    for number in range(50):
+        cache.set((f"query {number}",), page(f"2401.{number:05d}v1"), ttl=60)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        counts = list(pool.map(lambda _: warm_start.save(cache, path, now=NOW), range(32)))
+
+    assert counts == [50] * 32
+    assert warm_start.load(ResponseCache(stale_ttl=100.0), path, now=NOW) == 50
+    assert os.listdir(tmp_path) == ["snapshot.bin"] # No temporary file left behind
+
+
+def test_missing_or_unreadable_snapshots_restore_nothing(tmp_path):
+    cache = ResponseCache()
+    assert warm_start.load(cache, str(tmp_path / "missing.bin")) == 0
+    for content in (b"not a snapshot", warm_start._MAGIC + b"garbage"):
+        (tmp_path / "bad.bin").write_bytes(content)
+        assert warm_start.load(cache, str(tmp_path / "bad.bin")) == 0
+    assert len(cache) == 0
@@ -0,0 +1,28 @@
+from benchmarks.compare import compare
+from benchmarks.feeds import synthetic_feed
+from benchmarks.run import run_suite
+from src.services.atom_parser import parse_feed
+
+
+def test_synthetic_feed_is_deterministic_and_parseable():
+    assert synthetic_feed(25) == synthetic_feed(25)
+    assert len(parse_feed(synthetic_feed(25))) == 25
+
+
+def test_benchmark_suite_smoke_run():
+    report = run_suite(sizes=[10], budget=30, requests=4, concurrency=2)
+
+    names = {result["name"] for result in report["results"]}
+    assert {"parse_feed/10", "fetch_papers/10", "paper_build/trusted/10", "endpoint/latest/cold", "endpoint/search/warm"} <= names
+    assert all(result["p50"] > 0 for result in report["results"])
+    assert report["meta"]["sizes"] == [10]
+
+
+def test_compare_flags_regressions_above_threshold():
+    baseline = {"a": {"p50": 1.0}, "b": {"p50": 1.0}, "only-old": {"p50": 1.0}}
+    candidate = {"a": {"p50": 1.05}, "b": {"p50": 1.5}}
+
+    rows, regressions = compare(baseline, candidate, threshold=0.10)
+
+    assert [row[0] for row in rows] == ["a", "b"]
+    assert regressions == ["b"]
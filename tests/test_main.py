@@ -1,12 +1,24 @@
+import json
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, AsyncMock # AsyncMock for async functions
 
 from main import app # Assuming your FastAPI app instance is named 'app' in main.py
+from src.services import arxiv_service, planner, related, suggest, thumbnails
 from src.models.paper import Paper, PaperAuthor # For creating mock return values
+from src.services.pagination import Cursor, InvalidCursor
+from src.services.facets import FacetCounts, FacetFilter
+from src.services.scheduler import QueueDeadlineExceeded
+from src.services.serialization import PaperList
 
 client = TestClient(app)
 
+def fake_thumbnail_render(pdf, width, image_format):
+    return b"thumbnail of " + pdf
+
 # Sample Paper data for mocking service responses
 mock_paper_1 = Paper(
     arxiv_id="2301.00001v1",
@@ -49,6 +61,306 @@ def test_get_latest_papers_success(mock_get_latest):
     
     mock_get_latest.assert_called_once_with(start=0, max_results=2)
 
+def test_lifespan_installs_shared_http_client():
+    assert arxiv_service.get_http_client() is None
+    with TestClient(app):
+        shared_client = arxiv_service.get_http_client()
+        assert shared_client is not None
+        assert not shared_client.is_closed
+        assert thumbnails.get_thumbnail_service() is not None
+        deadline = time.monotonic() + 5
+        while suggest.get_suggest_index() is None and time.monotonic() < deadline:
+            time.sleep(0.01) # Indexes load in the background
+        assert suggest.get_suggest_index() is not None
+    assert arxiv_service.get_http_client() is None
+    assert shared_client.is_closed
+    assert thumbnails.get_thumbnail_service() is None
+    assert suggest.get_suggest_index() is None
+
+def test_lifespan_restores_cached_pages_from_the_warm_start_snapshot():
+    key = ("cat:cs.AI", 0, 2, "submittedDate", "descending")
+    arxiv_service.clear_cache()
+    with TestClient(app):
+        arxiv_service.get_response_cache().set(key, PaperList(mock_papers_list, fetched_at=time.time()), 60)
+    arxiv_service.clear_cache()
+
+    with TestClient(app):
+        restored = arxiv_service.get_response_cache().get(key)
+        assert [paper.arxiv_id for paper in restored.value] == ["2301.00001v1", "2301.00002v1"]
+        assert not restored.is_stale
+    arxiv_service.clear_cache()
+
+def make_export_stub(papers, error=None):
+    async def export_stub(search_query, limit):
+        export_stub.calls.append((search_query, limit))
+        for paper in papers:
+            yield paper
+        if error:
+            raise error
+    export_stub.calls = []
+    return export_stub
+
+def test_export_papers_streams_ndjson():
+    export_stub = make_export_stub(mock_papers_list)
+    with patch("src.services.arxiv_service.export_papers", export_stub):
+        response = client.get("/papers/export?keyword=llm&categories=cs.CL,cs.AI&date_from=2024-01-01&date_to=2024-01-31&limit=50")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["arxiv_id"] == "2301.00001v1"
+    assert json.loads(lines[1])["title"] == "Mock Paper 2"
+    assert export_stub.calls == [("all:llm AND (cat:cs.CL OR cat:cs.AI) AND submittedDate:[202401010000 TO 202401312359]", 50)]
+
+def test_export_papers_reports_midstream_error():
+    export_stub = make_export_stub([mock_paper_1], error=RuntimeError("upstream died"))
+    with patch("src.services.arxiv_service.export_papers", export_stub):
+        response = client.get("/papers/export?categories=cs.AI")
+
+    lines = response.text.splitlines()
+    assert json.loads(lines[0])["arxiv_id"] == "2301.00001v1"
+    assert "error" in json.loads(lines[-1])
+
+def test_export_papers_validation():
+    assert client.get("/papers/export?limit=0").status_code == 400
+    assert client.get("/papers/export?date_from=2024-02-01&date_to=2024-01-01").status_code == 400
+    assert client.get("/papers/export?date_from=not-a-date").status_code == 422
+
+def test_cache_stats_endpoint():
+    response = client.get("/cache/stats")
+    assert response.status_code == 200
+    stats = response.json()
+    for counter in ("hits", "stale_hits", "misses", "evictions", "entries", "bytes"):
+        assert counter in stats
+
+@patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
+def test_metrics_endpoint_reports_request_and_stage_metrics(mock_get_latest):
+    mock_get_latest.return_value = mock_papers_list
+    client.get("/papers/latest")
+    client.get("/papers/latest")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE arxiv_http_request_duration_seconds histogram" in body
+    assert 'arxiv_http_request_duration_seconds_count{route="/papers/latest",method="GET",status="200"}' in body
+    assert 'arxiv_stage_duration_seconds_count{stage="encode"}' in body
+    assert 'arxiv_cache_events_total{event="hits"}' in body
+    assert 'arxiv_scheduler_queue_depth{priority="interactive"} 0' in body
+
+@patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
+def test_get_latest_papers_conditional_get(mock_get_latest):
+    mock_get_latest.return_value = PaperList(mock_papers_list, fetched_at=time.time())
+    response = client.get("/papers/latest", headers={"Accept-Encoding": "identity"})
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    not_modified = client.get("/papers/latest", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    mock_get_latest.return_value = PaperList([mock_paper_1], fetched_at=time.time())
+    assert client.get("/papers/latest", headers={"If-None-Match": etag}).status_code == 200
+
+@patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
+def test_partial_results_are_flagged(mock_get_latest):
+    papers = PaperList([mock_paper_1])
+    papers.partial = True
+    mock_get_latest.return_value = papers
+
+    response = client.get("/papers/latest?max_results=200")
+
+    assert response.status_code == 200
+    assert response.headers["x-partial-results"] == "true"
+    assert response.headers["cache-control"] == "no-store"
+    mock_get_latest.return_value = PaperList([mock_paper_1], fetched_at=time.time())
+    assert "x-partial-results" not in client.get("/papers/latest").headers
+
+@patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
+def test_get_latest_papers_compressed(mock_get_latest):
+    mock_get_latest.return_value = PaperList([mock_paper_1.model_copy(update={"summary": "long abstract " * 200})])
+    response = client.get("/papers/latest", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].endswith('-gzip"')
+    assert response.headers["cache-control"] == "no-cache" # Unknown upstream age
+    assert response.json()[0]["summary"].startswith("long abstract")
+
+    mock_get_latest.return_value = [mock_paper_2]
+    assert "content-encoding" not in client.get("/papers/latest", headers={"Accept-Encoding": "gzip"}).headers
+
+@patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
+def test_not_modified_carries_the_variant_validator(mock_get_latest):
+    mock_get_latest.return_value = PaperList([mock_paper_1.model_copy(update={"summary": "long abstract " * 200})])
+    response = client.get("/papers/latest", headers={"Accept-Encoding": "gzip"})
+
+    not_modified = client.get("/papers/latest", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == response.headers["etag"]
+    assert not_modified.headers["vary"] == "Accept-Encoding"
+
+@patch("src.services.arxiv_service.search_papers_by_keyword", new_callable=AsyncMock)
+@patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
+def test_card_view_and_field_projection(mock_get_latest, mock_search):
+    mock_get_latest.return_value = PaperList(mock_papers_list, fetched_at=time.time())
+    mock_search.return_value = PaperList(mock_papers_list, fetched_at=time.time())
+
+    cards = client.get("/papers/latest?view=card&max_results=2")
+    assert cards.status_code == 200
+    assert cards.json()[0]["author_count"] == 2
+    assert cards.headers["etag"] != client.get("/papers/latest?max_results=2").headers["etag"]
+    assert "cursor=" in cards.headers["link"] and "view=card" in cards.headers["link"]
+    response = client.get("/papers/search?keyword=llm&view=card&fields=arxiv_id,title&fields=author_count")
+    assert response.json()[1] == {"arxiv_id": "2301.00002v1", "title": "Mock Paper 2", "author_count": 1}
+    assert list(client.get("/papers/latest?fields=title").json()[0]) == ["title"]
+
+    assert client.get("/papers/latest?fields=author_count").status_code == 400 # Cards only
+    assert client.get("/papers/search?keyword=llm&view=compact").status_code == 400
+
+def test_paper_thumbnail_endpoint(tmp_path):
+    (tmp_path / "2301.00001v1.pdf").write_bytes(b"pdf")
+    service = thumbnails.ThumbnailService(
+        thumbnails.ThumbnailCache(str(tmp_path / "thumbs")),
+        thumbnails.DirectoryPdfFetcher(str(tmp_path)),
+        image_format="png",
+        executor=ThreadPoolExecutor(max_workers=1),
+        renderer=fake_thumbnail_render,
+    )
+    thumbnails.set_thumbnail_service(service)
+    try:
+        response = client.get("/papers/2301.00001v1/thumbnail")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+        assert response.content == b"thumbnail of pdf"
+        assert client.get("/papers/2301.00001v1/thumbnail", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+        assert client.get("/papers/2301.00002v1/thumbnail").status_code == 404
+        assert client.get("/papers/not-an-id/thumbnail").status_code == 400
+    finally:
+        thumbnails.set_thumbnail_service(None)
+        service._executor.shutdown()
+    assert client.get("/papers/2301.00001v1/thumbnail").status_code == 503
+
+@patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
+def test_get_latest_papers_next_cursor(mock_get_latest):
+    mock_get_latest.return_value = mock_papers_list
+
+    response = client.get("/papers/latest?start=10&max_results=2")
+
+    token = response.headers["X-Next-Cursor"]
+    cursor = Cursor.decode(token, "latest")
+    assert (cursor.arxiv_id, cursor.offset) == ("2301.00002v1", 11)
+    assert response.headers["Link"] == f'<http://testserver/papers/latest?max_results=2&cursor={token}>; rel="next"'
+
+    response = client.get(f"/papers/latest?max_results=2&cursor={token}")
+
+    assert response.status_code == 200
+    mock_get_latest.assert_called_with(max_results=2, cursor=cursor)
+    assert Cursor.decode(response.headers["X-Next-Cursor"], "latest").offset == 13
+
+@patch("src.services.arxiv_service.search_papers_by_keyword", new_callable=AsyncMock)
+def test_search_papers_cursor_validation(mock_search_keyword):
+    mock_search_keyword.return_value = [mock_paper_1]
+
+    response = client.get("/papers/search?keyword=test&max_results=2")
+    assert response.status_code == 200 and "X-Next-Cursor" not in response.headers # Short page: no next page
+
+    latest_cursor = Cursor.after("latest", mock_paper_1, 0).encode()
+    assert client.get(f"/papers/search?keyword=test&cursor={latest_cursor}").status_code == 400
+    assert client.get("/papers/search?keyword=test&cursor=garbage").status_code == 400
+    mock_search_keyword.side_effect = InvalidCursor("Cursor has expired; start again from the first page.")
+    search_cursor = Cursor.after("search:test", mock_paper_1, 0).encode()
+    assert client.get(f"/papers/search?keyword=test&cursor={search_cursor}").status_code == 400
+
+@patch("src.services.arxiv_service.get_facets", new_callable=AsyncMock)
+@patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
+def test_get_latest_papers_filters_and_facets(mock_get_latest, mock_get_facets, monkeypatch):
+    mock_get_latest.return_value = mock_papers_list
+    mock_get_facets.return_value = FacetCounts(2, {"cs.AI": 1, "math.CO": 1}, {"2023-01": 2}, {"2023-01-02": 1, "2023-01-01": 1})
+    monkeypatch.setattr(arxiv_service, "facets_available", lambda: True)
+
+    response = client.get("/papers/latest?categories=cs.AI,math.CO&date_from=2023-01-01&max_results=2&facets=true")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [paper["arxiv_id"] for paper in body["papers"]] == ["2301.00001v1", "2301.00002v1"]
+    assert body["facets"]["months"] == {"2023-01": 2} and body["facets"]["total"] == 2
+    filters = FacetFilter.of(["cs.AI", "math.CO"], date(2023, 1, 1))
+    mock_get_latest.assert_called_with(start=0, max_results=2, filters=filters)
+    mock_get_facets.assert_called_with(filters)
+    # The next page's cursor belongs to the filtered listing only
+    token = response.headers["X-Next-Cursor"]
+    assert client.get(f"/papers/latest?cursor={token}").status_code == 400
+
+    assert client.get("/papers/latest?date_from=2023-02-01&date_to=2023-01-01").status_code == 400
+    monkeypatch.setattr(arxiv_service, "facets_available", lambda: False)
+    assert client.get("/papers/latest?facets=true").status_code == 503
+
+def test_query_plan_header():
+    async def planned_latest(**kwargs):
+        plan = planner.plan_query(["cs.AI"], None, None, {})
+        planner.record_plan(plan)
+        return mock_papers_list
+
+    with patch("src.services.arxiv_service.get_latest_papers", planned_latest):
+        response = client.get("/papers/latest")
+
+    assert response.headers["X-Query-Plan"] == "route=upstream; served=none; segments=upstream:..; reason=uncovered-category"
+    with patch("src.services.arxiv_service.get_latest_papers", AsyncMock(return_value=mock_papers_list)):
+        assert "X-Query-Plan" not in client.get("/papers/latest").headers
+
+def test_suggest_endpoint(monkeypatch):
+    index = suggest.SuggestIndex()
+    index.add([mock_paper_1, mock_paper_2])
+    monkeypatch.setattr(suggest, "_suggest_index", index)
+
+    response = client.get("/papers/suggest?q=mock paper 2")
+    assert response.status_code == 200
+    assert response.json() == [{"text": "Mock Paper 2", "kind": "title", "papers": 1}]
+    assert client.get("/papers/suggest?q=").json() == []
+    assert client.get("/papers/suggest?q=m&limit=100").status_code == 400
+    monkeypatch.setattr(suggest, "_suggest_index", None)
+    assert client.get("/papers/suggest?q=m").status_code == 503
+
+@patch("src.services.arxiv_service.get_related_papers", new_callable=AsyncMock)
+def test_related_papers_endpoint(mock_related, monkeypatch):
+    monkeypatch.setattr(related, "_related_index", object())
+    mock_related.return_value = [(mock_paper_2, 0.42)]
+
+    response = client.get("/papers/2301.00001/related?limit=3")
+
+    assert response.status_code == 200
+    assert response.json() == [{"paper": mock_paper_2.model_dump(mode="json"), "score": 0.42}]
+    mock_related.assert_called_once_with("2301.00001", 3)
+
+    mock_related.side_effect = LookupError("Unknown paper")
+    assert client.get("/papers/2399.99999/related").status_code == 404
+    assert client.get("/papers/not-an-id/related").status_code == 400
+    assert client.get("/papers/2301.00001/related?limit=500").status_code == 400
+    monkeypatch.setattr(related, "_related_index", None)
+    assert client.get("/papers/2301.00001/related").status_code == 503
+
+@patch("src.services.arxiv_service.fetch_papers_by_ids", new_callable=AsyncMock)
+def test_get_papers_by_ids(mock_by_ids):
+    mock_by_ids.return_value = arxiv_service.PaperLookup(PaperList([mock_paper_2, mock_paper_1]), ["2301.00009"], [])
+
+    response = client.get("/papers/by-ids?ids=2301.00002v1,2301.00001&ids=2301.00009")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [paper["arxiv_id"] for paper in body["papers"]] == ["2301.00002v1", "2301.00001v1"]
+    assert body["missing"] == ["2301.00009"] and body["unavailable"] == []
+    mock_by_ids.assert_called_once_with(["2301.00002v1", "2301.00001", "2301.00009"])
+
+def test_get_papers_by_ids_validation(monkeypatch):
+    assert client.get("/papers/by-ids?ids=").status_code == 400
+    response = client.get("/papers/by-ids?ids=2301.00001,not-an-id")
+    assert response.status_code == 400 and "not-an-id" in response.json()["detail"]
+    monkeypatch.setattr(arxiv_service, "BY_IDS_MAX", 2)
+    assert client.get("/papers/by-ids?ids=2301.00001,2301.00002,2301.00003").status_code == 400
+
 @patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
 def test_get_latest_papers_service_exception(mock_get_latest):
     mock_get_latest.side_effect = Exception("Service layer exploded")
@@ -91,6 +403,20 @@ def test_search_papers_empty_keyword(mock_search_keyword):
     response_no_keyword = client.get("/papers/search")
     assert response_no_keyword.status_code == 422 # FastAPI's handling of missing required query parameter
 
+@patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
+def test_get_latest_papers_upstream_queue_full(mock_get_latest):
+    mock_get_latest.side_effect = QueueDeadlineExceeded("queue full")
+    response = client.get("/papers/latest")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+def test_upstream_stats_endpoint():
+    response = client.get("/upstream/stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data["lanes"]) == {"interactive", "background", "bulk"}
+    assert data["running"] == 0
+
 @patch("src.services.arxiv_service.search_papers_by_keyword", new_callable=AsyncMock)
 def test_search_papers_service_exception(mock_search_keyword):
     mock_search_keyword.side_effect = Exception("Search service went boom")
@@ -110,15 +436,14 @@ def test_search_papers_service_exception(mock_search_keyword):
 # The detail in error messages for 500 errors in these tests matches what's in main.py's exception handlers.
 # The test for empty keyword in search also checks for whitespace-only and missing keyword.
 # FastAPI returns 422 for missing required query parameters.
-# The JSON response for Paper models should match Pydantic's serialization (e.g. HttpUrl to str).
-# `mock_paper_1.pdf_url` is an `HttpUrl` object, but when FastAPI serializes it, it becomes a string.
+# The JSON response for Paper models should match Pydantic's serialization.
+# `mock_paper_1.pdf_url` is validated as an http(s) URL but kept as a string, which FastAPI serializes as is.
 # The tests implicitly check this by comparing the structure. For more explicit checks on specific fields like pdf_url,
 # you'd access `json_response[0]["pdf_url"]` and assert its string value.
 # The current assertions are on title and arxiv_id which are strings.
 # If `pdf_url` were `None`, it would be `null` in JSON, or omitted if `exclude_none=True` in Pydantic model config (not default).
-# Our Paper model has `Optional[HttpUrl]`, so if `pdf_url` is None, it serializes to `null`.
-# `mock_paper_1` and `mock_paper_2` have valid pdf_url strings, which Pydantic converts to HttpUrl.
-# These are then serialized back to strings by FastAPI in the JSON response.
+# Our Paper model has an optional `pdf_url`, so if `pdf_url` is None, it serializes to `null`.
+# `mock_paper_1` and `mock_paper_2` have valid pdf_url strings, which Pydantic checks and keeps.
 # So, `json_response[0]["pdf_url"]` would be "http://arxiv.org/pdf/2301.00001v1".
 # Adding an explicit check for this:
 @patch("src.services.arxiv_service.get_latest_papers", new_callable=AsyncMock)
@@ -150,32 +475,4 @@ def test_get_latest_papers_none_pdf_url_serialization(mock_get_latest):
     json_response = response.json()
     assert len(json_response) == 1
     assert json_response[0]["pdf_url"] is None # Pydantic serializes None to null in JSON
-    assert json_response[0]["title"] == "Mock Paper No PDF"I have created `tests/test_main.py` with unit tests for the API endpoints.
-These tests cover:
--   The root `/` endpoint.
--   `/papers/latest` endpoint:
-    -   Successful response with mocked service data.
-    -   Correct passing of `start` and `max_results` parameters to the service.
-    -   Handling of service layer exceptions, returning a 500 error.
-    -   Correct serialization of `pdf_url` (including `None` values).
--   `/papers/search` endpoint:
-    -   Successful response with mocked service data for a given keyword.
-    -   Correct passing of `keyword`, `start`, and `max_results` to the service.
-    -   Handling of empty or whitespace-only keywords (400 error).
-    -   Handling of missing keyword parameter (422 error by FastAPI).
-    -   Handling of service layer exceptions, returning a 500 error.
-
-`TestClient` is used to make requests to the app, and `unittest.mock.patch` with `AsyncMock` is used to mock the asynchronous service functions (`get_latest_papers` and `search_papers_by_keyword`). Sample `Paper` objects are defined to be used as return values for these mocks.
-
-The testing setup seems complete according to the subtask requirements.
-
-I have completed:
-1.  **Set up Testing Environment**:
-    *   `pytest`, `pytest-asyncio`, `respx` were added to `requirements.txt` (in the previous subtask turn, but intended for this one).
-    *   `tests` directory with `__init__.py` and `tests/services/__init__.py` were created (similarly, in previous subtask turn).
-2.  **Write Tests for `arxiv_service.py`**:
-    *   Created `tests/services/test_arxiv_service.py` with comprehensive tests for `fetch_papers`, `get_latest_papers`, and `search_papers_by_keyword` using `respx` and `caplog`.
-3.  **Write Tests for `main.py` API Endpoints**:
-    *   Created `tests/test_main.py` with tests for all API endpoints (`/`, `/papers/latest`, `/papers/search`) using `TestClient` and `unittest.mock.patch` with `AsyncMock`.
-
-All parts of the subtask have been addressed.
+    assert json_response[0]["title"] == "Mock Paper No PDF"